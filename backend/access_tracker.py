@@ -0,0 +1,297 @@
+# backend/access_tracker.py
+"""
+序列访问频率统计 + 自适应 TTL
+
+原来所有序列都是同一个 CACHE_TTL_HOURS：每秒都有人看的 pytorch/openrank 和一个月才被看一次的
+冷门用户指标一样 24 小时过期。这里按访问频率分三档：
+  - hot：热度 >= ACCESS_HOT_SCORE，TTL 缩短到 ACCESS_HOT_TTL_HOURS，并由后台同步线程在过期前主动刷新
+  - warm：介于两者之间，沿用默认 TTL
+  - cold：热度 < ACCESS_COLD_SCORE，TTL 放宽到 ACCESS_COLD_TTL_HOURS，被请求到时才刷新
+从未记录过访问的序列（新序列）按 warm 处理。
+超过 ACCESS_EVICT_DAYS 天没人访问、也不在 config.json 里的序列是淘汰候选（eviction_candidates）。
+
+热度 = 按 ACCESS_HALF_LIFE_HOURS 指数衰减的访问次数（series_access.score 存的是衰减到 last_access_at 时的值）。
+
+读路径不写库：record() 只在进程内计数；每个进程一个后台线程每 ACCESS_FLUSH_SECONDS 秒
+把计数合并进 series_access 表（原子 UPSERT，多进程并发合并不丢计数），顺便重新加载各序列的档位。
+进程退出时再合并一次。
+"""
+import atexit
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+
+from extensions import db
+from models import MetricSeries, SeriesAccess
+
+ACCESS_TRACKING_ENABLED = os.getenv("ACCESS_TRACKING_ENABLED", "1") != "0"
+ACCESS_FLUSH_SECONDS = float(os.getenv("ACCESS_FLUSH_SECONDS", "30"))
+ACCESS_HALF_LIFE_HOURS = float(os.getenv("ACCESS_HALF_LIFE_HOURS", "72"))
+ACCESS_HOT_SCORE = float(os.getenv("ACCESS_HOT_SCORE", "20"))
+ACCESS_COLD_SCORE = float(os.getenv("ACCESS_COLD_SCORE", "1"))
+ACCESS_HOT_TTL_HOURS = float(os.getenv("ACCESS_HOT_TTL_HOURS", "6"))
+ACCESS_COLD_TTL_HOURS = float(os.getenv("ACCESS_COLD_TTL_HOURS", "72"))
+ACCESS_EVICT_DAYS = float(os.getenv("ACCESS_EVICT_DAYS", "30"))
+# 主动刷新：hot 序列过了 TTL 的这个比例就刷新；每轮最多刷新多少条
+ACCESS_REFRESH_AHEAD = 0.8
+ACCESS_REFRESH_MAX = int(os.getenv("ACCESS_REFRESH_MAX", "200"))
+FLUSH_BATCH = 500
+
+TIER_HOT, TIER_WARM, TIER_COLD = "hot", "warm", "cold"
+
+
+def _key(platform: str, entity: str, repo: str | None, metric: str):
+    return (platform, entity, repo or "", metric)
+
+
+def decayed_score(score: float, last_access_at: datetime, now: datetime) -> float:
+    """把 last_access_at 时的热度衰减到 now"""
+    hours = max((now - last_access_at).total_seconds() / 3600.0, 0.0)
+    return score * math.pow(0.5, hours / ACCESS_HALF_LIFE_HOURS)
+
+
+def _sql_access_decay(score, last_access_at, now):
+    """SQL 函数 access_decay(score, last_access_at, now)：参数是库里存的 DateTime 字符串"""
+    if score is None or last_access_at is None or now is None:
+        return score
+    return decayed_score(score, datetime.fromisoformat(last_access_at), datetime.fromisoformat(now))
+
+
+@event.listens_for(Engine, "connect")
+def _register_sql_functions(dbapi_connection, connection_record):
+    """每个 SQLite 连接注册 access_decay，flush 的 UPSERT 在库里完成衰减（不依赖 SQLite 数学函数扩展）"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("access_decay", 3, _sql_access_decay, deterministic=True)
+
+
+def tier_for(score: float) -> str:
+    if score >= ACCESS_HOT_SCORE:
+        return TIER_HOT
+    if score < ACCESS_COLD_SCORE:
+        return TIER_COLD
+    return TIER_WARM
+
+
+class AccessTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()     # key → 上次合并后的访问次数
+        self._tiers = {}              # key → hot / cold（warm 不存）
+        self._app = None
+        self._worker_pid = None
+
+    # ---- 读路径 ----
+
+    def record(self, platform: str, entity: str, repo: str | None, metric: str):
+        """记一次访问（只改内存）"""
+        if not ACCESS_TRACKING_ENABLED:
+            return
+        self._ensure_worker()
+        key = _key(platform, entity, repo, metric)
+        with self._lock:
+            self._pending[key] += 1
+
+    def tier(self, platform: str, entity: str, repo: str | None, metric: str) -> str:
+        self._ensure_worker()
+        return self._tiers.get(_key(platform, entity, repo, metric), TIER_WARM)
+
+    def ttl_hours(self, platform: str, entity: str, repo: str | None, metric: str, default: float) -> float:
+        """该序列的缓存有效期（小时）；warm / 未知序列用 default"""
+        if not ACCESS_TRACKING_ENABLED:
+            return default
+        tier = self.tier(platform, entity, repo, metric)
+        if tier == TIER_HOT:
+            return min(default, ACCESS_HOT_TTL_HOURS)
+        if tier == TIER_COLD:
+            return max(default, ACCESS_COLD_TTL_HOURS)
+        return default
+
+    # ---- 后台线程 ----
+
+    def _ensure_worker(self):
+        """每个进程（fork 之后）第一次用到时启动合并线程；需要应用上下文"""
+        if self._worker_pid == os.getpid() or not ACCESS_TRACKING_ENABLED:
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            from flask import current_app
+            try:
+                self._app = current_app._get_current_object()
+            except RuntimeError:
+                return  # 不在应用上下文中：下次再启动
+            self._worker_pid = os.getpid()
+            # fork 继承来的计数属于父进程，丢掉
+            self._pending = Counter()
+        threading.Thread(target=self._run, name="access-tracker", daemon=True).start()
+        atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        with self._app.app_context():
+            self.reload()
+        while True:
+            time.sleep(ACCESS_FLUSH_SECONDS)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                    self.reload()
+                except Exception:
+                    db.session.rollback()
+                    self._app.logger.exception("访问计数合并失败")
+
+    def _flush_at_exit(self):
+        if self._app is None or self._worker_pid != os.getpid():
+            return
+        try:
+            with self._app.app_context():
+                self.flush()
+        except Exception:
+            pass
+
+    # ---- 合并 / 加载（需要应用上下文） ----
+
+    def flush(self) -> int:
+        """
+        把内存计数合并进 series_access，返回合并的 key 数；失败时计数放回去下次再合并。
+        每个 key 一条 INSERT ... ON CONFLICT DO UPDATE（在库里做 hits + n、按半衰期衰减后加 n），
+        多个进程同时合并同一个 key 时不会丢计数，也不会因为同时插入新 key 而整批失败
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        now = datetime.utcnow()
+        keys = list(pending)
+        try:
+            for start in range(0, len(keys), FLUSH_BATCH):
+                batch = keys[start:start + FLUSH_BATCH]
+                stmt = sqlite_insert(SeriesAccess.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["platform", "entity", "repo", "metric"],
+                    set_={
+                        "hits": SeriesAccess.hits + stmt.excluded.hits,
+                        "score": db.func.access_decay(
+                            SeriesAccess.score, SeriesAccess.last_access_at, stmt.excluded.last_access_at,
+                        ) + stmt.excluded.score,
+                        "last_access_at": stmt.excluded.last_access_at,
+                    },
+                )
+                db.session.execute(stmt, [
+                    {"platform": key[0], "entity": key[1], "repo": key[2], "metric": key[3],
+                     "hits": pending[key], "score": float(pending[key]), "last_access_at": now}
+                    for key in batch
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return len(keys)
+
+    def reload(self):
+        """重新计算各序列的档位（只保存 hot / cold）"""
+        now = datetime.utcnow()
+        tiers = {}
+        for platform, entity, repo, metric, score, last_access_at in db.session.query(
+            SeriesAccess.platform, SeriesAccess.entity, SeriesAccess.repo, SeriesAccess.metric,
+            SeriesAccess.score, SeriesAccess.last_access_at,
+        ):
+            tier = tier_for(decayed_score(score, last_access_at, now))
+            if tier != TIER_WARM:
+                tiers[(platform, entity, repo, metric)] = tier
+        self._tiers = tiers
+
+    def hot_keys(self):
+        return [key for key, tier in self._tiers.items() if tier == TIER_HOT]
+
+
+access_tracker = AccessTracker()
+
+
+# ==== 主动刷新 / 淘汰候选（需要应用上下文） ====
+
+def stale_hot_series(limit: int = ACCESS_REFRESH_MAX):
+    """已接近过期的 hot 序列（按 updated_at 从旧到新），返回 MetricSeries 行"""
+    keys = access_tracker.hot_keys()
+    if not keys:
+        return []
+    cutoff = datetime.utcnow() - timedelta(hours=ACCESS_HOT_TTL_HOURS * ACCESS_REFRESH_AHEAD)
+    rows = []
+    for start in range(0, len(keys), FLUSH_BATCH):
+        rows.extend(
+            MetricSeries.query.filter(
+                db.tuple_(MetricSeries.platform, MetricSeries.entity, MetricSeries.repo, MetricSeries.metric)
+                .in_(keys[start:start + FLUSH_BATCH]),
+                MetricSeries.updated_at < cutoff,
+            ).all()
+        )
+    rows.sort(key=lambda row: row.updated_at)
+    return rows[:limit]
+
+
+def refresh_hot_series(limit: int = ACCESS_REFRESH_MAX) -> int:
+    """主动刷新快过期的 hot 序列（后台同步线程每轮调用），按 WARMUP_RATE 限速；返回刷新成功条数"""
+    from api.opendigger import ApiException, opendigger_url, refresh_series
+    from warmup import TokenBucket, WARMUP_RATE
+
+    if not ACCESS_TRACKING_ENABLED:
+        return 0
+    access_tracker.reload()
+    bucket = TokenBucket(WARMUP_RATE)
+    refreshed = 0
+    for row in stale_hot_series(limit):
+        platform, entity, repo, metric = row.platform, row.entity, row.repo or None, row.metric
+        bucket.acquire()
+        try:
+            refresh_series(opendigger_url(platform, entity, repo, metric), row, platform, entity, repo, metric)
+            refreshed += 1
+        except ApiException:
+            continue
+        except Exception:
+            db.session.rollback()
+    return refreshed
+
+
+def eviction_candidates(days: float = ACCESS_EVICT_DAYS):
+    """
+    超过 days 天没有访问（从未访问的按 updated_at 算）、且不在 config.json 中的序列，
+    返回 MetricSeries.id 列表
+    """
+    from config_registry import get_config
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    try:
+        configured = set(get_config().repo_map)
+    except (OSError, ValueError, KeyError):
+        return []  # 读不到 config 时不敢淘汰任何东西
+
+    rows = (
+        db.session.query(MetricSeries.id, MetricSeries.platform, MetricSeries.entity, MetricSeries.repo)
+        .outerjoin(
+            SeriesAccess,
+            db.and_(
+                SeriesAccess.platform == MetricSeries.platform,
+                SeriesAccess.entity == MetricSeries.entity,
+                SeriesAccess.repo == MetricSeries.repo,
+                SeriesAccess.metric == MetricSeries.metric,
+            ),
+        )
+        .filter(
+            db.or_(
+                SeriesAccess.last_access_at < cutoff,
+                db.and_(SeriesAccess.id.is_(None), MetricSeries.updated_at < cutoff),
+            )
+        )
+        .all()
+    )
+    return [row_id for row_id, platform, entity, repo in rows if (platform, entity, repo) not in configured]
@@ -3,10 +3,11 @@
 auth 蓝图：专门处理身份认证相关接口：
   - POST /api/auth/register  注册
   - POST /api/auth/login     登录
+  - GET  /api/auth/me        当前用户（默认只读 token claims）
 """
 import re
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 
 from datetime import datetime, timedelta
 import jwt
@@ -15,6 +16,8 @@ from extensions import db
 from models import User
 from api.opendigger import ApiException  # 复用之前定义的异常类
 from rate_limiter import rate_limit
+from passwords import PasswordPoolBusy
+from auth_cache import get_user_profile
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
@@ -25,6 +28,12 @@ def handle_auth_exception(e: ApiException):
     """在 auth 这个蓝图里也统一把 ApiException 转成 JSON"""
     return jsonify({"detail": e.detail}), e.status_code
 
+
+@auth_bp.errorhandler(PasswordPoolBusy)
+def handle_password_pool_busy(e: PasswordPoolBusy):
+    """登录 / 注册高峰时 KDF 排队已满：让客户端稍后重试，不占住 Web 线程"""
+    return jsonify({"detail": "服务器繁忙，请稍后重试"}), 503, {"Retry-After": "1"}
+
 @auth_bp.route("/register", methods=["POST"])
 @rate_limit(max_requests=5, window_seconds=3600)
 def register():
@@ -105,10 +114,16 @@ def login():
     if not user.check_password(password):
         raise ApiException(400, "密码错误")
 
+    # 哈希方案 / 参数变了：趁有明文时透明升级
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+
     # ✅ identity 只放 user.id（字符串），其他信息放到附加 claims
     additional_claims = {
         "username": user.username,
-        "email": user.email
+        "email": user.email,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
     }
     access_token = create_access_token(
         identity=str(user.id),
@@ -127,11 +142,22 @@ def login():
 @jwt_required()
 def me():
     """
-    获取当前登录用户信息：从 token 中拿出 id，再查数据库
+    获取当前登录用户信息：
+      - 默认直接用 token 里的 claims（登录时写入 username / email / created_at），不查数据库
+      - ?fresh=1 或旧 token 缺少这些 claims 时，走用户资料缓存（未命中才查库）
     """
     user_id = get_jwt_identity()        # 这里取出来是字符串
-    user = User.query.get(int(user_id))
+    claims = get_jwt()
+    if request.args.get("fresh") != "1" and all(k in claims for k in ("username", "email", "created_at")):
+        return jsonify({"user": {
+            "id": int(user_id),
+            "username": claims["username"],
+            "email": claims["email"],
+            "created_at": claims["created_at"],
+        }}), 200
+
+    user = get_user_profile(int(user_id))
     if not user:
         raise ApiException(404, "用户不存在或已被删除")
 
-    return jsonify({"user": user.to_dict()}), 200
\ No newline at end of file
+    return jsonify({"user": user}), 200
\ No newline at end of file
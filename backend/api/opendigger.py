@@ -9,38 +9,94 @@
   /api/llm/report
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from pathlib import Path
 import json
+import os
 import requests
 
 from datetime import datetime, timedelta
 from extensions import db
+from paths import DATA_DIR
 from models import MetricSeries
 
 # ✅ 导入统一的工具函数
-from metric_utils import mean as _mean, std_population as _std_pop, tail_n_values, calculate_health_score
+from metric_utils import mean as _mean, tail_n_values
 from rate_limiter import rate_limit
-# OpenAI 客户端
-try:
-    from openai import OpenAI  # openai>=1.x
-    openai_client = OpenAI()   # 会自动读 OPENAI_API_KEY 环境变量
-except Exception:
-    openai_client = None
+from upstream import get_session, OPENDIGGER_TIMEOUT_SECONDS
+from profiling import span
+from series_format import (
+    SERIES_FORMATS, MSGPACK_MIMETYPE, msgpack, to_compact, pack_msgpack, encoded_series_cache,
+)
+import series_ops
+from summary_engine import SummaryEngine, engine as summary_engine
+from ranking import get_ranking_index
+from snapshot import current_snapshot
+from negative_cache import negative_cache
+from access_tracker import access_tracker
+from config_registry import get_config
+from search_index import get_search_index
+from json_provider import dumps_bytes, json_bytes_response, raw_envelope_response
+from metrics import SERIES_CACHE_REQUESTS, LLM_LATENCY, record_upstream
+import time
+import threading
+
+# OpenAI 客户端：首次调用时才导入 SDK 并创建（openai 包导入约 0.5s，
+# 放在模块顶层会拖慢冷启动和每个 worker 的 fork）
+_openai_client = None
+_openai_client_ready = False
+_openai_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """懒加载 OpenAI 客户端；未安装 SDK 或未配置 Key 时返回 None"""
+    global _openai_client, _openai_client_ready
+    if _openai_client_ready:
+        return _openai_client
+
+    with _openai_client_lock:
+        if not _openai_client_ready:
+            try:
+                from openai import OpenAI  # openai>=1.x
+                _openai_client = OpenAI()  # 会自动读 OPENAI_API_KEY 环境变量
+            except Exception:
+                _openai_client = None
+            _openai_client_ready = True
+    return _openai_client
+
+
+_async_openai_client = None
+_async_openai_client_ready = False
+
+
+def get_async_openai_client():
+    """
+    懒加载异步 OpenAI 客户端（ASGI 模式使用），复用 upstream 的共享 httpx 连接池
+    必须在事件循环内调用；未安装 SDK 或未配置 Key 时返回 None
+    """
+    global _async_openai_client, _async_openai_client_ready
+    if not _async_openai_client_ready:
+        try:
+            from openai import AsyncOpenAI
+            from upstream import get_async_client
+            _async_openai_client = AsyncOpenAI(http_client=get_async_client())
+        except Exception:
+            _async_openai_client = None
+        _async_openai_client_ready = True
+    return _async_openai_client
+
 
 # 导入你自己的元数据模块
 import metadata as meta
 
 # ==== 基础路径 ====
 BASE_DIR = Path(__file__).resolve().parent.parent  # backend/
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 CONFIG_FILE = BASE_DIR / "config.json"
 
-# 内存缓存，避免频繁刷新页面时每次都重算
-_LLM_SUMMARY_CACHE = {"ts": None, "data": None}
-LLM_CACHE_TTL_SECONDS = 300  # 5分钟
+# /api/llm/summary 编码结果缓存：(projects, 编码后的响应体)，快照变化后下次请求时重新编码
+_LLM_SUMMARY_BODY = {"body": None}
 
 
 # ✅ 辅助函数：获取最近12个月数据（使用统一工具）
@@ -49,117 +105,44 @@ def _tail12_values(records):
     return tail_n_values(records, n=12, month_key="month", value_key="count")
 
 
-def compute_llm_summary_from_db():
-    """
-    从数据库计算 LLM 生态汇总数据
-    优化：使用批量查询替代 N+1 查询，显著提升性能
-    """
+def _summary_snapshot(source: SummaryEngine, force: bool = False):
+    """取汇总快照，并把配置 / 数据缺失转成与原接口一致的 ApiException"""
     try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
-    except Exception as e:
+        snapshot = source.rebuild() if force else source.get()
+    except (OSError, ValueError, KeyError) as e:
         raise ApiException(500, f"读取 config.json 失败: {e}")
 
-    repos = config.get("repositories", [])
-    
-    if not repos:
+    if not source.repo_count:
         raise ApiException(404, "配置文件中没有定义任何仓库")
-
-    # ✅ 优化：一次性批量查询所有需要的 MetricSeries（只执行 1 次 SQL）
-    all_series = MetricSeries.query.filter(
-        MetricSeries.metric.in_(["openrank", "activity"])
-    ).all()
-    
-    # ✅ 构建内存索引：{(platform, entity, repo, metric): row}
-    # 后续查找时间复杂度 O(1)，不再触发 SQL
-    series_map = {}
-    for row in all_series:
-        key = (row.platform, row.entity, row.repo, row.metric)
-        series_map[key] = row
-    
-    summary_items = []
-
-    for repo_info in repos:
-        platform = repo_info["platform"]
-        org = repo_info["org"]
-        repo = repo_info["repo"]
-        category = repo_info.get("category", "unknown")
-        repo_key = f"{platform}/{org}/{repo}"
-
-        # ✅ 从内存索引中 O(1) 查找，不触发数据库查询
-        row_or = series_map.get((platform, org, repo, "openrank"))
-        row_act = series_map.get((platform, org, repo, "activity"))
-
-        if not row_or or not row_act:
-            continue
-
-        try:
-            or_records = json.loads(row_or.data_json or "[]")
-            act_records = json.loads(row_act.data_json or "[]")
-
-            or_vals = _tail12_values(or_records)
-            act_vals = _tail12_values(act_records)
-
-            if not or_vals or not act_vals:
-                continue
-
-            openrank_mean_12m = _mean(or_vals)
-            openrank_std_12m = _std_pop(or_vals)
-            activity_mean_12m = _mean(act_vals)
-
-            summary_items.append({
-                "platform": platform,
-                "org": org,
-                "repo": repo,
-                "project_key": repo_key,
-                "category": category,
-                "openrank_mean_12m": float(openrank_mean_12m),
-                "openrank_std_12m": float(openrank_std_12m),
-                "activity_mean_12m": float(activity_mean_12m),
-            })
-        except Exception:
-            continue
-
-    if not summary_items:
+    if not snapshot.projects:
         raise ApiException(404, "数据库中没有可用项目数据，请先触发数据同步（run_sync）")
+    return snapshot
 
-    # 归一化 + health_score
-    max_or = max(i["openrank_mean_12m"] for i in summary_items) or 1.0
-    max_act = max(i["activity_mean_12m"] for i in summary_items) or 1.0
-    max_std = max(i["openrank_std_12m"] for i in summary_items) or 1.0
 
-    for item in summary_items:
-        or_norm = item["openrank_mean_12m"] / max_or if max_or > 0 else 0.0
-        act_norm = item["activity_mean_12m"] / max_act if max_act > 0 else 0.0
-        std_norm = item["openrank_std_12m"] / max_std if max_std > 0 else 0.0
-        
-        # 稳定性 = 1 - 波动性归一化值
-        stability_norm = 1.0 - std_norm
-
-        # 使用统一的健康度计算函数
-        item["health_score"] = calculate_health_score(or_norm, act_norm, stability_norm)
-        
-        item["openrank_mean_12m"] = round(item["openrank_mean_12m"], 2)
-        item["activity_mean_12m"] = round(item["activity_mean_12m"], 2)
-        item["openrank_std_12m"] = round(item["openrank_std_12m"], 2)
+def compute_llm_summary_from_db():
+    """
+    从数据库全量计算 LLM 生态汇总数据（不经过增量引擎的缓存，基准测试 / 校验用）
+    批量查询所有序列，每个项目解码一次
+    """
+    return _summary_snapshot(SummaryEngine(CONFIG_FILE), force=True).projects
 
-    return summary_items
 
 def get_llm_summary_cached(force: bool = False):
-    if force:
-        data = compute_llm_summary_from_db()
-        _LLM_SUMMARY_CACHE["ts"] = datetime.utcnow()
-        _LLM_SUMMARY_CACHE["data"] = data
-        return data
+    """
+    当前汇总（增量引擎的快照）：序列变化后数秒内生效，只重算变化的项目
+    force=True 时全量重算
+    """
+    return _summary_snapshot(summary_engine, force=force).projects
 
-    ts = _LLM_SUMMARY_CACHE["ts"]
-    if ts and (datetime.utcnow() - ts).total_seconds() < LLM_CACHE_TTL_SECONDS:
-        return _LLM_SUMMARY_CACHE["data"]
 
-    data = compute_llm_summary_from_db()
-    _LLM_SUMMARY_CACHE["ts"] = datetime.utcnow()
-    _LLM_SUMMARY_CACHE["data"] = data
-    return data
+def get_llm_summary_body(force: bool = False) -> bytes:
+    """/api/llm/summary 的响应体：快照不变时复用上次编码结果"""
+    snapshot = _summary_snapshot(summary_engine, force=force)
+    cached = _LLM_SUMMARY_BODY["body"]
+    if cached is None or cached[0] is not snapshot.projects:
+        cached = (snapshot.projects, dumps_bytes({"projects": snapshot.projects, "version": snapshot.version}))
+        _LLM_SUMMARY_BODY["body"] = cached
+    return cached[1]
 
 # ==== 定义 Blueprint ====
 api_bp = Blueprint("api", __name__, url_prefix="/api")
@@ -183,35 +166,41 @@ def handle_api_exception(e: ApiException):
 
 # ==== 公共工具函数：抓取 & 缓存 OpenDigger 数据 ====
 
+# 默认有效期；按访问频率分档后 hot 序列更短、cold 序列更长（见 access_tracker.py）
 CACHE_TTL_HOURS = 24
 
-def fetch_and_cache_data_db(api_url: str, platform: str, entity: str, repo: str | None, metric: str):
-    repo_key = repo or ""  # ⭐ 统一 repo 为空时存 ""
+# OpenDigger 数据源根地址（可通过环境变量指向镜像或本地桩服务）
+OPENDIGGER_BASE_URL = os.getenv("OPENDIGGER_BASE_URL", "https://oss.open-digger.cn").rstrip("/")
+
+
+def opendigger_url(platform: str, entity: str, repo: str | None, metric: str) -> str:
+    """拼接 OpenDigger 指标 URL；repo 为空时是用户维度的数据"""
+    if repo:
+        return f"{OPENDIGGER_BASE_URL}/{platform}/{entity}/{repo}/{metric}.json"
+    return f"{OPENDIGGER_BASE_URL}/{platform}/{entity}/{metric}.json"
 
-    row = MetricSeries.query.filter_by(
-        platform=platform, entity=entity, repo=repo_key, metric=metric
+
+def get_cached_series_row(platform: str, entity: str, repo: str | None, metric: str):
+    """按 (platform, entity, repo, metric) 查缓存行；repo 为空时统一存空字符串"""
+    return MetricSeries.query.filter_by(
+        platform=platform, entity=entity, repo=repo or "", metric=metric
     ).first()
 
-    # 1) 命中缓存且未过期
-    if row and row.updated_at:
-        if datetime.utcnow() - row.updated_at < timedelta(hours=CACHE_TTL_HOURS):
-            if hasattr(row, "to_records"):
-                return {"data": row.to_records(), "cached": True}
-            return {"data": json.loads(row.data_json or "[]"), "cached": True}
 
-    # 2) 缓存没有/过期：请求 OpenDigger（把上游错误转成 ApiException）
-    try:
-        resp = requests.get(api_url, timeout=30)
-        resp.raise_for_status()
-    except requests.HTTPError as e:
-        code = getattr(e.response, "status_code", None)
-        if code == 404:
-            raise ApiException(404, "OpenDigger 无该指标数据（404）")
-        raise ApiException(502, f"OpenDigger 上游 HTTP 错误：{code}")
-    except requests.RequestException as e:
-        raise ApiException(502, f"请求 OpenDigger 失败：{e}")
+def series_ttl_hours(platform: str, entity: str, repo: str | None, metric: str) -> float:
+    return access_tracker.ttl_hours(platform, entity, repo, metric, CACHE_TTL_HOURS)
+
+
+def is_series_fresh(row) -> bool:
+    """缓存行存在且未过期（有效期按该序列的访问频率）"""
+    if not (row and row.updated_at):
+        return False
+    ttl_hours = series_ttl_hours(row.platform, row.entity, row.repo, row.metric)
+    return datetime.utcnow() - row.updated_at < timedelta(hours=ttl_hours)
 
-    data = resp.json()
+
+def format_opendigger_payload(data):
+    """把 OpenDigger 返回的 {"YYYY-MM": value} 转成 [{month, count}]，异常时抛 ApiException"""
     if not isinstance(data, dict):
         raise ApiException(502, "OpenDigger 返回格式异常（非 dict）")
 
@@ -222,21 +211,252 @@ def fetch_and_cache_data_db(api_url: str, platform: str, entity: str, repo: str
     ]
     if not formatted_data:
         raise ApiException(404, "无有效月度数据")
+    return formatted_data
 
-    payload = json.dumps(formatted_data, ensure_ascii=False)
 
-    # 3) upsert 写回 DB（repo 用 repo_key）
+def store_series(row, platform: str, entity: str, repo: str | None, metric: str, formatted_data):
+    """upsert 写回 DB（repo 为空时存空字符串）"""
+    payload = json.dumps(formatted_data, ensure_ascii=False)
     if row:
         row.data_json = payload
+        # 数据没变时 onupdate 不会触发：显式刷新 updated_at，否则该序列一直算过期、每次都回源
+        row.updated_at = datetime.utcnow()
     else:
         row = MetricSeries(
-            platform=platform, entity=entity, repo=repo_key, metric=metric,
+            platform=platform, entity=entity, repo=repo or "", metric=metric,
             data_json=payload
         )
         db.session.add(row)
 
     db.session.commit()
-    return {"data": formatted_data, "cached": False}
+    summary_engine.mark_dirty()
+    negative_cache.clear(platform, entity, repo, metric)
+    return row
+
+
+# Prometheus 的 metric 标签只取已知指标名：URL 里的任意 metric 会无限增加时间序列
+KNOWN_METRICS = frozenset(
+    [m["value"] for m in meta.get_metrics("org") + meta.get_metrics("user")] + ["bus_factor"]
+)
+
+
+def metric_label(metric: str) -> str:
+    """已知指标（内置目录 / config.json 的 metrics）原样返回，其他一律归为 other"""
+    if metric in KNOWN_METRICS:
+        return metric
+    try:
+        if metric in get_config().metrics:
+            return metric
+    except (OSError, ValueError, KeyError):
+        pass
+    return "other"
+
+
+def check_negative_cache(platform: str, entity: str, repo: str | None, metric: str):
+    """已知上游不存在的序列直接本地返回 404，不再请求 OpenDigger"""
+    if negative_cache.is_missing(platform, entity, repo, metric):
+        SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="negative").inc()
+        raise ApiException(404, "OpenDigger 无该指标数据（404）")
+
+
+def refresh_series(api_url: str, row, platform: str, entity: str, repo: str | None, metric: str):
+    """缓存没有/过期：请求 OpenDigger 并写回 DB，返回 [{month, count}]（上游错误转成 ApiException）"""
+    SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="miss").inc()
+
+    start = time.perf_counter()
+    status = "error"
+    try:
+        with span("upstream"):
+            resp = get_session().get(api_url, timeout=OPENDIGGER_TIMEOUT_SECONDS)
+            status = resp.status_code
+            resp.raise_for_status()
+    except requests.HTTPError as e:
+        code = getattr(e.response, "status_code", None)
+        if code == 404:
+            negative_cache.record(platform, entity, repo, metric, reason="404")
+            raise ApiException(404, "OpenDigger 无该指标数据（404）")
+        raise ApiException(502, f"OpenDigger 上游 HTTP 错误：{code}")
+    except requests.RequestException as e:
+        raise ApiException(502, f"请求 OpenDigger 失败：{e}")
+    finally:
+        record_upstream("opendigger", status, time.perf_counter() - start)
+
+    with span("decode"):
+        try:
+            formatted_data = format_opendigger_payload(resp.json())
+        except ApiException as e:
+            if e.status_code == 404:
+                negative_cache.record(platform, entity, repo, metric, reason="empty")
+            raise
+
+    # upsert 写回 DB
+    store_series(row, platform, entity, repo, metric, formatted_data)
+    return formatted_data
+
+
+def fetch_and_cache_data_db(api_url: str, platform: str, entity: str, repo: str | None, metric: str):
+    check_negative_cache(platform, entity, repo, metric)
+    # 在负缓存之后计数：已知不存在的序列不进 series_access
+    access_tracker.record(platform, entity, repo, metric)
+    row = get_cached_series_row(platform, entity, repo, metric)
+
+    # 1) 命中缓存且未过期
+    if is_series_fresh(row):
+        SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="hit").inc()
+        with span("decode"):
+            records = row.to_records()
+        return {"data": records, "cached": True}
+
+    # 2) 缓存没有/过期：请求 OpenDigger
+    return {"data": refresh_series(api_url, row, platform, entity, repo, metric), "cached": False}
+
+
+def get_series_format() -> str:
+    """?format=json（默认）| compact | msgpack"""
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in SERIES_FORMATS:
+        raise ApiException(400, f"不支持的格式：{fmt}，仅支持 {' / '.join(SERIES_FORMATS)}")
+    if fmt == "msgpack" and msgpack is None:
+        raise ApiException(400, "服务器未安装 msgpack，请使用 format=compact")
+    return fmt
+
+
+def encode_series(records, cached: bool, fmt: str):
+    """按请求的格式编码序列响应"""
+    if fmt == "json":
+        return jsonify({"data": records, "cached": cached})
+    return encode_compact(to_compact(records), cached, fmt)
+
+
+def encode_compact_body(compact, cached: bool, fmt: str):
+    """紧凑格式（compact / msgpack）的序列响应体，返回 (响应体, mimetype)"""
+    payload = {"cached": cached, "format": "compact", **compact}
+    if fmt == "msgpack":
+        return pack_msgpack(payload), MSGPACK_MIMETYPE
+    return dumps_bytes(payload), current_app.json.mimetype
+
+
+def encode_compact(compact, cached: bool, fmt: str):
+    """紧凑格式（compact / msgpack）的序列响应"""
+    body, mimetype = encode_compact_body(compact, cached, fmt)
+    return current_app.response_class(body, mimetype=mimetype)
+
+
+def cached_compact_response(cache_id, load_compact, fmt: str):
+    """
+    命中缓存的紧凑格式响应：同一份数据（cache_id 带 updated_at / 快照文件标识）每种格式只解码 + 编码一次
+    """
+    key = (cache_id, fmt)
+    hit = encoded_series_cache.get(key)
+    if hit is None:
+        with span("decode"):
+            compact = load_compact()
+        hit = encode_compact_body(compact, True, fmt)
+        encoded_series_cache.put(key, hit)
+    body, mimetype = hit
+    return current_app.response_class(body, mimetype=mimetype)
+
+
+def get_series_query():
+    """?from / to / granularity / agg / max_points；都没有时返回 None"""
+    try:
+        return series_ops.parse_series_query(request.args)
+    except ValueError as e:
+        raise ApiException(400, str(e))
+
+
+def _encode_query_result(result, cached: bool, fmt: str, granularity: str):
+    """编码 series_ops.apply_query 的结果，返回 (响应体, mimetype)"""
+    if fmt == "json":
+        payload = {"cached": cached, "granularity": granularity, "data": series_ops.to_records(result)}
+        return dumps_bytes(payload), current_app.json.mimetype
+
+    payload = {"cached": cached, "format": "compact", "granularity": granularity, **result}
+    if fmt == "msgpack":
+        return pack_msgpack(payload), MSGPACK_MIMETYPE
+    return dumps_bytes(payload), current_app.json.mimetype
+
+
+def _query_response(cache_id, load_compact, query, fmt: str, cached: bool = True):
+    """
+    带查询参数的序列响应
+    cache_id 不为空时（命中缓存的数据）：同一份数据只解码一次，同一参数组合只计算 / 编码一次；
+    cache_id 里带着 updated_at / 快照文件标识，数据更新后自然失效
+    """
+    if cache_id is None:
+        result = series_ops.apply_query(load_compact(), query)
+        body, mimetype = _encode_query_result(result, cached, fmt, query.granularity)
+        return current_app.response_class(body, mimetype=mimetype)
+
+    result_key = (cache_id, query, fmt)
+    hit = series_ops.query_result_cache.get(result_key)
+    if hit is None:
+        compact = series_ops.decoded_series_cache.get(cache_id)
+        if compact is None:
+            with span("decode"):
+                compact = load_compact()
+            series_ops.decoded_series_cache.put(cache_id, compact)
+        hit = _encode_query_result(series_ops.apply_query(compact, query), cached, fmt, query.granularity)
+        series_ops.query_result_cache.put(result_key, hit)
+    body, mimetype = hit
+    return current_app.response_class(body, mimetype=mimetype)
+
+
+def get_snapshot_entry(platform: str, entity: str, repo: str | None, metric: str):
+    """在 mmap 快照中查找未过期的序列，返回 (快照, 条目) 或 None"""
+    series_snapshot = current_snapshot()
+    if series_snapshot is None:
+        return None
+    entry = series_snapshot.lookup(platform, entity, repo, metric)
+    if entry is None or time.time() - entry.updated_at >= series_ttl_hours(platform, entity, repo, metric) * 3600:
+        return None
+    return series_snapshot, entry
+
+
+def series_response(api_url: str, platform: str, entity: str, repo: str | None, metric: str,
+                    fmt: str = "json", query=None):
+    """
+    /api/data 的响应：
+      1) 优先查 mmap 快照（同步时导出，不经过 SQLAlchemy）；已知上游不存在的序列直接 404（negative_cache）
+      2) 再查 DB 缓存：把 data_json 原样拼进 {"cached": true, "data": ...}，不做 json.loads + 重新编码
+      3) 都没有 / 已过期时请求 OpenDigger
+    紧凑格式先解码再按 fmt 编码（命中缓存时编码结果按数据标识 + fmt 缓存）；query（series_ops.SeriesQuery）不为空时先做范围裁剪 / 聚合 / 降采样
+    """
+    found = get_snapshot_entry(platform, entity, repo, metric)
+    if found is not None:
+        series_snapshot, entry = found
+        access_tracker.record(platform, entity, repo, metric)
+        SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="hit").inc()
+        cache_id = ("snapshot", series_snapshot.identity, platform, entity, repo or "", metric)
+        if query is not None:
+            return _query_response(cache_id, entry.to_compact, query, fmt)
+        if fmt == "json" and entry.json_bytes[:1] == b"[":
+            return raw_envelope_response("data", entry.json_bytes, cached=True)
+        return cached_compact_response(cache_id, entry.to_compact, fmt)
+
+    check_negative_cache(platform, entity, repo, metric)
+    access_tracker.record(platform, entity, repo, metric)
+    row = get_cached_series_row(platform, entity, repo, metric)
+
+    if query is not None:
+        if is_series_fresh(row):
+            SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="hit").inc()
+            return _query_response((row.id, row.updated_at), lambda: to_compact(row.to_records()), query, fmt)
+        records = refresh_series(api_url, row, platform, entity, repo, metric)
+        return _query_response(None, lambda: to_compact(records), query, fmt, cached=False)
+
+    if is_series_fresh(row):
+        SERIES_CACHE_REQUESTS.labels(metric=metric_label(metric), result="hit").inc()
+        # data_json 只由 store_series / 同步任务写入（json.dumps 的列表），首字符校验防止损坏数据直出
+        if fmt == "json" and row.data_json and row.data_json.lstrip().startswith("["):
+            return raw_envelope_response("data", row.data_json, cached=True)
+        if fmt != "json":
+            return cached_compact_response((row.id, row.updated_at), lambda: to_compact(row.to_records()), fmt)
+        with span("decode"):
+            records = row.to_records()
+        return encode_series(records, True, fmt)
+
+    return encode_series(refresh_series(api_url, row, platform, entity, repo, metric), False, fmt)
 
     
 
@@ -244,6 +464,21 @@ def fetch_and_cache_data_db(api_url: str, platform: str, entity: str, repo: str
 # 1. 元数据相关接口（平台 / 实体 / 指标 / 仓库）
 # ===========================
 
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_QUERY_LENGTH = 100
+
+
+def get_search_limit(default: int = 20) -> int:
+    """前缀搜索的 ?limit=，范围 1 ~ SEARCH_MAX_LIMIT"""
+    try:
+        limit = int(request.args.get("limit", default))
+    except ValueError:
+        raise ApiException(400, "limit 应为整数")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise ApiException(400, f"limit 取值范围为 1 ~ {SEARCH_MAX_LIMIT}")
+    return limit
+
+
 @api_bp.route("/platforms", methods=["GET"])
 def get_platforms():
     """获取支持的平台列表"""
@@ -252,9 +487,12 @@ def get_platforms():
 
 @api_bp.route("/entities/<platform>", methods=["GET"])
 def get_entities(platform: str):
-    """获取某个平台下的组织/用户列表"""
+    """获取某个平台下的组织/用户列表；?q=前缀 时按 value / label 前缀搜索（?limit= 默认 20）"""
     if not meta.is_supported_platform(platform):
         raise ApiException(400, f"不支持的平台：{platform}")
+    prefix = request.args.get("q")
+    if prefix is not None:
+        return jsonify(meta.search_entities(platform, prefix, get_search_limit()))
     entities = meta.get_entities(platform)
     return jsonify(entities)
 
@@ -281,9 +519,40 @@ def get_repos(platform: str, org: str):
     repos = meta.get_repos(platform, org)
     if not repos:
         raise ApiException(404, "该组织暂无可查询的仓库")
+    prefix = request.args.get("q")
+    if prefix is not None:
+        return jsonify(meta.search_repos(platform, org, prefix, get_search_limit()))
     return jsonify(repos)
 
 
+@api_bp.route("/search", methods=["GET"])
+def search_names():
+    """
+    组织 / 仓库自动补全：?q=关键字（必填）&platform=&kind=entity|repo&limit=
+    前缀匹配优先，没有前缀结果时做三元组模糊匹配（见 search_index）
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        raise ApiException(400, "缺少查询参数 q")
+    if len(q) > SEARCH_MAX_QUERY_LENGTH:
+        raise ApiException(400, f"q 最长 {SEARCH_MAX_QUERY_LENGTH} 个字符")
+
+    platform = request.args.get("platform") or None
+    if platform is not None and not meta.is_supported_platform(platform):
+        raise ApiException(400, f"不支持的平台：{platform}")
+    kind = request.args.get("kind") or None
+    if kind not in (None, "entity", "repo"):
+        raise ApiException(400, f"无效的 kind：{kind}，仅支持 entity/repo")
+
+    limit = get_search_limit(10)
+    index = get_search_index()
+    if index is None:
+        response = jsonify({"detail": "搜索索引构建中，请稍后重试"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    return jsonify({"query": q, "items": index.search(q, platform=platform, kind=kind, limit=limit)})
+
+
 # ===========================
 # 2. OpenDigger 指标数据接口
 # ===========================
@@ -299,8 +568,10 @@ def get_user_data(platform: str, entity: str, metric: str):
     if entity_type != "user":
         raise ApiException(400, f"该实体是 {entity_type}，请使用仓库数据接口")
 
-    api_url = f"https://oss.open-digger.cn/{platform}/{entity}/{metric}.json"
-    return jsonify(fetch_and_cache_data_db(api_url, platform, entity, None, metric))
+    fmt = get_series_format()
+    query = get_series_query()
+    api_url = opendigger_url(platform, entity, None, metric)
+    return series_response(api_url, platform, entity, None, metric, fmt, query)
 
 
 
@@ -309,8 +580,10 @@ def get_repo_data(platform: str, entity: str, repo: str, metric: str):
     if not meta.is_supported_platform(platform):
         raise ApiException(400, "不支持的平台")
 
-    api_url = f"https://oss.open-digger.cn/{platform}/{entity}/{repo}/{metric}.json"
-    return jsonify(fetch_and_cache_data_db(api_url, platform, entity, repo, metric))
+    fmt = get_series_format()
+    query = get_series_query()
+    api_url = opendigger_url(platform, entity, repo, metric)
+    return series_response(api_url, platform, entity, repo, metric, fmt, query)
 
 
 
@@ -323,60 +596,124 @@ def get_repo_data(platform: str, entity: str, repo: str, metric: str):
 def get_llm_summary():
     # 可选：refresh=1 强制重新计算（跳过缓存）
     refresh = request.args.get("refresh", "0").lower() in ("1", "true", "yes")
-    data = get_llm_summary_cached(force=refresh)
-    return jsonify({"projects": data})
+    return json_bytes_response(get_llm_summary_body(force=refresh))
+
+
 
+RANK_MAX_LIMIT = 1000
+
+
+def _get_ranking(metric: str, refresh: bool):
+    index = get_ranking_index(get_llm_summary_cached(force=refresh))
+    if metric not in index.metrics:
+        raise ApiException(400, f"不支持的排名指标: {metric}，可选：{', '.join(index.metrics)}")
+    return index
+
+
+def _is_config_category(category: str) -> bool:
+    try:
+        return category in get_config().categories
+    except (OSError, ValueError, KeyError):
+        return False
 
 
 @api_bp.route("/llm/rank/<metric>", methods=["GET"])
 @rate_limit(max_requests=30, window_seconds=60) 
 def get_llm_rank(metric: str):
-    allowed_metrics = {"health_score", "openrank_mean_12m", "activity_mean_12m"}
-    if metric not in allowed_metrics:
-        raise ApiException(400, f"不支持的排名指标: {metric}")
-
-    top = request.args.get("top", default=10, type=int)
+    """
+    排名分页：
+      ?top=10 / ?limit=10    每页条数（top 为旧参数名）
+      ?offset=20             偏移分页
+      ?cursor=...            游标分页（上一页返回的 next_cursor，汇总重算后依然有效）
+      ?category=xxx          只看某个类别（config.json 中的 category）
+    """
     refresh = request.args.get("refresh", "0").lower() in ("1", "true", "yes")
+    limit = request.args.get("limit", default=request.args.get("top", default=10, type=int), type=int)
+    offset = request.args.get("offset", default=0, type=int)
+    category = request.args.get("category") or None
+    cursor = request.args.get("cursor") or None
 
-    data = get_llm_summary_cached(force=refresh)
+    if not 1 <= limit <= RANK_MAX_LIMIT:
+        raise ApiException(400, f"limit 取值范围为 1 ~ {RANK_MAX_LIMIT}")
+    if offset < 0:
+        raise ApiException(400, "offset 不能为负数")
 
-    sorted_projects = sorted(
-        data,
-        key=lambda item: item.get(metric, 0.0),
-        reverse=True
-    )
+    index = _get_ranking(metric, refresh)
+    if category is not None and category not in index.categories and not _is_config_category(category):
+        # config.json 里有、但当前汇总里还没有项目的类别返回空页；完全不存在的名字才是 400
+        raise ApiException(400, f"未知的类别: {category}")
+
+    try:
+        projects, total, offset, next_cursor = index.page(metric, category, offset, limit, cursor)
+    except ValueError as e:
+        raise ApiException(400, str(e))
 
     return jsonify({
         "metric": metric,
-        "top": top,
-        "projects": sorted_projects[:top]
+        "top": limit,
+        "category": category,
+        "total": total,
+        "offset": offset,
+        "next_cursor": next_cursor,
+        "projects": projects
     })
 
 
+@api_bp.route("/llm/rank/<metric>/position", methods=["GET"])
+@rate_limit(max_requests=60, window_seconds=60)
+def get_llm_rank_position(metric: str):
+    """单个项目的名次：?project=github/pytorch/pytorch"""
+    project_key = request.args.get("project", "").strip()
+    if not project_key:
+        raise ApiException(400, "缺少参数 project（platform/org/repo）")
+
+    index = _get_ranking(metric, refresh=False)
+    position = index.position(metric, project_key)
+    if position is None:
+        raise ApiException(404, f"汇总中没有该项目：{project_key}")
+    return jsonify({"metric": metric, **position})
+
+
 
 # ===========================
 # 4. 智能报告接口（OpenAI + 规则兜底）
 # ===========================
 
-@api_bp.route("/llm/report", methods=["POST"])
-@rate_limit(max_requests=5, window_seconds=60)
-def generate_llm_report():
-    """
-    根据前端传来的项目指标，生成一段“分析师风格”的文字报告。
-    请求体结构：
-      {
-        "projects": [
-          { "repo": "pytorch/pytorch", "metrics": { "activity": 0.8, ... } },
-          ...
-        ]
-      }
-    """
-    payload = request.get_json(silent=True) or {}
-    projects = payload.get("projects", [])
+REPORT_MODEL = "gpt-4o-mini"
+REPORT_RATE_LIMIT_MAX = 5
+REPORT_RATE_LIMIT_WINDOW = 60
 
-    if not projects:
-        raise ApiException(400, "至少需要一个项目")
+# 报告用的 System Prompt（同步 / 异步两条调用路径共用）
+REPORT_SYSTEM_PROMPT = """
+你是一名负责开源生态评估的资深分析师。请根据用户提供的数据写一份深度对比报告。
 
+【内容与格式要求】：
+1. **结构必须清晰**：报告必须包含 3-4 个明确的 Markdown 小标题（使用 ### 语法），例如：
+   ### 📊 总体评分概览
+   ### 🚀 各项目核心优势
+   ### ⚠️ 潜在风险与短板
+   ### 🔮 社区演化趋势
+
+2. **重点灵活高亮**：
+   - 请识别报告中的 **关键结论、核心数据对比、或犀利的洞察**。
+   - 将这些句子用 Markdown 加粗符号（**...**）包裹。
+   - ⚠️ 不需要局限于段落开头，哪里重要就标哪里，但不要全文通篇加粗。
+
+3. **结尾强制总结**：
+   - 报告的最后，必须包含一个 Markdown 引用块（使用 > 符号）。
+   - 内容必须以 “💡 **分析师建议：**” 开头，针对不同场景给出 1-2 句具体的选型建议。
+   - 格式示例：
+     > 💡 **分析师建议：** 如果追求稳定性，推荐选择 PyTorch；如果需要快速验证 Agent，LangChain 是更好的选择。
+
+4. **语气风格**：专业、客观、见解独到。
+"""
+
+
+def build_report_summary(projects) -> str:
+    """
+    计算综合分并生成数字总结（给 LLM & 规则模板 都用）
+    projects: [{ "repo": "pytorch/pytorch", "metrics": { "activity": 0.8, ... } }, ...]
+    """
     # 1) 计算综合分
     enriched = []
     for p in projects:
@@ -388,7 +725,7 @@ def generate_llm_report():
 
     enriched.sort(key=lambda x: x["score"], reverse=True)
 
-    # 2) 数字总结（给 LLM & 规则模板 都用）
+    # 2) 数字总结
     summary_lines = []
     for idx, p in enumerate(enriched, start=1):
         m = p["metrics"]
@@ -400,60 +737,26 @@ def generate_llm_report():
             f"LLM 适配度 {m.get('llm_fit', 0):.2f}，"
             f"可持续性 {m.get('sustainability', 0):.2f}。"
         )
-    numeric_summary = "\n".join(summary_lines)
-
-    # 3) 如果配置了 OpenAI，则调用大模型写报告
-    if openai_client is not None:
-        try:
-            prompt = (
-                "下面是一组 LLM 相关开源项目在多个生态指标上的归一化得分（0~1）。"
-                "请你用中文写一段 3~5 段落的分析师风格报告，"
-                "总结谁更强、各自的优势短板，以及可能的社区演化趋势。"
-                "注意面向非技术评委，语言清晰、结构有小标题。\n\n"
-                f"{numeric_summary}"
-            )
-
-            # 定义更智能的 System Prompt
-            system_prompt = """
-你是一名负责开源生态评估的资深分析师。请根据用户提供的数据写一份深度对比报告。
-
-【内容与格式要求】：
-1. **结构必须清晰**：报告必须包含 3-4 个明确的 Markdown 小标题（使用 ### 语法），例如：
-   ### 📊 总体评分概览
-   ### 🚀 各项目核心优势
-   ### ⚠️ 潜在风险与短板
-   ### 🔮 社区演化趋势
-
-2. **重点灵活高亮**：
-   - 请识别报告中的 **关键结论、核心数据对比、或犀利的洞察**。
-   - 将这些句子用 Markdown 加粗符号（**...**）包裹。
-   - ⚠️ 不需要局限于段落开头，哪里重要就标哪里，但不要全文通篇加粗。
+    return "\n".join(summary_lines)
 
-3. **结尾强制总结**：
-   - 报告的最后，必须包含一个 Markdown 引用块（使用 > 符号）。
-   - 内容必须以 “💡 **分析师建议：**” 开头，针对不同场景给出 1-2 句具体的选型建议。
-   - 格式示例：
-     > 💡 **分析师建议：** 如果追求稳定性，推荐选择 PyTorch；如果需要快速验证 Agent，LangChain 是更好的选择。
 
-4. **语气风格**：专业、客观、见解独到。
-"""
+def build_report_messages(numeric_summary: str):
+    """组装发给大模型的 messages"""
+    prompt = (
+        "下面是一组 LLM 相关开源项目在多个生态指标上的归一化得分（0~1）。"
+        "请你用中文写一段 3~5 段落的分析师风格报告，"
+        "总结谁更强、各自的优势短板，以及可能的社区演化趋势。"
+        "注意面向非技术评委，语言清晰、结构有小标题。\n\n"
+        f"{numeric_summary}"
+    )
+    return [
+        {"role": "system", "content": REPORT_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
 
-            # 下面这部分保持不变
-            resp = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.5,
-            )
-            content = resp.choices[0].message.content
-            return jsonify({"report": content, "from_llm": True})
-        except Exception as e:
-            print("调用 LLM 失败，将使用规则模板：", e)
-    
 
-    # 4) 兜底模板
+def build_fallback_report(numeric_summary: str) -> str:
+    """未配置 OpenAI 或调用失败时的兜底模板"""
     text_lines = [
         "【LLM 项目生态概览】",
         "基于最近 12 个月的开源活动数据，我们对当前选择的 LLM 相关项目进行了五维度的生态健康度评估。",
@@ -469,7 +772,49 @@ def generate_llm_report():
         "对于综合得分较高的项目，可以进一步关注如何提升新贡献者的进入体验，巩固多样性优势；",
         "对于得分偏低的项目，则建议在文档完善、Issue 反馈响应以及社区运营等方面投入更多精力，以提升长期的可持续发展能力。"
     ]
-    return jsonify({"report": "\n".join(text_lines), "from_llm": False})
+    return "\n".join(text_lines)
+
+
+@api_bp.route("/llm/report", methods=["POST"])
+@rate_limit(max_requests=REPORT_RATE_LIMIT_MAX, window_seconds=REPORT_RATE_LIMIT_WINDOW)
+def generate_llm_report():
+    """
+    根据前端传来的项目指标，生成一段“分析师风格”的文字报告。
+    请求体结构：
+      {
+        "projects": [
+          { "repo": "pytorch/pytorch", "metrics": { "activity": 0.8, ... } },
+          ...
+        ]
+      }
+    """
+    payload = request.get_json(silent=True) or {}
+    projects = payload.get("projects", [])
+
+    if not projects:
+        raise ApiException(400, "至少需要一个项目")
+
+    numeric_summary = build_report_summary(projects)
+
+    # 如果配置了 OpenAI，则调用大模型写报告
+    openai_client = get_openai_client()
+    if openai_client is not None:
+        start = time.perf_counter()
+        try:
+            resp = openai_client.chat.completions.create(
+                model=REPORT_MODEL,
+                messages=build_report_messages(numeric_summary),
+                temperature=0.5,
+            )
+            content = resp.choices[0].message.content
+            LLM_LATENCY.labels(outcome="success").observe(time.perf_counter() - start)
+            return jsonify({"report": content, "from_llm": True})
+        except Exception as e:
+            LLM_LATENCY.labels(outcome="error").observe(time.perf_counter() - start)
+            print("调用 LLM 失败，将使用规则模板：", e)
+
+    # 兜底模板
+    return jsonify({"report": build_fallback_report(numeric_summary), "from_llm": False})
 
 # ===========================
 # LLM 项目树接口（新增）
@@ -480,50 +825,23 @@ def get_llm_projects():
     """
     返回 LLM 生态的项目树结构（用于前端选择框）
     从 config.json 的 category_tree 字段读取，并过滤掉不在 repositories 中的项目
+    （过滤结果由 config_registry 按文件版本预先算好）
     """
     try:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        
-        category_tree = config.get("category_tree", [])
-        if not category_tree:
-            raise ApiException(404, "配置文件中未定义 category_tree")
-        
-        # 获取有效项目列表（org/repo 格式）
-        valid_repos = {
-            f"{r['org']}/{r['repo']}" 
-            for r in config.get("repositories", [])
-        }
-        
-        # 过滤树结构，移除无效项目
-        def filter_tree(nodes):
-            result = []
-            for node in nodes:
-                if "children" in node and node["children"]:
-                    # 非叶子节点：递归过滤子节点
-                    filtered_children = filter_tree(node["children"])
-                    if filtered_children:  # 只保留有子节点的分类
-                        result.append({
-                            **node,
-                            "children": filtered_children
-                        })
-                else:
-                    # 叶子节点：检查是否在有效列表中
-                    if node.get("value") in valid_repos:
-                        result.append(node)
-            return result
-        
-        filtered_tree = filter_tree(category_tree)
-        
-        return jsonify({
-            "tree": filtered_tree,
-            "total_projects": len(valid_repos)
-        })
+        config = get_config()
     except FileNotFoundError:
         raise ApiException(500, "配置文件不存在")
-    except json.JSONDecodeError:
+    except (OSError, ValueError, KeyError):
         raise ApiException(500, "配置文件格式错误")
 
+    if not config.has_category_tree:
+        raise ApiException(404, "配置文件中未定义 category_tree")
+
+    return jsonify({
+        "tree": config.category_tree,
+        "total_projects": len(config.repo_names)
+    })
+
 # ===========================
 # 5. 贡献者健康预警系统（创新功能）
 # ===========================
@@ -549,7 +867,7 @@ def get_contributor_risk(platform: str, org: str, repo: str):
             "details": {...}
         }
     """
-    api_url = f"https://oss.open-digger.cn/{platform}/{org}/{repo}/bus_factor.json"
+    api_url = opendigger_url(platform, org, repo, "bus_factor")
     
     try:
         result = fetch_and_cache_data_db(api_url, platform, org, repo, "bus_factor")
@@ -671,7 +989,7 @@ def get_batch_contributor_risk():
             continue
         
         org, repo = parts
-        api_url = f"https://oss.open-digger.cn/github/{org}/{repo}/bus_factor.json"
+        api_url = opendigger_url("github", org, repo, "bus_factor")
         
         try:
             result = fetch_and_cache_data_db(api_url, "github", org, repo, "bus_factor")
@@ -0,0 +1,350 @@
+# backend/asgi.py
+"""
+ASGI 入口（生产环境异步服务模式）
+
+    python serve.py --asgi                                   # 推荐：gunicorn + uvicorn worker（preload）
+    uvicorn asgi:application --host 0.0.0.0 --port 8000      # 单进程 / 开发
+
+通过 serve.py 启动时，建表、预热标记和同步进程选举由 gunicorn.conf.py 的钩子完成；
+直接用 uvicorn 启动时由这里的 lifespan 完成（每个进程各自建表，抢到同步锁的进程负责同步 / 预热）。
+
+Flask 开发服务器里，每个上游等待（OpenDigger / OpenAI）都会占住一个线程。
+这里在 Flask 应用外面包一层 ASGI：
+  - 慢的上游 I/O 放到事件循环上，用进程内共享连接池的异步客户端完成：
+      * GET /api/data/...、/api/health/contributor-risk/...：
+        缓存缺失/过期时先异步拉取 OpenDigger 并写回 DB，再交给 Flask 从缓存返回；
+        同一个 key 的并发请求只拉一次上游；上游出错时在这里直接返回 502，不再交给 Flask 重试
+      * POST /api/llm/report：直接 await AsyncOpenAI
+  - 其余请求（以及上面请求的响应生成）通过 WSGI 适配器交给原 Flask 应用，
+    在有界线程池中并行执行
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from main import app, get_allowed_origins, init_db, db_initialized, start_sync_leader_election
+from extensions import db
+import metadata as meta
+from api.opendigger import (
+    ApiException,
+    opendigger_url,
+    get_cached_series_row,
+    is_series_fresh,
+    format_opendigger_payload,
+    store_series,
+    build_report_summary,
+    build_report_messages,
+    build_fallback_report,
+    get_async_openai_client,
+    REPORT_MODEL,
+    REPORT_RATE_LIMIT_MAX,
+    REPORT_RATE_LIMIT_WINDOW,
+)
+from rate_limiter import check_rate_limit
+from json_provider import dumps_bytes
+from metrics import LLM_LATENCY, RATE_LIMIT_DENIED, record_upstream
+from upstream import get_async_client, aclose_async_client
+from negative_cache import negative_cache
+
+# 执行 Flask 视图 / DB 读写的线程数（上游等待不占用这些线程）
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi-worker")
+
+
+def _run_in_app_context(func, *args):
+    with app.app_context():
+        return func(*args)
+
+
+# 在线程池 + Flask 应用上下文中执行同步函数（DB 访问等）
+run_in_app_context = sync_to_async(_run_in_app_context, thread_sensitive=False, executor=_executor)
+
+
+# ==== WSGI 适配：asgiref 默认把所有 WSGI 调用放进同一个线程串行执行，这里改为有界线程池 ====
+
+class _PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__["run_wsgi_app"].func,
+        thread_sensitive=False,
+        executor=_executor,
+    )
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(
+            scope, receive, send
+        )
+
+
+flask_asgi = PooledWsgiToAsgi(app)
+
+
+# ==== OpenDigger 异步预取 ====
+
+_REPO_DATA_RE = re.compile(r"^/api/data/(?P<platform>[^/]+)/(?P<entity>[^/]+)/(?P<repo>[^/]+)/(?P<metric>[^/]+)$")
+_USER_DATA_RE = re.compile(r"^/api/data/(?P<platform>[^/]+)/(?P<entity>[^/]+)/(?P<metric>[^/]+)$")
+_RISK_RE = re.compile(r"^/api/health/contributor-risk/(?P<platform>[^/]+)/(?P<org>[^/]+)/(?P<repo>[^/]+)$")
+
+# 正在进行的预取任务：{(platform, entity, repo, metric): Task}
+_inflight = {}
+
+
+def series_key_for_path(path: str):
+    """
+    返回该 GET 请求会读取的 (platform, entity, repo, metric)
+    与 Flask 视图的校验规则保持一致；不会触发上游请求的路径返回 None
+    """
+    m = _REPO_DATA_RE.match(path)
+    if m:
+        if not meta.is_supported_platform(m["platform"]):
+            return None
+        return (m["platform"], m["entity"], m["repo"], m["metric"])
+
+    m = _USER_DATA_RE.match(path)
+    if m:
+        platform, entity = m["platform"], m["entity"]
+        if not meta.is_supported_platform(platform) or meta.get_entity_type(platform, entity) != "user":
+            return None
+        return (platform, entity, None, m["metric"])
+
+    m = _RISK_RE.match(path)
+    if m:
+        return (m["platform"], m["org"], m["repo"], "bus_factor")
+    return None
+
+
+def _needs_refresh(key) -> bool:
+    # 已知上游不存在：交给 Flask 直接返回 404
+    if negative_cache.is_missing(*key):
+        return False
+    return not is_series_fresh(get_cached_series_row(*key))
+
+
+def _record_missing(key, reason: str):
+    negative_cache.record(*key, reason=reason)
+
+
+def _store(key, formatted_data):
+    platform, entity, repo, metric = key
+    try:
+        store_series(get_cached_series_row(*key), platform, entity, repo, metric, formatted_data)
+    except Exception:
+        # 其他进程可能已同时写入同一行，交给 Flask 按缓存读取即可
+        db.session.rollback()
+
+
+async def _prefetch(key):
+    """
+    返回 None：交给 Flask 从缓存 / 负缓存响应；
+    返回错误信息：上游出错，由 ASGI 层直接返回 502（与 refresh_series 的错误信息一致）
+    """
+    try:
+        if not await run_in_app_context(_needs_refresh, key):
+            return None
+
+        start = time.perf_counter()
+        status = "error"
+        try:
+            resp = await get_async_client().get(opendigger_url(*key))
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            app.logger.warning("OpenDigger 异步预取失败 %s: %r", key, e)
+            return f"请求 OpenDigger 失败：{e!r}"
+        finally:
+            record_upstream("opendigger", status, time.perf_counter() - start)
+        if resp.status_code == 404:
+            # 记入负缓存后交给 Flask，Flask 命中负缓存直接返回 404，不再重复请求上游
+            await run_in_app_context(_record_missing, key, "404")
+            return None
+        if resp.status_code != 200:
+            app.logger.warning("OpenDigger 异步预取失败 %s: HTTP %s", key, resp.status_code)
+            return f"OpenDigger 上游 HTTP 错误：{resp.status_code}"
+
+        try:
+            formatted_data = format_opendigger_payload(resp.json())
+        except ValueError:
+            return "OpenDigger 返回格式异常（非 JSON）"
+        except ApiException as e:
+            if e.status_code == 404:
+                await run_in_app_context(_record_missing, key, "empty")
+                return None
+            return e.detail
+
+        await run_in_app_context(_store, key, formatted_data)
+    except Exception:
+        # 预取本身的异常（不是上游错误）：交给 Flask 按原逻辑处理
+        app.logger.exception("OpenDigger 异步预取失败: %s", key)
+    return None
+
+
+async def prefetch_series(key):
+    """单飞（single-flight）预取：同一 key 的并发请求共享一个上游请求（和它的结果）"""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_prefetch(key))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    # 客户端断开时只取消自己的等待，不取消共享的预取任务
+    return await asyncio.shield(task)
+
+
+# ==== /api/llm/report 原生异步实现 ====
+
+def _decode_headers(scope):
+    return {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+def _client_ip(scope, headers):
+    client_ip = headers.get("x-forwarded-for")
+    if client_ip:
+        return client_ip.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+def _cors_headers(headers):
+    """与 Flask-CORS 的配置一致：来源在白名单内才回写 CORS 头"""
+    origin = headers.get("origin")
+    if origin and origin in get_allowed_origins():
+        return [
+            (b"access-control-allow-origin", origin.encode("latin-1")),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+    return []
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, status: int, payload, extra_headers=()):
+    body = dumps_bytes(payload)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *extra_headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def llm_report(scope, receive, send):
+    """与 Flask 版 generate_llm_report 行为一致，但 OpenAI 调用不占线程"""
+    headers = _decode_headers(scope)
+    cors = _cors_headers(headers)
+
+    limit_key = f"{_client_ip(scope, headers)}:api.generate_llm_report"
+    allowed, remaining = check_rate_limit(limit_key, REPORT_RATE_LIMIT_MAX, REPORT_RATE_LIMIT_WINDOW)
+    if not allowed:
+        RATE_LIMIT_DENIED.labels(endpoint="api.generate_llm_report").inc()
+        await _send_json(send, 429, {
+            "detail": f"请求过于频繁，请 {REPORT_RATE_LIMIT_WINDOW} 秒后重试",
+            "error_code": "RATE_LIMIT_EXCEEDED"
+        }, [
+            (b"retry-after", str(REPORT_RATE_LIMIT_WINDOW).encode()),
+            (b"x-ratelimit-limit", str(REPORT_RATE_LIMIT_MAX).encode()),
+            (b"x-ratelimit-remaining", b"0"),
+            *cors,
+        ])
+        return
+
+    rate_headers = [
+        (b"x-ratelimit-limit", str(REPORT_RATE_LIMIT_MAX).encode()),
+        (b"x-ratelimit-remaining", str(remaining).encode()),
+        *cors,
+    ]
+
+    try:
+        payload = json.loads(await _read_body(receive) or b"{}")
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+
+    projects = payload.get("projects", [])
+    if not projects:
+        await _send_json(send, 400, {"detail": "至少需要一个项目"}, cors)
+        return
+
+    numeric_summary = build_report_summary(projects)
+
+    openai_client = get_async_openai_client()
+    if openai_client is not None:
+        start = time.perf_counter()
+        try:
+            resp = await openai_client.chat.completions.create(
+                model=REPORT_MODEL,
+                messages=build_report_messages(numeric_summary),
+                temperature=0.5,
+            )
+            content = resp.choices[0].message.content
+            LLM_LATENCY.labels(outcome="success").observe(time.perf_counter() - start)
+            await _send_json(send, 200, {"report": content, "from_llm": True}, rate_headers)
+            return
+        except Exception as e:
+            LLM_LATENCY.labels(outcome="error").observe(time.perf_counter() - start)
+            print("调用 LLM 失败，将使用规则模板：", e)
+
+    await _send_json(send, 200, {"report": build_fallback_report(numeric_summary), "from_llm": False}, rate_headers)
+
+
+# ==== lifespan ====
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if not db_initialized():
+                # 直接用 uvicorn 启动（没有经过 gunicorn.conf.py 的 preload / post_fork 钩子）
+                await asyncio.get_running_loop().run_in_executor(
+                    _executor, lambda: init_db(app, mark_warmup_pending=False)
+                )
+                start_sync_leader_election(app, mark_warmup_pending=True)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aclose_async_client()
+            _executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http":
+        method, path = scope["method"], scope["path"]
+        if method == "POST" and path == "/api/llm/report":
+            await llm_report(scope, receive, send)
+            return
+        if method == "GET":
+            key = series_key_for_path(path)
+            if key is not None:
+                error = await prefetch_series(key)
+                if error is not None:
+                    await _send_json(send, 502, {"detail": error}, _cors_headers(_decode_headers(scope)))
+                    return
+
+    await flask_asgi(scope, receive, send)
@@ -0,0 +1,229 @@
+# backend/auth_cache.py
+"""
+认证相关的进程内缓存 + JWT 密钥轮换
+
+1. 用户资料缓存（USER_CACHE_SIZE 条 LRU，USER_CACHE_TTL_SECONDS 过期）：
+   get_user_profile(user_id) 命中时不查库；User 行被更新 / 删除时（SQLAlchemy 事件）本进程立即失效，
+   其他进程最多 TTL 秒后失效
+2. 已验证 token 缓存（JWT_DECODE_CACHE_SIZE 条 LRU）：同一个 token 只做一次签名校验和解码，
+   之后直接返回解码结果；按 token 的 exp 过期，密钥环变化时整体清空。键是 token 的 blake2b 摘要，不保存原文
+3. 密钥轮换（可选）：
+     JWT_KEYS_FILE   JSON 文件 {"active": "k2", "keys": {"k1": "...", "k2": "..."}}，
+                     每 JWT_KEYS_CHECK_SECONDS 秒按 (inode, mtime, size) 检查一次，替换文件即可轮换
+     JWT_SECRET_KEYS "k2:secret2,k1:secret1"（第一个用于签发）
+   新 token 用 active 密钥签发并在头部带 kid；校验时按 kid 选密钥，kid 不在密钥环里的 token 一律拒绝；
+   没有 kid 的旧 token 用 JWT_SECRET_KEY 校验。都没配置时与原来一样只用 JWT_SECRET_KEY。
+"""
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config as jwt_config
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+JWT_DECODE_CACHE_SIZE = int(os.getenv("JWT_DECODE_CACHE_SIZE", "4096"))
+JWT_KEYS_FILE = os.getenv("JWT_KEYS_FILE", "")
+JWT_SECRET_KEYS = os.getenv("JWT_SECRET_KEYS", "")
+JWT_KEYS_CHECK_SECONDS = float(os.getenv("JWT_KEYS_CHECK_SECONDS", "5"))
+
+
+class TTLCache:
+    """按条目数限制、带过期时间的线程安全 LRU"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()     # key → (过期时间 epoch 秒, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value, expires_at: float | None = None):
+        if self.max_entries <= 0:
+            return
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ==== 用户资料 ====
+
+profile_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+
+def get_user_profile(user_id: int):
+    """User.to_dict()（只读，不要修改）；用户不存在时返回 None（不缓存）"""
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        from models import User
+
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        profile = user.to_dict()
+        profile_cache.put(user_id, profile)
+    return profile
+
+
+def _invalidate_user(mapper, connection, target):
+    profile_cache.pop(target.id)
+
+
+# ==== 密钥环 ====
+
+# (token 摘要, 密钥环版本) → 已验证的解码结果，按 token 的 exp 过期
+decoded_token_cache = TTLCache(JWT_DECODE_CACHE_SIZE)
+_REJECT_KEY = secrets.token_hex(32)   # kid 未知时返回的密钥：签名校验必然失败
+
+
+class KeyRing:
+    """kid → secret；active 用于签发。version 在密钥环变化时改变（用来清空 token 缓存）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.keys = {}
+        self.active = None
+        self.version = 0
+        self._identity = None
+        self._next_check = 0.0
+        if JWT_SECRET_KEYS and not JWT_KEYS_FILE:
+            pairs = [item.split(":", 1) for item in JWT_SECRET_KEYS.split(",") if ":" in item]
+            self._set({"active": pairs[0][0].strip(), "keys": {k.strip(): v.strip() for k, v in pairs}}
+                      if pairs else None)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(JWT_KEYS_FILE or self.keys)
+
+    def refresh(self):
+        """JWT_KEYS_FILE 被替换时重新加载；解析失败时保留上一个版本"""
+        if not JWT_KEYS_FILE or time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + JWT_KEYS_CHECK_SECONDS
+            try:
+                with open(JWT_KEYS_FILE, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                    if identity == self._identity:
+                        return
+                    data = json.loads(f.read().decode("utf-8"))
+                if data.get("active") not in data.get("keys", {}):
+                    raise ValueError("active 不在 keys 中")
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"⚠️  加载 JWT 密钥环失败，继续使用上一个版本: {e}")
+                return
+            self._identity = identity
+            self._set(data)
+
+    def _set(self, data):
+        if not data:
+            return
+        self.keys = dict(data["keys"])
+        self.active = data["active"]
+        self.version += 1
+        decoded_token_cache.clear()
+
+
+keyring = KeyRing()
+
+
+# ==== JWTManager ====
+
+def _token_digest(encoded_token: str) -> bytes:
+    return hashlib.blake2b(encoded_token.encode("utf-8"), digest_size=16).digest()
+
+
+class CachingJWTManager(JWTManager):
+    """
+    在 flask_jwt_extended 的解码入口加一层已验证 token 缓存（只缓存请求头里的普通校验：
+    不带 CSRF、不允许过期），并接入密钥环（签发带 kid，校验按 kid 选密钥）
+    """
+
+    def init_app(self, app, add_context_processor: bool = False):
+        super().init_app(app, add_context_processor)
+        self.encode_key_loader(self._encode_key)
+        self.decode_key_loader(self._decode_key)
+        self.additional_headers_loader(self._kid_header)
+
+    @staticmethod
+    def _encode_key(identity):
+        keyring.refresh()
+        if keyring.enabled and keyring.active:
+            return keyring.keys[keyring.active]
+        return jwt_config.encode_key
+
+    @staticmethod
+    def _kid_header(identity):
+        keyring.refresh()     # 头部回调先于 _encode_key 调用
+        if keyring.enabled and keyring.active:
+            return {"kid": keyring.active}
+        return {}
+
+    @staticmethod
+    def _decode_key(headers, payload):
+        keyring.refresh()
+        kid = headers.get("kid")
+        if kid is None:
+            return jwt_config.decode_key      # 启用轮换前签发的 token
+        return keyring.keys.get(kid, _REJECT_KEY)
+
+    # 覆盖 flask_jwt_extended 的私有方法（签名按 4.7.x），requirements.txt 固定了 4.7.x，升级时需核对
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        if csrf_value is not None or allow_expired or JWT_DECODE_CACHE_SIZE <= 0:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        keyring.refresh()
+        cache_key = (_token_digest(encoded_token), keyring.version)
+        decoded = decoded_token_cache.get(cache_key)
+        if decoded is None:
+            decoded = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            exp = decoded.get("exp")
+            if exp is not None:
+                leeway = jwt_config.leeway
+                leeway = leeway.total_seconds() if hasattr(leeway, "total_seconds") else leeway
+                decoded_token_cache.put(cache_key, decoded, expires_at=exp + leeway)
+        # 浅拷贝：调用方（get_jwt 等）拿到的字典互不影响
+        return dict(decoded)
+
+
+def init_auth_cache(app):
+    """User 行更新 / 删除时让本进程的资料缓存失效"""
+    from sqlalchemy import event
+    from models import User
+
+    if not event.contains(User, "after_update", _invalidate_user):
+        event.listen(User, "after_update", _invalidate_user)
+        event.listen(User, "after_delete", _invalidate_user)
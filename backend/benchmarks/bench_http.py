@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# backend/benchmarks/bench_http.py
+"""
+后端 HTTP 接口压测（自带 asyncio 负载生成器，可复现）
+
+流程（对每个数据规模分别执行）：
+  1. 在临时目录建一个新的 openrank.db，写入合成的 MetricSeries（config.json 里的项目 + 填充序列）；
+     后端的运行时文件目录（OPENRANK_DATA_DIR）也指向这个临时目录
+  2. 启动本地 OpenDigger 桩服务（可配置延迟），替代真实上游
+  3. 以子进程方式启动后端（gunicorn / uvicorn），关闭限流、后台同步和 OpenAI
+  4. 对每个接口以固定并发压测若干秒，统计 p50/p95/p99、RPS、错误数
+结果写入 JSON，可用 --compare 与上一次发布的结果对比，超出阈值时以非 0 退出码结束。
+
+使用方法：
+    python benchmarks/bench_http.py                              # 默认规模 100,10000,100000
+    python benchmarks/bench_http.py --scales 100 --duration 5
+    python benchmarks/bench_http.py --server uvicorn --workers 2
+    python benchmarks/bench_http.py --compare benchmarks/results/v1.2.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform as py_platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+CONFIG_FILE = BACKEND_ROOT / "config.json"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+DEFAULT_SCALES = (100, 10_000, 100_000)
+FILLER_METRICS = ("openrank", "activity", "stars", "participants", "bus_factor", "new_contributors")
+HISTORY_MONTHS = 36
+BENCH_PASSWORD = "bench-password-123"
+
+
+# ==== 合成数据 ====
+
+def _months(n: int, end_year: int = 2025, end_month: int = 12):
+    """生成以 end_year-end_month 结尾的 n 个月份字符串"""
+    months = []
+    y, m = end_year, end_month
+    for _ in range(n):
+        months.append(f"{y:04d}-{m:02d}")
+        m -= 1
+        if m == 0:
+            y, m = y - 1, 12
+    return list(reversed(months))
+
+
+def _series_json(rng: random.Random, months) -> str:
+    base = rng.uniform(1, 500)
+    return json.dumps(
+        [{"month": mo, "count": round(base * rng.uniform(0.6, 1.4), 2)} for mo in months],
+        ensure_ascii=False,
+    )
+
+
+def seed_database(db_path: Path, scale: int, seed: int = 42):
+    """
+    建表并写入 scale 条 MetricSeries：
+      - config.json 中每个项目的 openrank / activity / bus_factor（保证汇总、排名、风险接口有数据）
+      - 其余用 bench-org*/repo* 的填充序列补足
+    返回 (config 中的项目列表, 实际写入条数)
+    """
+    # 运行时文件（预热状态等）写在临时目录里，不碰 backend/data/
+    env = dict(os.environ, OPENRANK_DB_PATH=str(db_path), OPENRANK_DATA_DIR=str(db_path.parent))
+    subprocess.run(
+        [sys.executable, "-c", "from main import app, init_db; init_db(app)"],
+        cwd=BACKEND_ROOT, env=env, check=True,
+    )
+
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        repos = json.load(f).get("repositories", [])
+
+    rng = random.Random(seed)
+    months = _months(HISTORY_MONTHS)
+    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    rows = []
+    for r in repos:
+        for metric in ("openrank", "activity", "bus_factor"):
+            if len(rows) >= scale:
+                break
+            rows.append((r["platform"], r["org"], r["repo"], metric, _series_json(rng, months), now))
+
+    i = 0
+    while len(rows) < scale:
+        org, repo = f"bench-org{i // 50}", f"repo{i % 50}"
+        for metric in FILLER_METRICS:
+            if len(rows) >= scale:
+                break
+            rows.append(("github", org, repo, metric, _series_json(rng, months), now))
+        i += 1
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO metric_series (platform, entity, repo, metric, data_json, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.close()
+    return repos, len(rows)
+
+
+# ==== OpenDigger 桩服务 ====
+
+def start_opendigger_stub(latency_ms: float):
+    """本地 OpenDigger 桩：任意 *.json 返回 36 个月的数据，路径含 missing 时返回 404"""
+    months = _months(HISTORY_MONTHS)
+    body = json.dumps({mo: round(10 + idx * 0.5, 2) for idx, mo in enumerate(months)}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if "missing" in self.path:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ==== 后端子进程 ====
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(server: str, workers: int, db_path: Path, stub_url: str, workdir: Path):
+    port = _free_port()
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    env.update({
+        "OPENRANK_DB_PATH": str(db_path),
+        # 快照 / 汇总 / 同步锁 / 预热状态都用临时目录：测的是种子数据，也不和线上进程抢同步锁
+        "OPENRANK_DATA_DIR": str(workdir),
+        "OPENDIGGER_BASE_URL": stub_url,
+        "RATE_LIMIT_ENABLED": "0",
+        "BACKGROUND_SYNC": "0",
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+        "GUNICORN_ACCESS_LOG": "",
+        "GUNICORN_LOG_LEVEL": "warning",
+    })
+
+    if server == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:application",
+               "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"]
+
+    log = open(workdir / f"{server}.log", "w")
+    proc = subprocess.Popen(cmd, cwd=BACKEND_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            resp = await client.get(f"{base_url}/api/platforms")
+            if resp.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("后端启动超时")
+
+
+# ==== 负载生成 ====
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+async def run_endpoint(client, make_request, concurrency: int, duration: float, warmup: float):
+    """
+    make_request(i) -> (method, url, kwargs)
+    在 duration 秒内以固定并发持续发请求，返回统计结果
+    """
+    latencies = []
+    statuses = {}
+    errors = 0
+    counter = 0
+    measuring = False
+    stop_at = time.monotonic() + warmup + duration
+
+    async def worker():
+        nonlocal counter, errors
+        while time.monotonic() < stop_at:
+            counter += 1
+            method, url, kwargs = make_request(counter)
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+                status = resp.status_code
+            except Exception:
+                status = "error"
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if not measuring:
+                continue
+            latencies.append(elapsed_ms)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == "error" or status >= 500:
+                errors += 1
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    await asyncio.sleep(warmup)
+    measuring = True
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status": statuses,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def build_workloads(base_url: str, repos, token: str, login_username: str):
+    """接口名 -> make_request(i)"""
+    repo_keys = [(r["platform"], r["org"], r["repo"]) for r in repos] or [("github", "bench-org0", "repo0")]
+    run_id = f"{os.getpid()}{int(time.time())}"
+
+    def pick(i):
+        return repo_keys[i % len(repo_keys)]
+
+    return {
+        "data_cached": lambda i: ("GET", "{}/api/data/{}/{}/{}/openrank".format(base_url, *pick(i)), {}),
+        "data_upstream_miss": lambda i: (
+            "GET", f"{base_url}/api/data/github/stub-org/miss-{run_id}-{i}/openrank", {}),
+        "data_upstream_404": lambda i: (
+            "GET", f"{base_url}/api/data/github/stub-org/missing-{i % 100}/openrank", {}),
+        "llm_summary": lambda i: ("GET", f"{base_url}/api/llm/summary", {}),
+        "llm_rank": lambda i: ("GET", f"{base_url}/api/llm/rank/health_score?top=10", {}),
+        "contributor_risk": lambda i: (
+            "GET", "{}/api/health/contributor-risk/{}/{}/{}".format(base_url, *pick(i)), {}),
+        "auth_register": lambda i: ("POST", f"{base_url}/api/auth/register", {"json": {
+            "username": f"b{run_id}_{i}"[:32], "email": f"b{run_id}_{i}@bench.dev",
+            "password": BENCH_PASSWORD}}),
+        "auth_login": lambda i: ("POST", f"{base_url}/api/auth/login", {"json": {
+            "username": login_username, "password": BENCH_PASSWORD}}),
+        "auth_me": lambda i: ("GET", f"{base_url}/api/auth/me", {
+            "headers": {"Authorization": f"Bearer {token}"}}),
+    }
+
+
+async def bench_scale(args, scale: int, stub_url: str):
+    import httpx
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"openrank-bench-{scale}-"))
+    db_path = workdir / "openrank.db"
+    try:
+        t0 = time.perf_counter()
+        repos, seeded = seed_database(db_path, scale)
+        seed_seconds = time.perf_counter() - t0
+        print(f"🌱 规模 {scale}: 写入 {seeded} 条序列，用时 {seed_seconds:.1f}s，DB {db_path.stat().st_size / 1e6:.1f} MB")
+
+        proc, base_url = start_backend(args.server, args.workers, db_path, stub_url, workdir)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+                await wait_ready(client, base_url)
+
+                # 准备一个可登录的账号
+                login_username = f"bench_{os.getpid()}"
+                await client.post(f"{base_url}/api/auth/register", json={
+                    "username": login_username, "email": f"{login_username}@bench.dev",
+                    "password": BENCH_PASSWORD})
+                resp = await client.post(f"{base_url}/api/auth/login", json={
+                    "username": login_username, "password": BENCH_PASSWORD})
+                token = resp.json().get("access_token", "")
+
+                workloads = build_workloads(base_url, repos, token, login_username)
+                selected = args.endpoints or list(workloads)
+                results = {}
+                for name in selected:
+                    stats = await run_endpoint(
+                        client, workloads[name], args.concurrency, args.duration, args.warmup
+                    )
+                    results[name] = stats
+                    print(f"   {name:<20} rps={stats['rps']:>9.1f}  p50={stats['p50_ms']:>8.2f}ms  "
+                          f"p95={stats['p95_ms']:>8.2f}ms  p99={stats['p99_ms']:>8.2f}ms  errors={stats['errors']}")
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+        return {
+            "series": seeded,
+            "seed_seconds": round(seed_seconds, 3),
+            "db_bytes": db_path.stat().st_size,
+            "endpoints": results,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ==== 结果对比 ====
+
+def compare_results(current, baseline, max_regression: float):
+    """返回回归项列表：p95 变慢或 RPS 下降超过 max_regression 比例"""
+    regressions = []
+    for scale, cur_scale in current["scales"].items():
+        base_scale = baseline.get("scales", {}).get(scale)
+        if not base_scale:
+            continue
+        for name, cur in cur_scale["endpoints"].items():
+            base = base_scale["endpoints"].get(name)
+            if not base:
+                continue
+            if base["p95_ms"] > 0 and cur["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+                regressions.append(f"[{scale}] {name}: p95 {base['p95_ms']:.2f}ms -> {cur['p95_ms']:.2f}ms")
+            if base["rps"] > 0 and cur["rps"] < base["rps"] * (1 - max_regression):
+                regressions.append(f"[{scale}] {name}: rps {base['rps']:.1f} -> {cur['rps']:.1f}")
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def amain(args):
+    stub, stub_url = start_opendigger_stub(args.upstream_latency_ms)
+    try:
+        report = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "git_revision": _git_revision(),
+                "python": py_platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "server": args.server,
+                "workers": args.workers,
+                "concurrency": args.concurrency,
+                "duration_seconds": args.duration,
+                "upstream_latency_ms": args.upstream_latency_ms,
+            },
+            "scales": {},
+        }
+        for scale in args.scales:
+            report["scales"][str(scale)] = await bench_scale(args, scale, stub_url)
+        return report
+    finally:
+        stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端 HTTP 接口压测")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")],
+                        default=list(DEFAULT_SCALES), help="MetricSeries 条数，逗号分隔")
+    parser.add_argument("--endpoints", type=lambda s: s.split(","), default=None,
+                        help="只压测指定接口，逗号分隔（默认全部）")
+    parser.add_argument("--server", choices=("gunicorn", "uvicorn"), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="每个接口压测秒数")
+    parser.add_argument("--warmup", type=float, default=1.0, help="每个接口预热秒数（不计入统计）")
+    parser.add_argument("--upstream-latency-ms", type=float, default=200.0, help="OpenDigger 桩的响应延迟")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    parser.add_argument("--compare", type=Path, default=None, help="与之前的结果 JSON 对比")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的最大回归比例")
+    args = parser.parse_args()
+
+    report = asyncio.run(amain(args))
+
+    output = args.output or RESULTS_DIR / f"http-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 结果已写入: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ 相比 {args.compare} 出现性能回归：")
+            for line in regressions:
+                print(f"   • {line}")
+            return 1
+        print(f"\n✅ 相比 {args.compare} 无明显回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# backend/benchmarks/bench_metric_utils.py
+"""
+metric_utils 与 LLM 汇总计算的微基准
+
+覆盖：
+  - 标量函数：mean / std_population / tail_n_values / calculate_health_score / Series.tail_values
+  - data_json 的 JSON 解码
+  - 序列查询（series_ops）：按季聚合、LTTB 降采样
+  - 完整的 compute_llm_summary_from_db（临时库 + 合成数据）
+输入是合成的月度历史：不同长度、缺失月份、None / 非数值、乱序。
+每个用例记录耗时（min / median / mean / stdev，单位 us）和单次运行的峰值内存分配（tracemalloc）。
+
+使用方法：
+    python benchmarks/bench_metric_utils.py
+    python benchmarks/bench_metric_utils.py --filter tail_n_values --rounds 20
+    python benchmarks/bench_metric_utils.py --output benchmarks/results/metric-v1.3.json
+    python benchmarks/bench_metric_utils.py --compare benchmarks/results/metric-v1.3.json --max-regression 0.25
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(BACKEND_ROOT))
+
+HISTORY_LENGTHS = (12, 60, 240, 1000)
+SUMMARY_SCALES = (100, 10_000)
+# 峰值分配低于该值时只是解释器噪声，不参与回归判断
+MIN_COMPARED_ALLOC_BYTES = 4096
+
+
+# ==== 合成历史 ====
+
+def make_history(length: int, missing_ratio: float = 0.0, none_ratio: float = 0.0,
+                 shuffled: bool = False, seed: int = 7):
+    """
+    生成 length 个月的 [{month, count}]：
+      missing_ratio 比例的月份被删掉（缺月），none_ratio 比例的值为 None 或非数值字符串
+    """
+    rng = random.Random(seed)
+    records = []
+    y, m = 2000, 1
+    for _ in range(length):
+        month = f"{y:04d}-{m:02d}"
+        m += 1
+        if m == 13:
+            y, m = y + 1, 1
+        if rng.random() < missing_ratio:
+            continue
+        if rng.random() < none_ratio:
+            value = None if rng.random() < 0.8 else "n/a"
+        else:
+            value = round(rng.uniform(0, 1000), 2)
+        records.append({"month": month, "count": value})
+    if shuffled:
+        rng.shuffle(records)
+    return records
+
+
+def check_tail_consistency():
+    """
+    tail_n_values 对记录列表和对 Series 的结果必须一致（记录按月连续：无缺月，可以有 None / 乱序），
+    不一致时汇总结果会随调用方传入的类型变化
+    """
+    from metric_utils import tail_n_values
+    from series import Series
+
+    inputs = [make_history(length, none_ratio=none_ratio, shuffled=shuffled, seed=seed)
+              for length in (1, 11, 12, 13, 60) for none_ratio in (0.0, 0.3) for shuffled in (False, True)
+              for seed in (1, 2, 3)]
+    # 最后一个月为 None：记录形式取最后 12 条再丢掉 None，不能往前多取一个月
+    trailing_none = make_history(13)
+    trailing_none[-1]["count"] = None
+    inputs.append(trailing_none)
+
+    for records in inputs:
+        for n in (1, 6, 12):
+            expected = tail_n_values(records, n=n)
+            actual = tail_n_values(Series.from_records(records), n=n)
+            assert actual == expected, f"tail_n_values 不一致（n={n}）：记录 {expected} / Series {actual}"
+
+
+# ==== 计时 / 内存 ====
+
+def run_case(func, rounds: int, min_round_seconds: float):
+    """自动校准每轮执行次数，返回耗时统计与峰值分配"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_seconds or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_round_seconds / 10 else 2
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number * 1e6)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "rounds": rounds,
+        "number": number,
+        "min_us": round(min(per_call), 3),
+        "median_us": round(statistics.median(per_call), 3),
+        "mean_us": round(statistics.fmean(per_call), 3),
+        "stdev_us": round(statistics.pstdev(per_call), 3),
+        "peak_alloc_bytes": peak,
+    }
+
+
+# ==== 用例 ====
+
+def scalar_cases():
+    from metric_utils import mean, std_population, tail_n_values, calculate_health_score
+    from series import Series
+
+    cases = {}
+    for length in HISTORY_LENGTHS:
+        variants = {
+            "clean": make_history(length),
+            "missing20": make_history(length, missing_ratio=0.2),
+            "none10": make_history(length, none_ratio=0.1),
+            "shuffled": make_history(length, shuffled=True),
+        }
+        for variant, records in variants.items():
+            cases[f"tail_n_values[{length}-{variant}]"] = (lambda r=records: tail_n_values(r, n=12))
+
+        blob = json.dumps(make_history(length), ensure_ascii=False)
+        cases[f"json_decode[{length}]"] = (lambda b=blob: json.loads(b))
+        cases[f"decode_tail12[{length}]"] = (lambda b=blob: tail_n_values(json.loads(b), n=12))
+        cases[f"decode_series_tail12[{length}]"] = (
+            lambda b=blob: Series.from_records(json.loads(b)).tail_values(12)
+        )
+        series = Series.from_records(make_history(length, missing_ratio=0.2))
+        cases[f"series_tail_values[{length}]"] = (lambda s=series: s.tail_values(12))
+
+        values = [float(r["count"]) for r in make_history(length)]
+        cases[f"mean[{length}]"] = (lambda v=values: mean(v))
+        cases[f"std_population[{length}]"] = (lambda v=values: std_population(v))
+
+    from series_format import to_compact
+    from series_ops import SeriesQuery, apply_query
+
+    for length in HISTORY_LENGTHS:
+        compact = to_compact(make_history(length, missing_ratio=0.1))
+        for label, query in {
+            "quarter": SeriesQuery(None, None, "quarter", "mean", None),
+            "lttb100": SeriesQuery(None, None, "month", "mean", 100),
+        }.items():
+            cases[f"series_query[{length}-{label}]"] = (lambda c=compact, q=query: apply_query(c, q))
+
+    cases["calculate_health_score"] = lambda: calculate_health_score(0.8, 0.6, 0.9)
+    cases["calculate_health_score[weights]"] = lambda: calculate_health_score(
+        0.8, 0.6, 0.9, {"openrank": 0.4, "activity": 0.4, "stability": 0.2}
+    )
+    return cases
+
+
+def summary_cases(workdir: Path):
+    """
+    为每个规模建一个临时库，返回 {用例名: func}
+    compute_llm_summary_from_db 需要应用上下文；每个规模单独创建一个 app 指向对应的库
+    """
+    from bench_http import seed_database
+    from flask import Flask
+    from extensions import db
+    from api.opendigger import compute_llm_summary_from_db
+
+    cases = {}
+    for scale in SUMMARY_SCALES:
+        db_path = workdir / f"summary-{scale}.db"
+        seed_database(db_path, scale)
+
+        app = Flask(f"bench-summary-{scale}")
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+        app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+        db.init_app(app)
+
+        def run(app=app):
+            with app.app_context():
+                compute_llm_summary_from_db()
+                db.session.remove()
+
+        cases[f"compute_llm_summary_from_db[{scale}]"] = run
+    return cases
+
+
+def compare_results(current, baseline, max_regression: float):
+    regressions = []
+    for name, cur in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        if base["median_us"] > 0 and cur["median_us"] > base["median_us"] * (1 + max_regression):
+            regressions.append(f"{name}: median {base['median_us']:.2f}us -> {cur['median_us']:.2f}us")
+        if base["peak_alloc_bytes"] >= MIN_COMPARED_ALLOC_BYTES and cur["peak_alloc_bytes"] > base["peak_alloc_bytes"] * (1 + max_regression):
+            regressions.append(f"{name}: peak {base['peak_alloc_bytes']}B -> {cur['peak_alloc_bytes']}B")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="metric_utils 与汇总计算微基准")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-seconds", type=float, default=0.05)
+    parser.add_argument("--filter", default=None, help="只运行名称包含该子串的用例")
+    parser.add_argument("--skip-summary", action="store_true", help="跳过需要建库的汇总用例")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": sys.version.split()[0],
+            "rounds": args.rounds,
+        },
+        "cases": {},
+    }
+
+    check_tail_consistency()
+
+    with tempfile.TemporaryDirectory(prefix="openrank-microbench-") as tmp:
+        cases = scalar_cases()
+        if not args.skip_summary:
+            cases.update(summary_cases(Path(tmp)))
+
+        for name, func in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            stats = run_case(func, args.rounds, args.min_round_seconds)
+            report["cases"][name] = stats
+            print(f"   {name:<45} median={stats['median_us']:>12.2f}us  "
+                  f"min={stats['min_us']:>12.2f}us  peak={stats['peak_alloc_bytes']:>10}B")
+
+    output = args.output or RESULTS_DIR / f"metric-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 结果已写入: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ 相比 {args.compare} 出现性能回归：")
+            for line in regressions:
+                print(f"   • {line}")
+            return 1
+        print(f"\n✅ 相比 {args.compare} 无明显回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
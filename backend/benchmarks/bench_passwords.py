@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# backend/benchmarks/bench_passwords.py
+"""
+密码哈希基准：每种 KDF 配置的单次校验耗时、并发登录吞吐（次/秒），
+以及登录高峰期间同进程里"轻请求"的延迟（KDF 在请求线程里跑 vs 在进程池里跑）
+
+配置：
+  werkzeug-default   werkzeug generate_password_hash 默认（改造前的行为）
+  scrypt             passwords.py 当前 scrypt 参数
+  scrypt-n14         N=2^14（更便宜的 scrypt）
+  argon2id           passwords.py 当前 argon2id 参数（需要 argon2-cffi）
+  pbkdf2             werkzeug 旧版 pbkdf2 哈希（只用于验证兼容 / 升级）
+
+使用方法：
+    python benchmarks/bench_passwords.py
+    python benchmarks/bench_passwords.py --logins 64 --threads 16 --pool-workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_ROOT))
+
+import passwords  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def make_hashes():
+    """配置名 → 该配置生成的哈希"""
+    hashes = {
+        "werkzeug-default": generate_password_hash(PASSWORD),
+        "scrypt": passwords._hash(PASSWORD, passwords.scheme_params("scrypt")),
+        "scrypt-n14": passwords._hash(PASSWORD, {**passwords.scheme_params("scrypt"), "n": 1 << 14}),
+        "pbkdf2": generate_password_hash(PASSWORD, method="pbkdf2"),
+    }
+    if passwords.PasswordHasher is not None:
+        hashes["argon2id"] = passwords._hash(PASSWORD, passwords.scheme_params("argon2id"))
+    return hashes
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+
+def probe_latency(stop: threading.Event, samples: list):
+    """模拟同进程里的轻请求：每 5ms 做一次小 JSON 编码，记录实际耗时（含等 GIL / CPU 的时间）"""
+    payload = {"data": [{"month": f"2024-{m:02d}", "count": m} for m in range(1, 13)]}
+    while not stop.is_set():
+        start = time.perf_counter()
+        json.dumps(payload)
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+
+
+def run_burst(password_hash: str, logins: int, threads: int, pool=None):
+    """threads 个请求线程并发完成 logins 次校验；返回 (次/秒, 轻请求 p99 毫秒)"""
+    def login(_):
+        if pool is None:
+            return passwords._verify(password_hash, PASSWORD)
+        return pool.submit(passwords._verify, password_hash, PASSWORD).result()
+
+    samples, stop = [], threading.Event()
+    prober = threading.Thread(target=probe_latency, args=(stop, samples))
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(login, range(logins)))
+    seconds = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    assert all(results), "校验失败"
+    return logins / seconds, percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码哈希 / 登录吞吐基准")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=8, help="并发请求线程数")
+    parser.add_argument("--pool-workers", type=int, default=passwords.PASSWORD_POOL_WORKERS)
+    args = parser.parse_args()
+
+    hashes = make_hashes()
+    print(f"⚙️  当前方案: {passwords.scheme_params()}，进程池 {args.pool_workers} 个进程，"
+          f"{args.threads} 个请求线程 × {args.logins} 次登录\n")
+
+    pool = ProcessPoolExecutor(max_workers=args.pool_workers, mp_context=multiprocessing.get_context("spawn"))
+    # 预热：启动子进程
+    list(pool.map(passwords._verify, [hashes["pbkdf2"]] * args.pool_workers, [PASSWORD] * args.pool_workers))
+
+    print(f"{'配置':<18}{'单次(ms)':>10}{'线程内 次/秒':>14}{'线程内 轻请求p99':>18}{'进程池 次/秒':>14}{'进程池 轻请求p99':>18}")
+    for name, password_hash in hashes.items():
+        single = statistics.median(
+            _timed(passwords._verify, password_hash, PASSWORD) for _ in range(5)
+        )
+        inline_rate, inline_p99 = run_burst(password_hash, args.logins, args.threads)
+        pool_rate, pool_p99 = run_burst(password_hash, args.logins, args.threads, pool)
+        print(f"{name:<18}{single:>10.1f}{inline_rate:>14.1f}{inline_p99:>16.2f}ms{pool_rate:>14.1f}{pool_p99:>16.2f}ms")
+
+    pool.shutdown()
+
+
+def _timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    main()
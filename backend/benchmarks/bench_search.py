@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# backend/benchmarks/bench_search.py
+"""
+search_index 的规模基准：合成 N 个 org/repo 名称，测建索引耗时、内存和查询延迟
+
+查询分四类：短前缀（2 字符）、长前缀、完全匹配、带错别字的模糊查询。
+目标：100 万名称下单次查询 p99 < 5ms。
+
+使用方法：
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --size 200000 --queries 500
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import resource
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_ROOT))
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ra", "tu", "vo", "zen", "py", "js", "go", "ml", "db", "io",
+             "net", "core", "flow", "data", "open", "deep", "lite", "hub", "lab", "kit")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_names(size: int, seed: int = 7):
+    """约 size / 20 个组织，每个组织平均 20 个仓库"""
+    rng = random.Random(seed)
+
+    def word(parts):
+        # 常见词根 + 随机字母，近似真实仓库名里"常见片段 + 独特部分"的分布
+        tail = "".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 4)))
+        return "".join(rng.choice(SYLLABLES) for _ in range(parts)) + tail
+
+    orgs = [f"{word(rng.randint(2, 3))}{i}" for i in range(max(size // 20, 1))]
+    return [(rng.choice(orgs), f"{word(rng.randint(1, 3))}-{word(rng.randint(1, 2))}{i}") for i in range(size)]
+
+
+def make_queries(names, count: int, seed: int = 11):
+    rng = random.Random(seed)
+    queries = {"short_prefix": [], "long_prefix": [], "exact": [], "fuzzy": []}
+    for _ in range(count):
+        org, repo = rng.choice(names)
+        full = f"{org}/{repo}"
+        queries["short_prefix"].append((repo[:2], None))
+        queries["long_prefix"].append((full[:max(len(org) + 3, 6)], None))
+        queries["exact"].append((repo, repo))
+        i = rng.randrange(len(repo) - 1)
+        queries["fuzzy"].append((repo[:i] + repo[i + 1] + repo[i] + repo[i + 2:], repo))
+    return queries
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="search_index 规模基准")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    from search_index import SearchIndex
+
+    names = make_names(args.size)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index = SearchIndex()
+    with index.bulk():
+        for org, repo in names:
+            index.add("github", org, repo)
+    build_seconds = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before  # KB（Linux）
+    print(f"🔧 建索引: {len(index)} 个文档, {build_seconds:.2f}s, 常驻内存增长约 {rss_growth / 1024:.0f}MB")
+
+    # 增量添加（同步发现新仓库）
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add("github", "newly-synced", f"repo-{i}")
+    print(f"➕ 增量添加 1000 个仓库: {(time.perf_counter() - start) * 1e3:.1f}ms")
+
+    failed = False
+    for kind, queries in make_queries(names, args.queries).items():
+        latencies, hits, found = [], 0, 0
+        for q, expected in queries:
+            t = time.perf_counter()
+            results = index.search(q, limit=args.limit)
+            latencies.append((time.perf_counter() - t) * 1e3)
+            hits += bool(results)
+            found += expected is not None and any(item["repo"] == expected for item in results)
+        p99 = percentile(latencies, 0.99)
+        failed |= p99 >= 5.0
+        recall = f"  命中目标 {found}/{len(queries)}" if queries[0][1] is not None else ""
+        print(f"   {kind:<14} p50={statistics.median(latencies):6.3f}ms  p99={p99:6.3f}ms  "
+              f"有结果 {hits}/{len(queries)}{recall}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
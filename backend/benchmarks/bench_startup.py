@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# backend/benchmarks/bench_startup.py
+"""
+后端冷启动耗时基准（基于 python -X importtime）
+
+在子进程中执行 `import main`，解析 -X importtime 输出：
+  1. 统计 main 的累计导入耗时（取多次运行的中位数）
+  2. 检查重型依赖（openai / pandas / numpy / matplotlib）没有在启动时被导入
+超出预算或出现重型依赖时以非 0 退出码结束，可直接挂到 CI。
+
+使用方法：
+    python benchmarks/bench_startup.py                 # 默认预算 1500ms，运行 5 次
+    python benchmarks/bench_startup.py --budget-ms 800 --runs 10
+    python benchmarks/bench_startup.py --top 15        # 打印最慢的 15 个模块
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+
+# 启动阶段禁止出现的重型依赖（应在首次使用时才导入）
+HEAVY_MODULES = ("openai", "pandas", "numpy", "matplotlib")
+
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+def run_importtime(target: str = "main"):
+    """
+    在干净的子进程里导入 target，返回 {模块名: (自身耗时us, 累计耗时us)}
+    """
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)  # 避免任何意外的网络初始化
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {target} 失败：\n{proc.stderr[-2000:]}")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        # 同一模块可能出现多次（子包先于父包结束），保留累计耗时最大的一条
+        prev = timings.get(name.strip())
+        if prev is None or int(cumulative_us) > prev[1]:
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端冷启动耗时基准")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="main 累计导入耗时预算（毫秒）")
+    parser.add_argument("--runs", type=int, default=5, help="运行次数，取中位数")
+    parser.add_argument("--top", type=int, default=10, help="打印最慢的 N 个模块")
+    args = parser.parse_args()
+
+    totals = []
+    last = {}
+    for _ in range(max(args.runs, 1)):
+        last = run_importtime("main")
+        totals.append(last.get("main", (0, 0))[1] / 1000.0)
+
+    median_ms = statistics.median(totals)
+    heavy = sorted(
+        name for name in last
+        if name.split(".")[0] in HEAVY_MODULES
+    )
+
+    print("=" * 60)
+    print("⏱️  后端冷启动导入耗时")
+    print("=" * 60)
+    print(f"   运行次数: {len(totals)}")
+    print(f"   中位数:   {median_ms:.1f} ms  （预算 {args.budget_ms:.0f} ms）")
+    print(f"   最小/最大: {min(totals):.1f} / {max(totals):.1f} ms")
+
+    print(f"\n最慢的 {args.top} 个模块（累计耗时）：")
+    slowest = sorted(last.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]
+    for name, (_, cumulative_us) in slowest:
+        print(f"   {cumulative_us / 1000.0:8.1f} ms  {name}")
+
+    ok = True
+    if heavy:
+        ok = False
+        print(f"\n❌ 启动时导入了重型依赖（应改为首次使用时加载）：{heavy[:10]}")
+    if median_ms > args.budget_ms:
+        ok = False
+        print(f"\n❌ 启动耗时超出预算：{median_ms:.1f} ms > {args.budget_ms:.0f} ms")
+
+    if ok:
+        print("\n✅ 启动耗时在预算内")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,101 +1,304 @@
 #!/usr/bin/env python3
 """
 检测 config.json 中哪些项目在 OpenDigger 没有数据
-用于数据治理：找出无效项目并可选择清理
+用于数据治理：找出无效项目并可选择清理；也可以批量检验候选项目（--input）
+
+检测方式：
+  - 数据库里已有核心指标数据（非空序列）的项目直接判为有效，不访问网络（--no-db 关闭）
+  - 其余项目并发检测（--workers，默认 16），每个指标先发 HEAD，服务端不支持时退回
+    Range: bytes=0-0 的 GET，只判断状态码不下载正文
+  - 每检测完一个项目就追加写入检查点（JSON Lines），中断后重新运行会跳过已完成的项目；
+    全部完成后删除检查点（--fresh 忽略已有检查点重新开始）
+  - 只有 404 才判为无效；请求出错 / 其他 4xx、5xx 的项目归入"待定"（undetermined），
+    单独列出，不参与清理，下次运行重新检测
+  - --json 把结果以 JSON 输出到标准输出（进度信息改走标准错误，不会交互询问）
 
 使用方法：
-    python check_repos.py          # 检测并询问是否清理
-    python check_repos.py --check  # 仅检测，不清理
+    python check_repos.py                          # 检测并询问是否清理
+    python check_repos.py --check                  # 仅检测，不清理
+    python check_repos.py --auto                   # 检测并自动清理
+    python check_repos.py --input candidates.txt --json > result.json
+        # 检验候选列表（每行 platform/org/repo 或 org/repo，或 JSON 数组），不修改 config.json
 """
 
+import argparse
 import json
-import requests
+import os
 import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from config_registry import write_config
+from paths import DATA_DIR
+
 # 配置
-CONFIG_FILE = Path(__file__).parent / "config.json"
-BASE_URL = "https://oss.open-digger.cn/{platform}/{org}/{repo}/{metric}.json"
+BACKEND_ROOT = Path(__file__).parent
+CONFIG_FILE = BACKEND_ROOT / "config.json"
+OPENDIGGER_BASE_URL = os.getenv("OPENDIGGER_BASE_URL", "https://oss.open-digger.cn").rstrip("/")
+BASE_URL = OPENDIGGER_BASE_URL + "/{platform}/{org}/{repo}/{metric}.json"
 REQUIRED_METRICS = ["openrank", "activity"]  # 必须有的核心指标
+DEFAULT_WORKERS = 16
+DEFAULT_CHECKPOINT = DATA_DIR / "check_repos.checkpoint.jsonl"
+REQUEST_TIMEOUT = 10
+
+_local = threading.local()
+
+
+def repo_key(repo_info) -> str:
+    return f"{repo_info['platform']}/{repo_info['org']}/{repo_info['repo']}"
+
+
+def _get_session() -> requests.Session:
+    """每个工作线程一个 Session，复用 TCP / TLS 连接"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+    return session
+
+
+def metric_status(url: str) -> int:
+    """只取状态码：HEAD 优先，服务端不支持 HEAD（405 / 501）时用单字节 Range GET"""
+    session = _get_session()
+    resp = session.head(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    if resp.status_code in (405, 501):
+        resp = session.get(url, timeout=REQUEST_TIMEOUT, headers={"Range": "bytes=0-0"}, stream=True)
+        resp.close()
+    return resp.status_code
 
 
 def check_repo_availability(platform, org, repo):
-    """检查一个项目是否有可用数据"""
+    """检查一个项目是否有可用数据，返回缺失的指标（请求失败的记为 "metric(error)"）"""
     missing_metrics = []
-    
+
     for metric in REQUIRED_METRICS:
         url = BASE_URL.format(platform=platform, org=org, repo=repo, metric=metric)
         try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 404:
+            status = metric_status(url)
+            if status == 404:
                 missing_metrics.append(metric)
-        except Exception as e:
+            elif status >= 400:
+                missing_metrics.append(f"{metric}(error)")
+        except Exception:
             missing_metrics.append(f"{metric}(error)")
-    
+
     return missing_metrics
 
 
-def cleanup_database(invalid_repos):
-    """清理数据库中的无效项目数据"""
+def _db_app():
     from flask import Flask
     from extensions import db
-    from models import MetricSeries
-    
-    app = Flask("cleanup")
-    db_path = Path(__file__).parent / "openrank.db"
+
+    app = Flask("check_repos")
+    db_path = os.getenv("OPENRANK_DB_PATH", BACKEND_ROOT / "openrank.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db.init_app(app)
-    
-    with app.app_context():
+    return app
+
+
+def load_known_good():
+    """数据库里核心指标都有非空序列的项目："platform/org/repo" 集合"""
+    from extensions import db
+    from models import MetricSeries
+
+    with _db_app().app_context():
+        rows = (
+            db.session.query(MetricSeries.platform, MetricSeries.entity, MetricSeries.repo, MetricSeries.metric)
+            .filter(
+                MetricSeries.metric.in_(REQUIRED_METRICS),
+                MetricSeries.repo != "",
+                db.func.length(MetricSeries.data_json) > 2,   # 排除 "[]"
+            )
+            .all()
+        )
+
+    metrics_by_repo = {}
+    for platform, org, repo, metric in rows:
+        metrics_by_repo.setdefault(f"{platform}/{org}/{repo}", set()).add(metric)
+    return {key for key, metrics in metrics_by_repo.items() if metrics.issuperset(REQUIRED_METRICS)}
+
+
+# ==== 检查点 ====
+
+def load_checkpoint(path: Path):
+    """已完成的项目：key → missing 列表（请求出错的项目不算完成，会重新检测）"""
+    done = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # 中断时写了一半的行
+                if not any(m.endswith("(error)") for m in item.get("missing", [])):
+                    done[item["key"]] = item["missing"]
+    except OSError:
+        pass
+    return done
+
+
+class Checkpoint:
+    """追加写入的检查点文件，每行一个已完成的项目"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, key: str, missing, source: str):
+        line = json.dumps({"key": key, "missing": missing, "source": source, "checked_at": time.time()},
+                          ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self, remove: bool = False):
+        self._file.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+
+# ==== 批量检测 ====
+
+def validate_repos(repos, workers: int = DEFAULT_WORKERS, checkpoint_path: Path = DEFAULT_CHECKPOINT,
+                   resume: bool = True, use_db: bool = True, log=print):
+    """
+    并发检测 repos，返回 (invalid_repos, valid_repos, undetermined_repos, stats)：
+      invalid       核心指标 404（OpenDigger 确实没有数据），每一项带 "missing" 字段
+      undetermined  有指标请求出错，无法判断，每一项带 "errors" 字段；不算无效，也不清理
+    完成后删除检查点；中途异常 / Ctrl+C 时保留，下次运行从断点继续
+    """
+    checkpoint_path = Path(checkpoint_path)
+    if not resume:
+        checkpoint_path.unlink(missing_ok=True)
+    done = load_checkpoint(checkpoint_path) if resume else {}
+
+    known_good = set()
+    if use_db:
+        try:
+            known_good = load_known_good()
+        except Exception as e:
+            log(f"⚠️  读取数据库跳过（可能缺少依赖或数据库不存在）: {e}")
+
+    results = {}
+    stats = {"total": len(repos), "resumed": 0, "from_db": 0, "checked_network": 0}
+    pending = []
+    checkpoint = Checkpoint(checkpoint_path)
+
+    for repo_info in repos:
+        key = repo_key(repo_info)
+        if key in results:
+            continue  # 列表里重复的项目
+        if key in done:
+            results[key] = done[key]
+            stats["resumed"] += 1
+        elif key in known_good:
+            results[key] = []
+            stats["from_db"] += 1
+            checkpoint.record(key, [], "db")
+        else:
+            results[key] = None
+            pending.append(repo_info)
+
+    log(f"   断点续传 {stats['resumed']} 个，数据库已有数据 {stats['from_db']} 个，需联网检测 {len(pending)} 个")
+
+    completed = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = {
+                pool.submit(check_repo_availability, r["platform"], r["org"], r["repo"]): r
+                for r in pending
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                key = repo_key(futures[future])
+                missing = future.result()
+                results[key] = missing
+                stats["checked_network"] += 1
+                checkpoint.record(key, missing, "network")
+                log(f"[{i}/{len(pending)}] {key} " + (f"❌ 缺失: {missing}" if missing else "✅"))
+        completed = True
+    finally:
+        checkpoint.close(remove=completed)
+
+    invalid_repos, valid_repos, undetermined_repos = [], [], []
+    for repo_info in repos:
+        missing = results[repo_key(repo_info)]
+        errors = [m for m in missing if m.endswith("(error)")]
+        if errors:
+            undetermined_repos.append({**repo_info, "errors": errors})
+        elif missing:
+            invalid_repos.append({**repo_info, "missing": missing})
+        else:
+            valid_repos.append(repo_info)
+    return invalid_repos, valid_repos, undetermined_repos, stats
+
+
+# ==== 清理 ====
+
+def cleanup_database(invalid_repos):
+    """清理数据库中的无效项目数据"""
+    from extensions import db
+    from models import MetricSeries
+
+    with _db_app().app_context():
         deleted_count = 0
         for repo_info in invalid_repos:
             platform = repo_info["platform"]
             org = repo_info["org"]
             repo = repo_info["repo"]
-            
+
             # 删除该项目的所有指标数据
             rows = MetricSeries.query.filter_by(
-                platform=platform, 
-                entity=org, 
+                platform=platform,
+                entity=org,
                 repo=repo
             ).all()
-            
+
             for row in rows:
                 db.session.delete(row)
                 deleted_count += 1
-        
+
         db.session.commit()
         print(f"🗑️  已从数据库删除 {deleted_count} 条记录")
 
 
 def cleanup_invalid_repos(invalid_repos, valid_repos):
     """
-    从 config.json 中移除无效项目
+    从 config.json 中移除无效项目（只传 404 判定的项目；valid_repos 是保留下来的全部项目，含待定项目）
     同时清理数据库中的残留数据
     """
     if not invalid_repos:
         print("✨ 没有需要清理的项目")
         return
-    
+
     # 1. 更新 config.json
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
         config = json.load(f)
-    
+
     # 用有效项目列表替换
     config["repositories"] = valid_repos
-    
+
     # 备份原文件
     backup_file = CONFIG_FILE.with_suffix(".json.bak")
     shutil.copy(CONFIG_FILE, backup_file)
     print(f"📦 已备份原配置到: {backup_file}")
-    
-    # 写入新配置
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
-    
+
+    # 写入新配置（临时文件 + 原子替换，运行中的服务按 inode / mtime 发现变化后切换）
+    write_config(config, CONFIG_FILE)
+
     print(f"✅ config.json 已更新，移除了 {len(invalid_repos)} 个无效项目")
-    
+
     # 2. 清理数据库（可选）
     try:
         cleanup_database(invalid_repos)
@@ -103,86 +306,144 @@ def cleanup_invalid_repos(invalid_repos, valid_repos):
         print(f"⚠️  数据库清理跳过（可能缺少依赖）: {e}")
 
 
-def main(check_only=False, auto_clean=False):
+# ==== 入口 ====
+
+def load_candidates(path: Path):
+    """
+    候选项目列表：JSON 数组（元素为 {"platform", "org", "repo", ...} 或 "platform/org/repo" 字符串），
+    或每行一个 platform/org/repo / org/repo（默认 github，# 开头为注释）
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        items = json.loads(text)
+    except ValueError:
+        items = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    repos = []
+    for item in items:
+        if isinstance(item, dict):
+            repos.append({"platform": "github", **item})
+            continue
+        parts = str(item).strip("/").split("/")
+        if len(parts) == 2:
+            parts = ["github", *parts]
+        if len(parts) != 3:
+            raise ValueError(f"无法解析的项目：{item}")
+        repos.append({"platform": parts[0], "org": parts[1], "repo": parts[2]})
+    return repos
+
+
+def main(check_only=False, auto_clean=False, repos=None, workers=DEFAULT_WORKERS,
+         checkpoint=DEFAULT_CHECKPOINT, resume=True, use_db=True, json_output=False):
     """
     主函数
     Args:
         check_only: 是否仅检测不清理
+        auto_clean: 是否无需确认直接清理
+        repos: 要检测的项目（默认 config.json 中的 repositories；传入时不做清理）
+        json_output: 结果以 JSON 输出到标准输出，进度信息走标准错误
     """
-    # 读取配置
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        config = json.load(f)
-    
-    repos = config.get("repositories", [])
-    
-    print("=" * 60)
-    print("🔍 开始检测项目数据可用性...")
-    print(f"   共 {len(repos)} 个项目待检测")
-    print("=" * 60)
-    
-    invalid_repos = []
-    valid_repos = []
-    
-    for i, repo_info in enumerate(repos, 1):
-        platform = repo_info["platform"]
-        org = repo_info["org"]
-        repo = repo_info["repo"]
-        full_name = f"{org}/{repo}"
-        
-        print(f"[{i}/{len(repos)}] 检测 {full_name}...", end=" ")
-        
-        missing = check_repo_availability(platform, org, repo)
-        
-        if missing:
-            print(f"❌ 缺失: {missing}")
-            invalid_repos.append(repo_info)
-        else:
-            print("✅")
-            valid_repos.append(repo_info)
-    
+    out = sys.stderr if json_output else sys.stdout
+
+    def log(*args):
+        print(*args, file=out)
+
+    from_config = repos is None
+    if from_config:
+        # 读取配置
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        repos = config.get("repositories", [])
+
+    log("=" * 60)
+    log("🔍 开始检测项目数据可用性...")
+    log(f"   共 {len(repos)} 个项目待检测，并发 {workers}")
+    log("=" * 60)
+
+    start = time.perf_counter()
+    invalid_repos, valid_repos, undetermined_repos, stats = validate_repos(
+        repos, workers=workers, checkpoint_path=checkpoint, resume=resume, use_db=use_db, log=log
+    )
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+
     # 汇总报告
-    print("\n" + "=" * 60)
-    print("📊 检测结果汇总")
-    print("=" * 60)
-    print(f"   有效项目: {len(valid_repos)} 个")
-    print(f"   无效项目: {len(invalid_repos)} 个")
-    
+    log("\n" + "=" * 60)
+    log("📊 检测结果汇总")
+    log("=" * 60)
+    log(f"   有效项目: {len(valid_repos)} 个")
+    log(f"   无效项目: {len(invalid_repos)} 个")
+    log(f"   待定项目: {len(undetermined_repos)} 个（请求出错，未判定）")
+    log(f"   耗时: {stats['seconds']}s")
+
+    if json_output:
+        json.dump({"stats": stats, "valid": valid_repos, "invalid": invalid_repos,
+                   "undetermined": undetermined_repos},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+
+    if undetermined_repos:
+        log("\n❔ 以下项目请求出错，无法判断（不会清理，下次运行重新检测）：")
+        log("-" * 40)
+        for r in undetermined_repos:
+            log(f"   • {r['org']}/{r['repo']} ({', '.join(r['errors'])})")
+
     if invalid_repos:
-        print("\n⚠️  以下项目在 OpenDigger 无数据，建议删除：")
-        print("-" * 40)
+        log("\n⚠️  以下项目在 OpenDigger 无数据，建议删除：")
+        log("-" * 40)
         for r in invalid_repos:
-            print(f"   • {r['org']}/{r['repo']} ({r.get('category', 'unknown')})")
-        
-        if not check_only:
+            log(f"   • {r['org']}/{r['repo']} ({r.get('category', 'unknown')})")
+
+        if from_config and not check_only:
+            # 写回 config.json 时去掉检测结果字段
+            to_remove = [{k: v for k, v in r.items() if k != "missing"} for r in invalid_repos]
+            # 待定项目保留在 config.json 中
+            removed = {repo_key(r) for r in invalid_repos}
+            keep_repos = [r for r in repos if repo_key(r) not in removed]
             if auto_clean:
                 # 自动清理模式
-                print("\n🤖 自动清理模式，开始清理...")
-                cleanup_invalid_repos(invalid_repos, valid_repos)
-                print("\n🎉 清理完成！")
-            else:
+                log("\n🤖 自动清理模式，开始清理...")
+                cleanup_invalid_repos(to_remove, keep_repos)
+                log("\n🎉 清理完成！")
+            elif not json_output:
                 # 交互确认
-                print("\n" + "-" * 60)
+                log("\n" + "-" * 60)
                 confirm = input("是否立即清理这些无效项目？(y/n): ").strip().lower()
                 if confirm == 'y':
-                    cleanup_invalid_repos(invalid_repos, valid_repos)
-                    print("\n🎉 清理完成！请重新运行 data_fetcher.py 更新数据")
+                    cleanup_invalid_repos(to_remove, keep_repos)
+                    log("\n🎉 清理完成！请重新运行 data_fetcher.py 更新数据")
                 else:
-                    print("已取消清理操作")
-    else:
-        print("\n🎉 所有项目数据都可用，无需清理！")
-    
+                    log("已取消清理操作")
+    elif not undetermined_repos:
+        log("\n🎉 所有项目数据都可用，无需清理！")
+
     return invalid_repos, valid_repos
 
 
 if __name__ == "__main__":
-    import sys
-    
-    check_only = "--check" in sys.argv
-    auto_clean = "--auto" in sys.argv
-    
-    if check_only:
-        print("📋 仅检测模式（不会修改任何文件）\n")
-    elif auto_clean:
-        print("🤖 自动清理模式（无需确认）\n")
-    
-    main(check_only=check_only, auto_clean=auto_clean)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="检测项目在 OpenDigger 上是否有数据")
+    parser.add_argument("--check", action="store_true", help="仅检测，不修改任何文件")
+    parser.add_argument("--auto", action="store_true", help="检测后自动清理（无需确认）")
+    parser.add_argument("--input", type=Path, default=None, help="候选项目列表文件（不修改 config.json）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="并发请求数")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT, help="检查点文件路径")
+    parser.add_argument("--fresh", action="store_true", help="忽略已有检查点，重新检测")
+    parser.add_argument("--no-db", action="store_true", help="不使用数据库里已有的数据，全部联网检测")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果（进度信息走标准错误）")
+    args = parser.parse_args()
+
+    log_out = sys.stderr if args.json else sys.stdout
+    if args.check:
+        print("📋 仅检测模式（不会修改任何文件）\n", file=log_out)
+    elif args.auto:
+        print("🤖 自动清理模式（无需确认）\n", file=log_out)
+
+    main(
+        check_only=args.check,
+        auto_clean=args.auto,
+        repos=load_candidates(args.input) if args.input else None,
+        workers=args.workers,
+        checkpoint=args.checkpoint,
+        resume=not args.fresh,
+        use_db=not args.no_db,
+        json_output=args.json,
+    )
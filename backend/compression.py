@@ -0,0 +1,108 @@
+# backend/compression.py
+"""
+响应压缩（按 Accept-Encoding 协商 brotli / gzip）
+
+  - 只压缩 JSON / 文本类、且大于 COMPRESS_MIN_SIZE 的非流式响应
+  - 压缩结果按 (响应体摘要, 编码) 放进进程内 LRU：同一份缓存数据（序列 / 汇总）
+    被反复请求时只压缩一次
+  - 未安装 brotli 时只用 gzip；前面已有 nginx 等做压缩时可设 COMPRESSION_ENABLED=0
+"""
+import gzip
+import hashlib
+import os
+
+from flask import request
+
+from lru_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") != "0"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_CACHE_MAX_BYTES = int(os.getenv("COMPRESS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-msgpack",
+    "text/plain",
+    "text/html",
+    "text/csv",
+}
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0：相同输入得到相同输出，便于缓存和 ETag
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# {(响应体摘要, 编码): 压缩后的字节}
+body_cache = LRUCache(COMPRESS_CACHE_MAX_BYTES, len)
+
+
+def get_or_compress(body: bytes, encoding: str) -> bytes:
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    compressed = body_cache.get(key)
+    if compressed is None:
+        compressed = _compress(body, encoding)
+        body_cache.put(key, compressed)
+    return compressed
+
+
+def choose_encoding(accept_encodings) -> str | None:
+    """br 优先（压缩率更高），其次 gzip；q=0 表示客户端明确拒绝"""
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _add_vary(response):
+    vary = response.headers.get("Vary", "")
+    if "accept-encoding" not in vary.lower():
+        response.headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+def _compress_response(response):
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "no-transform" in response.headers.get("Cache-Control", "")
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    # 响应内容会随 Accept-Encoding 变化，即使这次没压缩也要告诉缓存
+    _add_vary(response)
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    compressed = get_or_compress(body, encoding)
+    if len(compressed) >= len(body):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    if COMPRESSION_ENABLED:
+        app.after_request(_compress_response)
@@ -0,0 +1,152 @@
+# backend/config_registry.py
+"""
+config.json 注册表：解析一次、建好索引、文件变化时原子切换
+
+原来 /api/llm/projects、汇总计算每次调用都 open + json.load 整个 config.json，
+项目树还要每次递归过滤一遍。这里每个文件版本只解析一次，生成只读的 ConfigSnapshot：
+  - repo_map：(platform, org, repo) → repo_info（按 config 顺序）
+  - repo_names："org/repo" 集合；repo_category："org/repo" → category
+  - category_tree：已去掉 repositories 之外项目的项目树
+  - categories：repositories 的 category 和项目树里所有分类节点的 value
+请求路径上每 CONFIG_CHECK_SECONDS 秒最多 stat 一次文件，按 (inode, mtime, size) 判断是否被替换；
+check_repos / auto_cleanup_repos 通过 write_config 原子写入（临时文件 + os.replace），并立即让本进程切换。
+文件解析失败时保留上一个版本（首次加载失败时抛出异常）。
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_FILE = BASE_DIR / "config.json"
+CONFIG_CHECK_SECONDS = float(os.getenv("CONFIG_CHECK_SECONDS", "2"))
+
+
+def _file_identity(stat):
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def filter_category_tree(nodes, valid_repos):
+    """去掉不在 valid_repos（"org/repo" 集合）中的叶子节点，以及因此变空的分类"""
+    result = []
+    for node in nodes:
+        if "children" in node and node["children"]:
+            # 非叶子节点：递归过滤子节点，只保留有子节点的分类
+            children = filter_category_tree(node["children"], valid_repos)
+            if children:
+                result.append({**node, "children": children})
+        elif node.get("value") in valid_repos:
+            result.append(node)
+    return result
+
+
+def tree_categories(nodes, categories):
+    """项目树里所有分类（非叶子）节点的 value"""
+    for node in nodes:
+        if node.get("children"):
+            if node.get("value"):
+                categories.add(node["value"])
+            tree_categories(node["children"], categories)
+    return categories
+
+
+class ConfigSnapshot:
+    """某一版本 config.json 的解析结果；只读，不要修改其中的字典 / 列表"""
+
+    __slots__ = ("identity", "raw", "repositories", "repo_map", "repo_names", "repo_category",
+                 "category_tree", "categories", "metrics", "base_url")
+
+    def __init__(self, raw: dict, identity=None):
+        if not isinstance(raw, dict):
+            raise ValueError("config.json 顶层应为对象")
+        self.identity = identity
+        self.raw = raw
+        self.repositories = raw.get("repositories", [])
+        self.repo_map = {(r["platform"], r["org"], r["repo"]): r for r in self.repositories}
+        self.repo_names = {f"{r['org']}/{r['repo']}" for r in self.repositories}
+        self.repo_category = {
+            f"{r['org']}/{r['repo']}": r.get("category", "unknown") for r in self.repositories
+        }
+        self.category_tree = filter_category_tree(raw.get("category_tree", []), self.repo_names)
+        self.categories = tree_categories(raw.get("category_tree", []), set(self.repo_category.values()))
+        self.metrics = raw.get("metrics", [])
+        self.base_url = (raw.get("data_source") or {}).get("base_url")
+
+    @property
+    def has_category_tree(self) -> bool:
+        return bool(self.raw.get("category_tree"))
+
+
+class ConfigRegistry:
+    def __init__(self, path: Path = CONFIG_FILE, check_seconds: float = CONFIG_CHECK_SECONDS):
+        self.path = Path(path)
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._next_check = 0.0
+
+    def get(self) -> ConfigSnapshot:
+        """
+        当前配置；到了检查时间才 stat 文件
+        首次加载失败时抛 OSError（文件不存在等）/ ValueError（JSON 格式错误）/ KeyError（repositories 缺字段）
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() < self._next_check:
+                return self._snapshot
+            try:
+                self._reload_if_changed()
+            except (OSError, ValueError, KeyError):
+                if self._snapshot is None:
+                    raise
+                print(f"⚠️  重新加载 {self.path.name} 失败，继续使用上一个版本")
+            self._next_check = time.monotonic() + self.check_seconds
+            return self._snapshot
+
+    def _reload_if_changed(self):
+        with open(self.path, "rb") as f:
+            identity = _file_identity(os.fstat(f.fileno()))
+            if self._snapshot is not None and self._snapshot.identity == identity:
+                return
+            raw = json.loads(f.read().decode("utf-8"))
+        self._snapshot = ConfigSnapshot(raw, identity)
+
+    def invalidate(self):
+        """下一次 get() 立即检查文件"""
+        self._next_check = 0.0
+
+    def write(self, config: dict):
+        """原子写入新配置（临时文件 + os.replace），本进程立即切换"""
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.invalidate()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path: Path = CONFIG_FILE) -> ConfigRegistry:
+    """同一路径共用一个注册表"""
+    path = Path(path)
+    registry = _registries.get(path)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(path, ConfigRegistry(path))
+    return registry
+
+
+def get_config() -> ConfigSnapshot:
+    return get_registry().get()
+
+
+def write_config(config: dict, path: Path = CONFIG_FILE):
+    get_registry(path).write(config)
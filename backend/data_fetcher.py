@@ -3,116 +3,53 @@
 OpenDigger 数据同步模块
 负责从 OpenDigger API 拉取数据并存入本地数据库
 """
-import json
+import os
 import shutil
 from pathlib import Path
 import requests
 
 import time
+from datetime import datetime
 from extensions import db
 from models import MetricSeries
+from metrics import (
+    SYNC_ROWS_WRITTEN, SYNC_FAILURES, SYNC_DURATION, SYNC_PROGRESS, SYNC_LAST_SUCCESS, record_upstream,
+)
+import summary_engine
+from snapshot import export_snapshot, SNAPSHOT_PATH
+from negative_cache import negative_cache
+from config_registry import get_registry, write_config
+from paths import DATA_DIR
 from flask import Flask
 from datetime import datetime
 import json as pyjson
 from contextlib import nullcontext
 
-# ✅ 导入统一的工具函数
-from metric_utils import mean as _mean, std_population as _std_pop, tail_n_values, calculate_health_score
-
 BACKEND_ROOT = Path(__file__).parent
 CONFIG_FILE = BACKEND_ROOT / "config.json"
-DATA_DIR = BACKEND_ROOT / "data"
 if not DATA_DIR.exists():
-    DATA_DIR.mkdir(exist_ok=True)
-
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# ✅ 辅助函数：兼容旧代码
-def _tail12(records):
-    """获取最近12个月数据的包装函数"""
-    return tail_n_values(records, n=12, month_key="month", value_key="count")
 
 def generate_llm_summary_db():
+    """
+    同步结束后全量重算汇总（与 API 共用 summary_engine），并写入 data/llm_summary.json
+    API 进程启动时直接加载该快照，不必在第一次请求时重算
+    """
     with ensure_app_context():
         print("--- [SUMMARY] 开始生成 LLM 生态汇总（DB版） ---")
 
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        repos = config.get("repositories", [])
-
-        summary_items = []
-
-        for repo_info in repos:
-            platform = repo_info["platform"]
-            org = repo_info["org"]
-            repo = repo_info["repo"]
-            category = repo_info.get("category", "unknown")
-            repo_key = f"{platform}/{org}/{repo}"
-
-            # 从 DB 取 openrank / activity
-            row_or = MetricSeries.query.filter_by(platform=platform, entity=org, repo=repo, metric="openrank").first()
-            row_act = MetricSeries.query.filter_by(platform=platform, entity=org, repo=repo, metric="activity").first()
-
-            if not row_or or not row_act:
-                print(f"--- [WARN] 略过 {repo_key}，openrank 或 activity DB 数据缺失 ---")
-                continue
-
-            try:
-                or_records = pyjson.loads(row_or.data_json or "[]")
-                act_records = pyjson.loads(row_act.data_json or "[]")
-
-                or_vals = _tail12(or_records)
-                act_vals = _tail12(act_records)
-
-                if not or_vals or not act_vals:
-                    print(f"--- [WARN] 略过 {repo_key}，近12月数据不足 ---")
-                    continue
-
-                openrank_mean_12m = _mean(or_vals)
-                openrank_std_12m = _std_pop(or_vals)
-                activity_mean_12m = _mean(act_vals)
-
-                summary_items.append({
-                    "platform": platform,
-                    "org": org,
-                    "repo": repo,
-                    "project_key": repo_key,
-                    "category": category,
-                    "openrank_mean_12m": float(openrank_mean_12m),
-                    "openrank_std_12m": float(openrank_std_12m),
-                    "activity_mean_12m": float(activity_mean_12m),
-                })
-
-            except Exception as e:
-                print(f"--- [WARN] 处理 {repo_key} 汇总失败: {e} ---")
-
-        if not summary_items:
+        snapshot = summary_engine.engine.rebuild()
+        if not snapshot.projects:
             print("--- [SUMMARY] 没有可用项目生成汇总 ---")
             return
 
-        max_or = max(i["openrank_mean_12m"] for i in summary_items) or 1.0
-        max_act = max(i["activity_mean_12m"] for i in summary_items) or 1.0
-        max_std = max(i["openrank_std_12m"] for i in summary_items) or 1.0
-
-        for item in summary_items:
-            or_norm = item["openrank_mean_12m"] / max_or if max_or > 0 else 0.0
-            act_norm = item["activity_mean_12m"] / max_act if max_act > 0 else 0.0
-            std_norm = item["openrank_std_12m"] / max_std if max_std > 0 else 0.0
-            
-            # ✅ 稳定性 = 1 - 波动性归一化值
-            stability_norm = 1.0 - std_norm
-
-            # ✅ 使用统一的健康度计算函数
-            item["health_score"] = calculate_health_score(or_norm, act_norm, stability_norm)
-            
-            item["openrank_mean_12m"] = round(item["openrank_mean_12m"], 2)
-            item["activity_mean_12m"] = round(item["activity_mean_12m"], 2)
-            item["openrank_std_12m"] = round(item["openrank_std_12m"], 2)
+        skipped = summary_engine.engine.repo_count - len(snapshot.projects)
+        if skipped:
+            print(f"--- [WARN] 略过 {skipped} 个项目：openrank / activity 数据缺失或近12月数据不足 ---")
 
-        summary_file = DATA_DIR / "llm_summary.json"
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump(summary_items, f, ensure_ascii=False, indent=2)
-
-        print(f"--- [SUMMARY] 已生成 LLM 生态汇总: {summary_file} ---")
+        summary_engine.engine.save(summary_engine.SNAPSHOT_FILE)
+        print(f"--- [SUMMARY] 已生成 LLM 生态汇总: {summary_engine.SNAPSHOT_FILE}（{len(snapshot.projects)} 个项目） ---")
 
 
 def ensure_app_context():
@@ -122,7 +59,7 @@ def ensure_app_context():
         return nullcontext()
     except Exception:
         app = Flask("data_fetcher")
-        db_path = BACKEND_ROOT / "openrank.db"
+        db_path = os.getenv("OPENRANK_DB_PATH", BACKEND_ROOT / "openrank.db")
         app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
         app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
         db.init_app(app)
@@ -152,10 +89,8 @@ def auto_cleanup_repos(config, invalid_repos):
     shutil.copy(CONFIG_FILE, backup_file)
     print(f"📦 已备份原配置: {backup_file}")
     
-    # 更新配置
-    config["repositories"] = valid_repos
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    # 更新配置（原子替换；config 可能是注册表里的只读快照，复制后再改）
+    write_config({**config, "repositories": valid_repos}, CONFIG_FILE)
     
     print(f"✅ 已从 config.json 移除 {len(invalid_repos)} 个无效项目:")
     for r in invalid_repos:
@@ -177,6 +112,9 @@ def auto_cleanup_repos(config, invalid_repos):
             db.session.commit()
             if deleted:
                 print(f"🗑️  已清理数据库 {deleted} 条残留记录")
+                # 增量回收模式下立即归还空闲页（否则留给定期维护判断是否 VACUUM）
+                from storage import reclaim
+                reclaim()
     except Exception as e:
         print(f"⚠️  数据库清理跳过: {e}")
     
@@ -189,8 +127,7 @@ def sync_opendigger_data():
         db.create_all()
 
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                config = json.load(f)
+            config = get_registry(CONFIG_FILE).get().raw
             repos = config["repositories"]
             metrics = config["metrics"]
             base_url = config["data_source"]["base_url"]
@@ -202,6 +139,11 @@ def sync_opendigger_data():
         repo_failures = {}  # key: "org/repo", value: set of failed metrics
         core_metrics = {"openrank", "activity"}  # 核心指标，全部失败才算无效
 
+        sync_start = time.perf_counter()
+        total = len(repos) * len(metrics) or 1
+        done = 0
+        SYNC_PROGRESS.set(0)
+
         for repo_info in repos:
             platform, org, repo = repo_info["platform"], repo_info["org"], repo_info["repo"]
             repo_key = f"{org}/{repo}"
@@ -210,8 +152,16 @@ def sync_opendigger_data():
             for metric in metrics:
                 api_url = base_url.format(platform=platform, org=org, repo=repo, metric=metric)
 
+                done += 1
+                SYNC_PROGRESS.set(done / total)
                 try:
-                    resp = requests.get(api_url, timeout=30)
+                    start = time.perf_counter()
+                    status = "error"
+                    try:
+                        resp = requests.get(api_url, timeout=30)
+                        status = resp.status_code
+                    finally:
+                        record_upstream("opendigger_sync", status, time.perf_counter() - start)
                     resp.raise_for_status()
                     data = resp.json()
 
@@ -234,6 +184,8 @@ def sync_opendigger_data():
 
                     if row:
                         row.data_json = payload
+                        # 数据没变时 onupdate 不会触发，显式刷新同步时间
+                        row.updated_at = datetime.utcnow()
                     else:
                         db.session.add(MetricSeries(
                             platform=platform, entity=org, repo=repo,
@@ -241,18 +193,31 @@ def sync_opendigger_data():
                         ))
 
                     db.session.commit()
+                    summary_engine.mark_dirty()
+                    negative_cache.clear(platform, org, repo, metric)
+                    SYNC_ROWS_WRITTEN.labels(metric=metric).inc()
                     print(f"✅ 成功写入DB: {platform}/{org}/{repo} - {metric}")
 
                 except requests.HTTPError as e:
                     code = getattr(e.response, "status_code", None)
                     if code == 404:
+                        SYNC_FAILURES.labels(metric=metric, reason="404").inc()
                         print(f"❌ 跳过 (404): {platform}/{org}/{repo} - {metric}")
                         repo_failures[repo_key].add(metric)
+                        negative_cache.record(platform, org, repo, metric, reason="404")
                     else:
+                        SYNC_FAILURES.labels(metric=metric, reason="http").inc()
                         print(f"❌ HTTP错误: {platform}/{org}/{repo} - {metric} -> {e}")
                 except Exception as e:
+                    SYNC_FAILURES.labels(metric=metric, reason="error").inc()
                     print(f"❌ 处理失败: {platform}/{org}/{repo} - {metric} -> {e}")
 
+        purged = negative_cache.purge_expired()
+        if purged:
+            print(f"--- [FETCH] 清理过期的 404 记录 {purged} 条 ---")
+
+        SYNC_DURATION.observe(time.perf_counter() - sync_start)
+        SYNC_LAST_SUCCESS.set(time.time())
         print("--- [FETCH] 数据同步完成 ---")
 
         # === 自动清理无效项目 ===
@@ -275,8 +240,15 @@ def sync_opendigger_data():
         except Exception as e:
             print(f"--- [WARN] 生成 LLM 生态汇总失败: {e} ---")
 
+        # 导出只读 mmap 快照（序列 + 汇总），各 worker 直接映射读取
+        try:
+            count = export_snapshot()
+            print(f"--- [SNAPSHOT] 已导出 {count} 条序列: {SNAPSHOT_PATH} ---")
+        except Exception as e:
+            print(f"--- [WARN] 导出快照失败: {e} ---")
+
 def should_sync(ttl_hours: int = 24) -> bool:
-    summary_file = DATA_DIR / "llm_summary.json"
+    summary_file = summary_engine.SNAPSHOT_FILE
 
     # DB为空或表不存在也要同步
     with ensure_app_context():
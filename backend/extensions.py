@@ -1,8 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
+from auth_cache import CachingJWTManager
 
 # 全局的数据库对象，所有模型都通过它来声明
 db = SQLAlchemy()
 
-# 全局唯一的 JWT 管理器
-jwt = JWTManager()
\ No newline at end of file
+# 全局唯一的 JWT 管理器（带已验证 token 缓存和密钥轮换，见 auth_cache.py）
+jwt = CachingJWTManager()
\ No newline at end of file
@@ -0,0 +1,87 @@
+# backend/gunicorn.conf.py
+"""
+gunicorn 生产配置（在 backend/ 目录下启动时自动加载）
+
+    gunicorn main:app                                         # WSGI（gthread worker）
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn asgi:application                             # ASGI 异步模式
+
+平滑重载：
+    kill -HUP <master_pid>     重新加载配置并逐个替换 worker（preload 模式下不重新导入代码）
+    kill -USR2 <master_pid>    代码升级：启动新 master，确认无误后对旧 master 发送 TERM
+"""
+import multiprocessing
+import os
+
+# ==== 监听 ====
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# ==== worker 模型 ====
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+_cores = multiprocessing.cpu_count()
+if worker_class == "gthread":
+    # 同步 worker：I/O 等待较多，按 2 * 核数 + 1 起步
+    workers = int(os.getenv("WEB_CONCURRENCY", _cores * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+else:
+    # 异步 worker：单进程即可承载大量并发连接，每个核一个进程
+    workers = int(os.getenv("WEB_CONCURRENCY", _cores))
+
+# ==== 预加载：master 导入一次应用，worker fork 后按写时复制共享内存 ====
+preload_app = True
+
+# ==== worker 回收：处理一定请求数后重启，避免内存缓慢增长；加抖动防止同时重启 ====
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+
+# ==== 超时 ====
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))           # LLM 报告可能较慢
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# ==== 日志 ====
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+# ==== hooks ====
+
+def on_starting(server):
+    """
+    master 启动时建表一次、建好 /api/search 索引（worker 按写时复制共享），
+    并释放连接，避免 fork 后多个进程共用同一个 SQLite 连接
+    """
+    from main import app, init_db
+    from extensions import db
+    from search_index import SEARCH_INDEX_PRELOAD, build_search_index
+
+    init_db(app)
+    if SEARCH_INDEX_PRELOAD:
+        build_search_index(app)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """
+    worker fork 之后：
+      1. 丢弃从 master 继承的连接池（不关闭父进程的连接）
+      2. 同步进程选举：抢到同步锁的那一个 worker 启动后台同步/调度线程，
+         其他 worker 在后台定期重试（HUP 重载 / 同步 worker 被回收后接手）
+    """
+    from main import app, start_sync_leader_election
+    from extensions import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    start_sync_leader_election(app)
+
+
+def child_exit(server, worker):
+    """worker 退出后清理其 Prometheus 多进程指标文件（设置了 PROMETHEUS_MULTIPROC_DIR 时）"""
+    from metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
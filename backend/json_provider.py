@@ -0,0 +1,158 @@
+# backend/json_provider.py
+"""
+更快的 JSON 编解码（Flask JSON provider + 通用 dumps / loads）
+
+后端按优先级选择：orjson > ujson > 标准库 json，也可以用 JSON_BACKEND=orjson|ujson|json 强制指定。
+与 Flask 默认的 DefaultJSONProvider 的区别 / 相同点：
+  - 非 ASCII 字符直接输出 UTF-8（不做 ASCII 转义；orjson 不支持转义，各后端统一这样输出）
+  - 键排序、紧凑格式（debug 模式下缩进）
+  - datetime / date → HTTP 日期，Decimal / UUID → 字符串，dataclass → dict（与 Flask 的默认转换相同）
+  - 快速后端无法处理的对象（如超过 64 位的整数）自动回退到标准库
+
+另外提供“预编码直出”：DB 里缓存的 data_json 本身就是合法 JSON，
+命中缓存时用 raw_envelope_response 直接拼进响应外壳，不再 json.loads + jsonify。
+"""
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+from datetime import date
+
+from flask import Response, current_app, has_app_context
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+from profiling import span
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+
+orjson = None
+ujson = None
+if JSON_BACKEND in ("auto", "orjson"):
+    try:
+        import orjson
+    except ImportError:  # 可选依赖
+        orjson = None
+if orjson is None and JSON_BACKEND in ("auto", "ujson"):
+    try:
+        import ujson
+    except ImportError:  # 可选依赖
+        ujson = None
+
+if orjson is not None:
+    BACKEND_NAME = "orjson"
+elif ujson is not None:
+    BACKEND_NAME = "ujson"
+else:
+    BACKEND_NAME = "json"
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def _default(o):
+    """快速后端 / 标准库都处理不了的类型（转换规则同 Flask 的 DefaultJSONProvider）"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj, indent=None) -> str:
+    separators = None if indent else (",", ":")
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=True,
+                      indent=indent, separators=separators)
+
+
+def dumps_bytes(obj, indent: bool = False) -> bytes:
+    """编码为 UTF-8 字节（响应体 / 写文件直接用，省一次 encode）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            pass
+    elif ujson is not None and not indent:
+        try:
+            # ujson 不支持 default 钩子，遇到 datetime 等类型时回退到标准库
+            return ujson.dumps(obj, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        except (TypeError, OverflowError):
+            pass
+    return _stdlib_dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+
+def dumps(obj, indent: bool = False) -> str:
+    return dumps_bytes(obj, indent=indent).decode("utf-8")
+
+
+def loads(data):
+    """解码 str / bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider：jsonify / request.get_json 都走快速后端；序列化计入 serialize 分段"""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            # 调用方传了自定义参数（如 json.dumps 风格的 indent），交给标准库
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", False)
+            kwargs.setdefault("sort_keys", True)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        with span("serialize"):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = dumps_bytes(obj, indent=self._app.debug)
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def json_bytes_response(body: bytes, status: int = 200) -> Response:
+    """已编码好的 JSON 字节直接作为响应体"""
+    mimetype = current_app.json.mimetype if has_app_context() else "application/json"
+    return Response(body, status=status, mimetype=mimetype)
+
+
+def raw_envelope_response(raw_key: str, raw_json, status: int = 200, **fields) -> Response:
+    """
+    用预编码的 JSON 片段拼出 {raw_key: <raw_json>, **fields}，不解码 raw_json
+    键按字母序输出，与 jsonify 的结果一致
+    """
+    if isinstance(raw_json, str):
+        raw_json = raw_json.encode("utf-8")
+
+    with span("serialize"):
+        parts = []
+        for key in sorted([raw_key, *fields]):
+            value = raw_json if key == raw_key else dumps_bytes(fields[key])
+            parts.append(dumps_bytes(key) + b":" + value)
+        body = b"{" + b",".join(parts) + b"}"
+    return json_bytes_response(body, status=status)
+
+
+def init_json(app):
+    app.json = FastJSONProvider(app)
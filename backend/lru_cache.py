@@ -0,0 +1,55 @@
+# backend/lru_cache.py
+"""
+按估算字节数限制的线程安全 LRU
+
+响应压缩结果（compression）、编码好的紧凑序列响应体（series_format）、
+序列查询的解码 / 编码结果（series_ops）共用这一个实现，各自只提供 sizeof。
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """sizeof(value) 给出每个值占用的字节数；单个值超过 max_bytes 时不缓存"""
+
+    def __init__(self, max_bytes: int, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()     # key → (value, 字节数)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._data[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def body_sizeof(hit) -> int:
+    """(响应体, mimetype)"""
+    return len(hit[0]) + 64
@@ -7,20 +7,45 @@ from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 import threading
+import time
 
 # 1) 先加载 .env（必须在导入 opendigger 蓝图之前）
 BASE_DIR = Path(__file__).resolve().parent  # backend/
 load_dotenv(BASE_DIR / ".env")
 
+from paths import DATA_DIR
 from extensions import db, jwt
 from api.opendigger import api_bp
 from api.auth import auth_bp
 from api.favorites import favorites_bp
+from profiling import init_profiling
+from json_provider import init_json
+from compression import init_compression
+from summary_engine import load_persisted_summary
+from metrics import init_metrics
+from auth_cache import init_auth_cache
+from warmup import init_warmup, mark_pending, needs_warmup, run_warmup, start_warmup, WARMUP_ENABLED
+import metadata as meta
+
+
+def get_allowed_origins():
+    """
+    CORS 允许的源：
+      - 生产环境：从环境变量 ALLOWED_ORIGINS 读取（逗号分隔）
+      - 开发环境：仅允许本地访问
+    """
+    allowed_origins = os.getenv("ALLOWED_ORIGINS", "")
+    if allowed_origins:
+        return [origin.strip() for origin in allowed_origins.split(",")]
+    return ["http://localhost:5173", "http://127.0.0.1:5173"]
 
 
 def create_app():
     app = Flask(__name__)
 
+    # jsonify / request.get_json 使用 orjson 等快速后端（未安装时回退标准库）
+    init_json(app)
+
     # ✅ 安全修复：从环境变量读取密钥，开发环境自动生成随机密钥
     app.config["SECRET_KEY"] = os.getenv(
         "SECRET_KEY", 
@@ -41,53 +66,176 @@ def create_app():
     
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=7)
 
-    db_path = os.path.join(BASE_DIR, "openrank.db")
+    db_path = os.getenv("OPENRANK_DB_PATH", os.path.join(BASE_DIR, "openrank.db"))
     app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
     db.init_app(app)
     jwt.init_app(app)
+    # User 行变化时让用户资料缓存失效
+    init_auth_cache(app)
 
     # ✅ CORS 配置：生产环境使用严格的域名白名单
-    allowed_origins = os.getenv("ALLOWED_ORIGINS", "")
-    if allowed_origins:
-        # 生产环境：从环境变量读取允许的域名列表（逗号分隔）
-        origins = [origin.strip() for origin in allowed_origins.split(",")]
-        CORS(app, resources={r"/api/*": {"origins": origins}}, supports_credentials=True)
-    else:
-        # 开发环境：仅允许本地访问
-        CORS(
-            app,
-            resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}},
-            supports_credentials=True
-        )
+    CORS(app, resources={r"/api/*": {"origins": get_allowed_origins()}}, supports_credentials=True)
 
 
     app.register_blueprint(api_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(favorites_bp)
+
+    # 可选：请求级分段计时 / 采样剖析（PROFILING_ENABLED=1）
+    init_profiling(app)
+
+    # Prometheus 指标：GET /metrics
+    init_metrics(app)
+
+    # 就绪探针：GET /api/ready（预热完成前返回 503）
+    init_warmup(app)
+
+    # 按 Accept-Encoding 压缩响应（br / gzip）
+    init_compression(app)
     return app
 
 
-def start_background_sync(app):
+# 后台同步调度：每隔 SYNC_INTERVAL_HOURS 检查一次，run_sync 内部按 TTL 决定是否真正拉取
+SYNC_TTL_HOURS = 24
+SYNC_INTERVAL_HOURS = float(os.getenv("SYNC_INTERVAL_HOURS", "1"))
+SYNC_LOCK_FILE = DATA_DIR / "sync.lock"
+# 没抢到同步锁的进程每隔多少秒重试一次（同步进程退出后由其他进程接手）
+SYNC_LOCK_RETRY_SECONDS = float(os.getenv("SYNC_LOCK_RETRY_SECONDS", "30"))
+# BACKGROUND_SYNC=0 时完全关闭后台同步（压测、只读副本等场景）
+BACKGROUND_SYNC_ENABLED = os.getenv("BACKGROUND_SYNC", "1") != "0"
+
+_sync_lock_fd = None
+_sync_started = False
+
+
+def acquire_sync_lock() -> bool:
+    """
+    多进程部署时选出唯一的同步进程：拿到 data/sync.lock 文件锁的进程负责同步。
+    锁跟随进程生命周期，进程退出（如 worker 被回收）后释放，由 start_sync_leader_election 的重试线程接手。
+    不支持 fcntl 的平台（Windows）只有单进程，直接返回 True。
+    """
+    global _sync_lock_fd
+    if _sync_lock_fd is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        return True
+
+    SYNC_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(SYNC_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    _sync_lock_fd = fd
+    return True
+
+
+def start_sync_leader_election(app, mark_warmup_pending: bool = False):
+    """
+    每个 worker 都调用：先尝试一次同步锁，拿不到就在后台线程里每 SYNC_LOCK_RETRY_SECONDS 秒重试，
+    拿到后启动后台同步。HUP 重载时新 worker 先于旧的同步进程启动，旧进程退出释放锁后由某个新 worker 接手。
+    mark_warmup_pending：立即拿到锁时先把预热状态标记为 pending（各进程分别 init_db 的部署用）
+    """
+    if acquire_sync_lock():
+        if mark_warmup_pending:
+            mark_pending()
+        start_background_sync(app)
+        return
+
+    def retry():
+        while not acquire_sync_lock():
+            time.sleep(SYNC_LOCK_RETRY_SECONDS)
+        print(f"--- [SYNC] 进程 {os.getpid()} 接手 OpenDigger 后台同步 ---")
+        start_background_sync(app)
+    threading.Thread(target=retry, name="sync-lock-retry", daemon=True).start()
+
+
+def start_background_sync(app, interval_hours: float = SYNC_INTERVAL_HOURS):
+    global _sync_started
+    if _sync_started:
+        return
+    _sync_started = True
+
+    if not BACKGROUND_SYNC_ENABLED:
+        # 不做后台同步时单独预热
+        start_warmup(app)
+        return
+
     def job():
-        with app.app_context():
+        # 先预热热门序列（就绪探针等它），再进入常规同步；接手的进程不重复预热已就绪的部署
+        if WARMUP_ENABLED and needs_warmup():
+            run_warmup(app)
+        while True:
+            with app.app_context():
+                try:
+                    from data_fetcher import run_sync
+                    run_sync(force=False, ttl_hours=SYNC_TTL_HOURS)  # 24小时内不重复拉
+                except Exception:
+                    app.logger.exception("OpenDigger 数据同步失败（后台任务）")
+                try:
+                    # 访问频繁的序列在过期前主动刷新
+                    from access_tracker import refresh_hot_series
+                    refresh_hot_series()
+                except Exception:
+                    app.logger.exception("热门序列刷新失败（后台任务）")
+                try:
+                    # 淘汰 config 之外的冷数据、回收空闲页（按 STORAGE_MAINTENANCE_HOURS 间隔）
+                    from storage import maybe_run_maintenance
+                    maybe_run_maintenance()
+                except Exception:
+                    app.logger.exception("数据库存储维护失败（后台任务）")
+            if not interval_hours or interval_hours <= 0:
+                return
+            time.sleep(interval_hours * 3600)
+    threading.Thread(target=job, name="opendigger-sync", daemon=True).start()
+
+
+_db_initialized = False
+
+
+def init_db(app, mark_warmup_pending: bool = True):
+    """
+    建表、加载汇总快照和元数据；每个部署在 master / 单进程里调用一次。
+    各进程分别初始化时（uvicorn --workers）传 mark_warmup_pending=False，
+    避免后启动的进程把预热进度改回 pending，由负责同步的进程开始预热时写状态
+    """
+    global _db_initialized
+    with app.app_context():
+        db.create_all()
+        # 新部署先标记未就绪，由负责同步的进程预热完成后放行
+        if mark_warmup_pending:
+            mark_pending()
+        # 加载同步时持久化的汇总快照（gunicorn preload 时在 master 中加载，worker 共享）
+        load_persisted_summary()
+        # 把数据库里已同步的实体 / 仓库登记到元数据注册表
+        if os.getenv("METADATA_FROM_DB", "1") != "0":
             try:
-                from data_fetcher import run_sync
-                run_sync(force=False, ttl_hours=24)  # 24小时内不重复拉
-            except Exception:
-                app.logger.exception("OpenDigger 数据同步失败（后台任务）")
-    threading.Thread(target=job, daemon=True).start()
+                meta.registry.load_from_db()
+            except Exception as e:
+                app.logger.warning("从数据库加载元数据失败: %s", e)
+    _db_initialized = True
+
+
+def db_initialized() -> bool:
+    """本进程（或 preload 模式下 fork 前的 master）是否已执行过 init_db"""
+    return _db_initialized
 
 
 app = create_app()
 
 if __name__ == "__main__":
     DEBUG = True
-    with app.app_context():
-        db.create_all()
-        
+    init_db(app)
+
     if (not DEBUG) or (os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
         start_background_sync(app)
 
-    app.run(host="0.0.0.0", port=8000, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=8000, debug=True)
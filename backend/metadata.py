@@ -1,4 +1,9 @@
 # metadata.py - 新增仓库列表配置
+import bisect
+import json
+import os
+import threading
+from contextlib import contextmanager
 from typing import List, Dict
 
 # ===================== 基础配置（开发者可扩展）=====================
@@ -68,12 +73,243 @@ USER_METRICS: List[Dict] = [
     {"value": "contributors", "label": "贡献者数", "description": "开发者参与项目的贡献者数"}
 ]
 
+# ===================== 注册表（哈希索引 + 前缀搜索）=====================
+# 上面的静态配置只是内置目录；registry 在此基础上合并 METADATA_FILE（JSON）和数据库里已同步的实体 / 仓库，
+# 每次 /api/data 请求的平台 / 实体校验都是 dict / set 查找，与目录大小无关。
+METADATA_FILE = os.getenv("METADATA_FILE", "")
+
+
+def _search_keys(item: Dict):
+    """前缀搜索的键：value 和 label（小写），两者相同时只保留一个"""
+    keys = {str(item.get("value", "")).lower(), str(item.get("label", "")).lower()}
+    keys.discard("")
+    return keys
+
+
+class PrefixIndex:
+    """
+    排序的 "小写键\0编号" 列表 + 二分查找；编号是调用方的条目 / 文档下标（search_index 的全局索引也用它）。
+    新写入的键先进 pending（查询时线性扫描），攒够 pending_max 条再归并进排序列表，
+    不会每次写入都重排整个列表
+    """
+
+    def __init__(self, pending_max: int = 256):
+        self.pending_max = pending_max
+        self._items = []                # add() 登记的条目
+        self._sorted = []
+        self._pending = []
+        self._deferred = False
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending)
+
+    def add_key(self, key: str, code: int):
+        # "\0" 比任何字符都小，拼接后的字符串排序与按键排序一致
+        self._pending.append(f"{key.lower().replace(chr(0), '')}\0{code}")
+        if len(self._pending) >= self.pending_max and not self._deferred:
+            self.compact()
+
+    def compact(self):
+        """把 pending 归并进排序列表（整体替换，读到的始终是完整的一份）"""
+        if not self._pending:
+            return
+        # 两段有序序列拼接后排序：timsort 识别为两个 run，在 C 里归并
+        merged = self._sorted + sorted(self._pending)
+        merged.sort()
+        self._sorted = merged
+        self._pending = []
+
+    @contextmanager
+    def bulk(self):
+        """批量写入期间不做增量归并，结束时一次排序"""
+        self._deferred = True
+        try:
+            yield self
+        finally:
+            self._deferred = False
+            self.compact()
+
+    def scan(self, prefix: str, limit: int):
+        """前缀匹配的 [(键, 编号)]：排序列表里按字典序最多 limit 个，加上 pending 里的全部匹配（未排序）"""
+        prefix = prefix.lower()
+        entries = self._sorted
+        start = bisect.bisect_left(entries, prefix)
+        matches = []
+        for entry in entries[start:start + limit]:
+            if not entry.startswith(prefix):
+                break
+            matches.append(entry)
+        matches.extend(entry for entry in list(self._pending) if entry.startswith(prefix))
+        result = []
+        for entry in matches:
+            key, _, code = entry.rpartition("\0")
+            result.append((key, int(code)))
+        return result
+
+    # ---- 条目接口（metadata 注册表的实体 / 仓库选择框）----
+
+    def add(self, item: Dict):
+        code = len(self._items)
+        self._items.append(item)
+        for key in _search_keys(item):
+            self.add_key(key, code)
+
+    def search(self, prefix: str, limit: int = 20) -> List[Dict]:
+        # 每个条目最多两个键，取 2 * limit 个键足够凑出 limit 个不同条目
+        result, seen = [], set()
+        for _, i in sorted(self.scan(prefix, limit * 2)):
+            if len(result) >= limit:
+                break
+            if i not in seen:
+                seen.add(i)
+                result.append(self._items[i])
+        return result
+
+
+class MetadataRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.platforms: List[Dict] = []
+        self._platform_index: Dict[str, Dict] = {}
+        self._entities: Dict[str, List[Dict]] = {}            # platform → [entity]（按注册顺序）
+        self._entity_index: Dict[tuple, Dict] = {}            # (platform, entity) → entity
+        self._entity_search: Dict[str, PrefixIndex] = {}
+        self._repos: Dict[tuple, List[Dict]] = {}             # (platform, org) → [repo]
+        self._repo_index: set = set()                         # (platform, org, repo)
+        self._repo_search: Dict[tuple, PrefixIndex] = {}
+
+    # ---- 注册 ----
+
+    def register_platform(self, value: str, label: str = "", description: str = ""):
+        with self._lock:
+            if value in self._platform_index:
+                return
+            item = {"value": value, "label": label or value, "description": description}
+            self.platforms.append(item)
+            self._platform_index[value] = item
+            self._entities.setdefault(value, [])
+            self._entity_search.setdefault(value, PrefixIndex())
+
+    def register_entity(self, platform: str, value: str, entity_type: str,
+                        label: str = "", description: str = "") -> bool:
+        """已存在时不覆盖（内置配置优先）；平台不支持时返回 False"""
+        with self._lock:
+            if platform not in self._platform_index or (platform, value) in self._entity_index:
+                return False
+            item = {"value": value, "label": label or value, "type": entity_type, "description": description}
+            self._entities[platform].append(item)
+            self._entity_index[(platform, value)] = item
+            self._entity_search[platform].add(item)
+            return True
+
+    def register_repo(self, platform: str, org: str, value: str,
+                      label: str = "", description: str = "") -> bool:
+        with self._lock:
+            if (platform, org, value) in self._repo_index:
+                return False
+            item = {"value": value, "label": label or value, "description": description}
+            self._repos.setdefault((platform, org), []).append(item)
+            self._repo_index.add((platform, org, value))
+            self._repo_search.setdefault((platform, org), PrefixIndex()).add(item)
+            return True
+
+    def load_static(self):
+        """内置的 SUPPORTED_PLATFORMS / PLATFORM_ENTITIES / ORG_REPOS"""
+        for p in SUPPORTED_PLATFORMS:
+            self.register_platform(p["value"], p.get("label", ""), p.get("description", ""))
+        for platform, entities in PLATFORM_ENTITIES.items():
+            for e in entities:
+                self.register_entity(platform, e["value"], e["type"], e.get("label", ""), e.get("description", ""))
+        for key, repos in ORG_REPOS.items():
+            platform, org = key.split("_", 1)
+            for r in repos:
+                self.register_repo(platform, org, r["value"], r.get("label", ""), r.get("description", ""))
+
+    def load_file(self, path) -> int:
+        """
+        从 JSON 文件加载，格式与上面的静态配置一致：
+          {"platforms": [...], "entities": {platform: [...]}, "repos": {"platform_org": [...]}}
+        返回新注册的实体 + 仓库数
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for p in data.get("platforms", []):
+            self.register_platform(p["value"], p.get("label", ""), p.get("description", ""))
+        added = 0
+        for platform, entities in data.get("entities", {}).items():
+            for e in entities:
+                added += self.register_entity(platform, e["value"], e.get("type", "org"),
+                                              e.get("label", ""), e.get("description", ""))
+        for key, repos in data.get("repos", {}).items():
+            platform, org = key.split("_", 1)
+            for r in repos:
+                added += self.register_repo(platform, org, r["value"], r.get("label", ""), r.get("description", ""))
+        return added
+
+    def load_from_db(self) -> int:
+        """
+        把 metric_series 里已有数据的实体 / 仓库登记进来（需要应用上下文）：
+        有仓库数据的是组织，repo 为空的是用户；返回新注册的实体 + 仓库数
+        """
+        from extensions import db
+        from models import MetricSeries
+
+        rows = db.session.query(MetricSeries.platform, MetricSeries.entity, MetricSeries.repo).distinct().all()
+        added = 0
+        for platform, entity, repo in rows:
+            added += self.register_entity(platform, entity, "org" if repo else "user")
+        for platform, entity, repo in rows:
+            if repo and self.get_entity_type(platform, entity) == "org":
+                added += self.register_repo(platform, entity, repo)
+        return added
+
+    # ---- 查询（O(1)）----
+
+    def is_supported_platform(self, platform: str) -> bool:
+        return platform in self._platform_index
+
+    def get_entities(self, platform: str) -> List[Dict]:
+        return self._entities.get(platform, [])
+
+    def is_valid_entity(self, platform: str, entity: str) -> bool:
+        return (platform, entity) in self._entity_index
+
+    def get_entity_type(self, platform: str, entity: str) -> str:
+        item = self._entity_index.get((platform, entity))
+        return item["type"] if item else ""
+
+    def get_repos(self, platform: str, org: str) -> List[Dict]:
+        return self._repos.get((platform, org), [])
+
+    def is_valid_repo(self, platform: str, org: str, repo: str) -> bool:
+        return (platform, org, repo) in self._repo_index
+
+    # ---- 前缀搜索（实体 / 仓库选择框）----
+
+    def search_entities(self, platform: str, prefix: str, limit: int = 20) -> List[Dict]:
+        index = self._entity_search.get(platform)
+        return index.search(prefix, limit) if index else []
+
+    def search_repos(self, platform: str, org: str, prefix: str, limit: int = 20) -> List[Dict]:
+        index = self._repo_search.get((platform, org))
+        return index.search(prefix, limit) if index else []
+
+
+registry = MetadataRegistry()
+registry.load_static()
+if METADATA_FILE:
+    try:
+        registry.load_file(METADATA_FILE)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  加载 METADATA_FILE 失败: {e}")
+
+
 # ===================== 工具函数=========================
 def get_platforms() -> List[Dict]:
-    return SUPPORTED_PLATFORMS
+    return registry.platforms
 
 def get_entities(platform: str) -> List[Dict]:
-    return PLATFORM_ENTITIES.get(platform, [])
+    return registry.get_entities(platform)
 
 def get_metrics(entity_type: str) -> List[Dict]:
     if entity_type == "org":
@@ -84,20 +320,20 @@ def get_metrics(entity_type: str) -> List[Dict]:
 
 def get_repos(platform: str, org: str) -> List[Dict]:
     """根据平台+组织获取可查询的仓库列表"""
-    key = f"{platform}_{org}"
-    return ORG_REPOS.get(key, [])
+    return registry.get_repos(platform, org)
 
 # 其他工具函数
 def is_supported_platform(platform: str) -> bool:
-    return platform in [p["value"] for p in SUPPORTED_PLATFORMS]
+    return registry.is_supported_platform(platform)
 
 def is_valid_entity(platform: str, entity: str) -> bool:
-    entities = get_entities(platform)
-    return any(e["value"] == entity for e in entities)
+    return registry.is_valid_entity(platform, entity)
 
 def get_entity_type(platform: str, entity: str) -> str:
-    entities = get_entities(platform)
-    for e in entities:
-        if e["value"] == entity:
-            return e["type"]
-    return ""
\ No newline at end of file
+    return registry.get_entity_type(platform, entity)
+
+def search_entities(platform: str, prefix: str, limit: int = 20) -> List[Dict]:
+    return registry.search_entities(platform, prefix, limit)
+
+def search_repos(platform: str, org: str, prefix: str, limit: int = 20) -> List[Dict]:
+    return registry.search_repos(platform, org, prefix, limit)
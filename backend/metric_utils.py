@@ -6,6 +6,8 @@
 import math
 from typing import List, Dict, Any, Optional
 
+from series import Series
+
 
 def mean(values: List[float]) -> float:
     """
@@ -36,7 +38,7 @@ def std_population(values: List[float]) -> float:
 
 
 def tail_n_values(
-    records: List[Dict[str, Any]], 
+    records: List[Dict[str, Any]] | Series, 
     n: int = 12,
     month_key: str = "month",
     value_key: str = "count"
@@ -45,13 +47,16 @@ def tail_n_values(
     从月度记录中提取最近 n 个月的数值
     
     Args:
-        records: 记录列表，格式如 [{"month": "2024-01", "count": 123}, ...]
+        records: 记录列表，格式如 [{"month": "2024-01", "count": 123}, ...]；
+                 也可以直接传 series.Series
         n: 取最近多少个月，默认 12
         month_key: 月份字段名，默认 "month"
         value_key: 数值字段名，默认 "count"
     Returns:
         数值列表
     """
+    if isinstance(records, Series):
+        return records.tail_values(n)
     if not records:
         return []
     
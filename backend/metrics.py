@@ -0,0 +1,155 @@
+# backend/metrics.py
+"""
+Prometheus 指标导出（GET /metrics）
+
+指标：
+  - openrank_series_cache_requests_total{metric, result}    DB 缓存命中 / 未命中 / 负缓存（negative）
+                                                            metric 只取已知指标名，其余记为 other
+  - openrank_upstream_requests_total{target, status}        上游请求数（按状态码）
+  - openrank_upstream_request_seconds{target}               上游请求耗时
+  - openrank_summary_rebuild_seconds                        LLM 汇总重算耗时
+  - openrank_sync_rows_written_total{metric}                同步写入的序列条数
+  - openrank_sync_failures_total{metric, reason}            同步失败次数
+  - openrank_sync_duration_seconds                          单次全量同步耗时
+  - openrank_sync_progress_ratio / openrank_sync_last_success_timestamp_seconds
+  - openrank_rate_limit_denied_total{endpoint}              限流拒绝次数
+  - openrank_llm_request_seconds{outcome}                   LLM 调用耗时
+  - openrank_warmup_fetches_total{result} / openrank_warmup_ready   启动预热（warmup.py）
+  - openrank_db_size_bytes / openrank_db_free_page_ratio    数据库文件大小 / 空闲页比例（storage.py）
+
+多进程（gunicorn）部署时设置 PROMETHEUS_MULTIPROC_DIR，/metrics 会聚合所有 worker 的数据。
+未安装 prometheus_client 时所有指标都是空操作，/metrics 返回 503。
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # 可选依赖
+    prometheus_client = None
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# 上游 / LLM 请求的耗时桶（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _NoopMetric:
+    """未安装 prometheus_client 时的占位对象"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+_NOOP = _NoopMetric()
+
+
+def _counter(name, documentation, labelnames=()):
+    if prometheus_client is None:
+        return _NOOP
+    return Counter(name, documentation, labelnames)
+
+
+def _histogram(name, documentation, labelnames=(), buckets=None):
+    if prometheus_client is None:
+        return _NOOP
+    return Histogram(name, documentation, labelnames, buckets=buckets or Histogram.DEFAULT_BUCKETS)
+
+
+def _gauge(name, documentation, labelnames=(), multiprocess_mode="max"):
+    if prometheus_client is None:
+        return _NOOP
+    return Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+
+SERIES_CACHE_REQUESTS = _counter(
+    "openrank_series_cache_requests_total", "MetricSeries DB 缓存查询结果", ("metric", "result")
+)
+UPSTREAM_REQUESTS = _counter(
+    "openrank_upstream_requests_total", "上游请求数", ("target", "status")
+)
+UPSTREAM_LATENCY = _histogram(
+    "openrank_upstream_request_seconds", "上游请求耗时（秒）", ("target",), buckets=LATENCY_BUCKETS
+)
+SUMMARY_REBUILD = _histogram(
+    "openrank_summary_rebuild_seconds", "LLM 生态汇总重算耗时（秒）"
+)
+SYNC_ROWS_WRITTEN = _counter(
+    "openrank_sync_rows_written_total", "同步写入 DB 的序列条数", ("metric",)
+)
+SYNC_FAILURES = _counter(
+    "openrank_sync_failures_total", "同步失败次数", ("metric", "reason")
+)
+SYNC_DURATION = _histogram(
+    "openrank_sync_duration_seconds", "单次 OpenDigger 全量同步耗时（秒）",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600),
+)
+SYNC_PROGRESS = _gauge(
+    "openrank_sync_progress_ratio", "当前同步进度（0~1）"
+)
+SYNC_LAST_SUCCESS = _gauge(
+    "openrank_sync_last_success_timestamp_seconds", "最近一次同步完成的时间戳"
+)
+RATE_LIMIT_DENIED = _counter(
+    "openrank_rate_limit_denied_total", "限流拒绝次数", ("endpoint",)
+)
+LLM_LATENCY = _histogram(
+    "openrank_llm_request_seconds", "LLM 调用耗时（秒）", ("outcome",), buckets=LATENCY_BUCKETS
+)
+
+
+def record_upstream(target: str, status, seconds: float):
+    """记录一次上游请求；status 为 HTTP 状态码，网络异常时为 error"""
+    UPSTREAM_REQUESTS.labels(target=target, status=str(status)).inc()
+    UPSTREAM_LATENCY.labels(target=target).observe(seconds)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """把代码块耗时记到 histogram（带 labels 时先绑定）"""
+    metric = histogram.labels(**labels) if labels else histogram
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+# ==== /metrics ====
+
+def metrics_view():
+    from flask import Response
+
+    if prometheus_client is None:
+        return Response("prometheus_client 未安装\n", status=503, mimetype="text/plain")
+
+    if MULTIPROC_DIR:
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+
+
+def mark_process_dead(pid: int):
+    """gunicorn child_exit 时清理该 worker 的多进程指标文件"""
+    if prometheus_client is not None and MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
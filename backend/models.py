@@ -1,8 +1,9 @@
 # backend/models.py
 from datetime import datetime
 import json
-from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
+from json_provider import loads as fast_loads
+import passwords
 
 
 class User(db.Model):
@@ -14,11 +15,16 @@ class User(db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # KDF 在 passwords 的进程池里执行；池排队满时抛 passwords.PasswordPoolBusy
     def set_password(self, raw_password: str):
-        self.password_hash = generate_password_hash(raw_password)
+        self.password_hash = passwords.hash_password(raw_password)
 
     def check_password(self, raw_password: str) -> bool:
-        return check_password_hash(self.password_hash, raw_password)
+        return passwords.verify_password(self.password_hash, raw_password)
+
+    def password_needs_rehash(self) -> bool:
+        """哈希方案 / 参数已过时（登录成功后用明文重新计算）"""
+        return passwords.needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -100,6 +106,46 @@ class MetricSeries(db.Model):
 
     def to_records(self):
         try:
-            return json.loads(self.data_json) or []
+            return fast_loads(self.data_json) or []
         except Exception:
             return []
+
+
+class MissingSeries(db.Model):
+    """上游确认不存在（404 / 无有效数据）的序列，负缓存用（见 negative_cache.py）"""
+    __tablename__ = "missing_series"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    platform = db.Column(db.String(32), nullable=False)
+    entity = db.Column(db.String(128), nullable=False)
+    repo = db.Column(db.String(128), nullable=False, default="")
+    metric = db.Column(db.String(64), nullable=False)
+
+    reason = db.Column(db.String(32), nullable=False, default="404")   # 404 / empty
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("platform", "entity", "repo", "metric", name="uq_missing_series"),
+    )
+
+
+class SeriesAccess(db.Model):
+    """序列访问频率（见 access_tracker.py）：各进程内存计数，批量合并到这里"""
+    __tablename__ = "series_access"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    platform = db.Column(db.String(32), nullable=False)
+    entity = db.Column(db.String(128), nullable=False)
+    repo = db.Column(db.String(128), nullable=False, default="")
+    metric = db.Column(db.String(64), nullable=False)
+
+    hits = db.Column(db.Integer, nullable=False, default=0)         # 累计访问次数
+    score = db.Column(db.Float, nullable=False, default=0.0)        # 按半衰期衰减到 last_access_at 时的热度
+    last_access_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("platform", "entity", "repo", "metric", name="uq_series_access"),
+    )
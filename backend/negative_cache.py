@@ -0,0 +1,153 @@
+# backend/negative_cache.py
+"""
+上游 404 / 无效序列的负缓存
+
+OpenDigger 对不存在的仓库 / 指标返回 404，原来每次请求都要走一次完整的上游往返，
+爬虫扫不存在的路径时很容易被放大。这里记录"已知不存在"的 (platform, entity, repo, metric)：
+  - missing_series 表（models.MissingSeries）：带过期时间，多进程 / 同步任务共享
+  - 进程内：{key: 过期时间}，最多 NEGATIVE_CACHE_MAX_ENTRIES 条（满了先丢过期项，再丢最早记录的）。
+    命中的请求直接本地返回 404，不访问上游也不查库
+
+来源：API 请求遇到 404 / 无有效数据、后台同步的 404、ASGI 异步预取的 404。
+序列成功写入时（store_series / 同步）删除对应记录：表里的记录总是删除（可能是其他进程写的），
+其他进程的内存副本在下一次重新加载时消失。
+其他进程写入的记录每 NEGATIVE_CACHE_RELOAD_SECONDS 秒从表里重新加载一次（同时丢掉过期项）。
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import MissingSeries
+
+NEGATIVE_CACHE_ENABLED = os.getenv("NEGATIVE_CACHE_ENABLED", "1") != "0"
+NEGATIVE_CACHE_TTL_HOURS = float(os.getenv("NEGATIVE_CACHE_TTL_HOURS", "24"))
+NEGATIVE_CACHE_RELOAD_SECONDS = float(os.getenv("NEGATIVE_CACHE_RELOAD_SECONDS", "30"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "100000"))
+
+
+def _key(platform: str, entity: str, repo: str | None, metric: str):
+    return (platform, entity, repo or "", metric)
+
+
+class NegativeCache:
+    def __init__(self, ttl_hours: float = NEGATIVE_CACHE_TTL_HOURS,
+                 reload_seconds: float = NEGATIVE_CACHE_RELOAD_SECONDS,
+                 max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.reload_seconds = reload_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}        # key → 过期时间（epoch 秒），按记录顺序
+        self._next_reload = 0.0
+
+    # ---- 读 ----
+
+    def is_missing(self, platform: str, entity: str, repo: str | None, metric: str) -> bool:
+        """该序列是否已知不存在（未过期）"""
+        if not NEGATIVE_CACHE_ENABLED:
+            return False
+        if time.monotonic() >= self._next_reload:
+            self.reload()
+
+        expires = self._entries.get(_key(platform, entity, repo, metric))
+        return expires is not None and expires > time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def reload(self):
+        """从 missing_series 重新加载未过期的记录（需要应用上下文；失败时保留现有内容）"""
+        with self._lock:
+            if time.monotonic() < self._next_reload:
+                return
+            self._next_reload = time.monotonic() + self.reload_seconds
+            try:
+                # 超出上限时保留最晚过期（最近记录）的
+                rows = (
+                    MissingSeries.query.filter(MissingSeries.expires_at > datetime.utcnow())
+                    .order_by(MissingSeries.expires_at.desc())
+                    .limit(self.max_entries)
+                    .all()
+                )
+            except Exception:
+                db.session.rollback()
+                return
+
+            entries = {}
+            for row in reversed(rows):
+                entries[(row.platform, row.entity, row.repo or "", row.metric)] = _epoch(row.expires_at)
+            self._entries = entries
+
+    # ---- 写 ----
+
+    def record(self, platform: str, entity: str, repo: str | None, metric: str, reason: str = "404"):
+        """记录一个不存在的序列（upsert missing_series + 本进程立即生效）"""
+        if not NEGATIVE_CACHE_ENABLED:
+            return
+        key = _key(platform, entity, repo, metric)
+        expires_at = datetime.utcnow() + self.ttl
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = _epoch(expires_at)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+        try:
+            row = MissingSeries.query.filter_by(
+                platform=key[0], entity=key[1], repo=key[2], metric=key[3]
+            ).first()
+            if row:
+                row.reason = reason
+                row.expires_at = expires_at
+            else:
+                db.session.add(MissingSeries(
+                    platform=key[0], entity=key[1], repo=key[2], metric=key[3],
+                    reason=reason, expires_at=expires_at,
+                ))
+            db.session.commit()
+        except Exception:
+            # 并发写入同一 key 等：本进程内已生效，表里的记录下次再补
+            db.session.rollback()
+
+    def _evict(self):
+        """超出 max_entries 时丢最早记录的：TTL 相同，记录顺序就是过期顺序（调用方持有锁）"""
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self, platform: str, entity: str, repo: str | None, metric: str):
+        """
+        序列成功写入后调用。表里的记录总是删除：它可能是其他进程写的，本进程内存里没有
+        """
+        if not NEGATIVE_CACHE_ENABLED:
+            return
+        key = _key(platform, entity, repo, metric)
+        with self._lock:
+            self._entries.pop(key, None)
+        try:
+            MissingSeries.query.filter_by(
+                platform=key[0], entity=key[1], repo=key[2], metric=key[3]
+            ).delete()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    def purge_expired(self) -> int:
+        """删除表里已过期的记录，返回删除条数（同步结束时调用）"""
+        try:
+            count = MissingSeries.query.filter(MissingSeries.expires_at <= datetime.utcnow()).delete()
+            db.session.commit()
+            return count
+        except Exception:
+            db.session.rollback()
+            return 0
+
+
+def _epoch(dt: datetime) -> float:
+    """naive UTC datetime → epoch 秒"""
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+negative_cache = NegativeCache()
@@ -0,0 +1,188 @@
+# backend/passwords.py
+"""
+密码哈希子系统
+
+原来 User.set_password / check_password 在请求线程里直接跑 werkzeug 默认 KDF，
+登录高峰时 KDF 占满 worker 的 CPU，同一进程的其他请求也被拖慢。这里：
+  - 方案可配置（PASSWORD_SCHEME）：
+      argon2id   需要 argon2-cffi；默认 t=2、m=19MiB、p=1（OWASP 推荐的最低配置之一）
+      scrypt     标准库 hashlib.scrypt，默认 N=2^15、r=8、p=1；格式与 werkzeug 相同（"scrypt:N:r:p$salt$hash"）
+      auto       装了 argon2-cffi 用 argon2id，否则 scrypt（默认）
+  - 校验兼容旧哈希：werkzeug 的 pbkdf2 / scrypt、任意参数的 argon2id 都能验证；
+    needs_rehash 判断是否与当前方案 / 参数一致，登录成功后透明升级
+  - KDF 在有界进程池里执行（PASSWORD_POOL_WORKERS 个进程，排队上限 PASSWORD_POOL_MAX_PENDING）：
+    请求线程只是等待结果，不占 GIL 也不占本进程 CPU；排队满了抛 PasswordPoolBusy（接口返回 503）。
+    PASSWORD_POOL_WORKERS=0 时在当前线程执行
+
+基准：python benchmarks/bench_passwords.py
+"""
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    from argon2.low_level import Type as Argon2Type
+except ImportError:  # 可选依赖
+    PasswordHasher = None
+
+PASSWORD_SCHEME = os.getenv("PASSWORD_SCHEME", "auto").lower()
+ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_KIB = int(os.getenv("PASSWORD_ARGON2_MEMORY_KIB", "19456"))
+ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "1"))
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(1 << 15)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", str(PASSWORD_POOL_WORKERS * 8)))
+PASSWORD_POOL_TIMEOUT = float(os.getenv("PASSWORD_POOL_TIMEOUT", "10"))
+
+SALT_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+class PasswordPoolBusy(Exception):
+    """KDF 进程池排队已满 / 等待超时"""
+
+
+def resolve_scheme(scheme: str = PASSWORD_SCHEME) -> str:
+    if scheme == "auto":
+        return "argon2id" if PasswordHasher is not None else "scrypt"
+    if scheme == "argon2id" and PasswordHasher is None:
+        raise RuntimeError("PASSWORD_SCHEME=argon2id 需要安装 argon2-cffi")
+    if scheme not in ("argon2id", "scrypt"):
+        raise ValueError(f"不支持的 PASSWORD_SCHEME：{scheme}")
+    return scheme
+
+
+def scheme_params(scheme: str | None = None) -> dict:
+    """当前（或指定）方案及其参数，基准脚本 / 进程池都用这份描述"""
+    scheme = resolve_scheme(scheme or PASSWORD_SCHEME)
+    if scheme == "argon2id":
+        return {"scheme": scheme, "time_cost": ARGON2_TIME_COST, "memory_cost": ARGON2_MEMORY_KIB,
+                "parallelism": ARGON2_PARALLELISM}
+    return {"scheme": scheme, "n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P}
+
+
+# ==== KDF（在进程池里执行：只用模块级函数和可 pickle 的参数） ====
+
+_hashers = {}
+
+
+def _argon2_hasher(params: dict):
+    key = (params["time_cost"], params["memory_cost"], params["parallelism"])
+    hasher = _hashers.get(key)
+    if hasher is None:
+        hasher = _hashers[key] = PasswordHasher(
+            time_cost=params["time_cost"], memory_cost=params["memory_cost"],
+            parallelism=params["parallelism"], type=Argon2Type.ID,
+        )
+    return hasher
+
+
+def _scrypt_method(params: dict) -> str:
+    return f"scrypt:{params['n']}:{params['r']}:{params['p']}"
+
+
+def _hash(password: str, params: dict) -> str:
+    if params["scheme"] == "argon2id":
+        return _argon2_hasher(params).hash(password)
+    n, r, p = params["n"], params["r"], params["p"]
+    salt = "".join(secrets.choice(SALT_CHARS) for _ in range(16))
+    digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p)
+    return f"{_scrypt_method(params)}${salt}${digest.hex()}"
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    if password_hash.startswith("$argon2"):
+        if PasswordHasher is None:
+            return False
+        try:
+            return _argon2_hasher({"time_cost": 1, "memory_cost": 8, "parallelism": 1}).verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    # werkzeug 格式：pbkdf2:... / scrypt:...（内部用 hmac.compare_digest）
+    return check_password_hash(password_hash, password)
+
+
+def needs_rehash(password_hash: str, params: dict | None = None) -> bool:
+    """哈希的方案 / 参数与当前配置不一致时返回 True（登录成功后用明文重新计算）"""
+    params = params or scheme_params()
+    if params["scheme"] == "argon2id":
+        if not password_hash.startswith("$argon2id$"):
+            return True
+        try:
+            return _argon2_hasher(params).check_needs_rehash(password_hash)
+        except InvalidHashError:
+            return True
+    method = password_hash.split("$", 1)[0]
+    return not hmac.compare_digest(method, _scrypt_method(params))
+
+
+# ==== 进程池 ====
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(PASSWORD_POOL_MAX_PENDING, 1))
+
+
+def _get_pool():
+    """每个进程（fork 之后）一个池；spawn 启动，不继承 Web 进程的线程 / 连接"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _run(func, *args):
+    if PASSWORD_POOL_WORKERS <= 0:
+        return func(*args)
+    # 排队上限：不阻塞等待空位，满了直接让客户端稍后重试
+    if not _slots.acquire(blocking=False):
+        raise PasswordPoolBusy("密码校验排队已满")
+    try:
+        try:
+            future = _get_pool().submit(func, *args)
+            return future.result(timeout=PASSWORD_POOL_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordPoolBusy("密码校验超时")
+        except BrokenProcessPool:
+            # 子进程被 OOM killer 等杀掉：丢弃这个池，下次请求重建
+            shutdown_pool()
+            raise PasswordPoolBusy("密码校验进程异常退出")
+    finally:
+        _slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(_hash, password, scheme_params())
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    if not password_hash:
+        return False
+    return _run(_verify, password_hash, password)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
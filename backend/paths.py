@@ -0,0 +1,13 @@
+# backend/paths.py
+"""
+运行时文件目录
+
+同步锁、mmap 快照、LLM 汇总、预热状态、check_repos 断点、剖析输出都写在 DATA_DIR 下。
+OPENRANK_DATA_DIR 可以把它们整体指到别处（压测 / 多个实例共用一份代码时互不干扰），
+数据库路径另见 OPENRANK_DB_PATH。
+"""
+import os
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv("OPENRANK_DATA_DIR", BACKEND_ROOT / "data"))
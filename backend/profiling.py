@@ -0,0 +1,247 @@
+# backend/profiling.py
+"""
+请求级性能剖析与热点埋点（默认关闭，PROFILING_ENABLED=1 开启）
+
+  - 分段计时：每个请求统计 db / upstream / decode / serialize 耗时，
+    通过 Server-Timing 响应头返回（浏览器 DevTools 的 Timing 面板可直接查看）
+      * db：SQLAlchemy 游标事件自动统计，覆盖所有蓝图
+      * upstream / decode：在调用处用 span("...") 包裹
+      * serialize：jsonify 走 json_provider.FastJSONProvider
+  - 采样剖析：按 PROFILE_SAMPLE_RATE 抽样请求，超过 PROFILE_SLOW_MS 的请求输出到 data/profiles/
+      * PROFILE_MODE=sampler（默认）：后台线程定期抓取请求线程的调用栈，输出 folded stacks，
+        可直接交给 flamegraph.pl / speedscope
+      * PROFILE_MODE=cprofile：cProfile 的 .prof 文件，可用 snakeviz / flameprof 查看
+  - 聚合直方图：GET /api/debug/timings（仅开启时注册）
+"""
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from flask import g, has_request_context, jsonify, request
+
+from paths import DATA_DIR
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampler")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = DATA_DIR / "profiles"
+
+SPAN_NAMES = ("db", "upstream", "decode", "serialize")
+
+# 直方图桶上界（毫秒），最后一个桶是 +Inf
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+# ==== 分段计时 ====
+
+def _add_span(name: str, elapsed_ms: float):
+    spans = g.get("_timing_spans")
+    if spans is None:
+        spans = g._timing_spans = defaultdict(float)
+    spans[name] += elapsed_ms
+
+
+@contextmanager
+def span(name: str):
+    """
+    统计一段代码的耗时，累加到当前请求的分段计时中
+    未开启剖析或不在请求上下文中（后台同步等）时开销可以忽略
+    """
+    if not PROFILING_ENABLED or not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_span(name, (time.perf_counter() - start) * 1000.0)
+
+
+def _install_db_timing():
+    """用 SQLAlchemy 游标事件统计所有 SQL 耗时（对所有 Engine 生效）"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_profiling_start", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_profiling_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000.0
+        if has_request_context():
+            _add_span("db", elapsed_ms)
+
+
+# ==== 聚合直方图 ====
+
+class TimingHistogram:
+    """按 (endpoint, 分段) 聚合的固定桶直方图（进程内，线程安全）"""
+
+    def __init__(self, buckets_ms=HISTOGRAM_BUCKETS_MS):
+        self._buckets = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def observe(self, endpoint: str, name: str, value_ms: float):
+        with self._lock:
+            item = self._data.get((endpoint, name))
+            if item is None:
+                item = self._data[(endpoint, name)] = {
+                    "counts": [0] * (len(self._buckets) + 1),
+                    "count": 0,
+                    "sum_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            item["counts"][bisect.bisect_left(self._buckets, value_ms)] += 1
+            item["count"] += 1
+            item["sum_ms"] += value_ms
+            item["max_ms"] = max(item["max_ms"], value_ms)
+
+    def snapshot(self):
+        with self._lock:
+            result = defaultdict(dict)
+            bounds = list(self._buckets) + ["+Inf"]
+            for (endpoint, name), item in self._data.items():
+                result[endpoint][name] = {
+                    "count": item["count"],
+                    "mean_ms": round(item["sum_ms"] / item["count"], 3) if item["count"] else 0.0,
+                    "max_ms": round(item["max_ms"], 3),
+                    # 非累计计数：le 为桶上界（毫秒）
+                    "buckets": [{"le": b, "count": c} for b, c in zip(bounds, item["counts"])],
+                }
+            return dict(result)
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+histogram = TimingHistogram()
+
+
+# ==== 采样剖析 ====
+
+class StackSampler(threading.Thread):
+    """
+    定期抓取目标线程的调用栈（py-spy 风格的采样剖析，纯 Python 实现）
+    结果是 folded stacks：{"frame1;frame2;...": 样本数}
+    """
+
+    def __init__(self, target_ident: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval_ms / 1000.0
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_folded(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _profile_path(endpoint: str, total_ms: float, suffix: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S-%f")
+    return PROFILE_DIR / f"{ts}-{endpoint}-{int(total_ms)}ms.{suffix}"
+
+
+def _start_profiler():
+    if PROFILE_MODE == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    return sampler
+
+
+def _finish_profiler(profiler, endpoint: str, total_ms: float):
+    if PROFILE_MODE == "cprofile":
+        profiler.disable()
+        if total_ms >= PROFILE_SLOW_MS:
+            profiler.dump_stats(_profile_path(endpoint, total_ms, "prof"))
+        return
+    profiler.stop()
+    if total_ms >= PROFILE_SLOW_MS and profiler.samples:
+        profiler.write_folded(_profile_path(endpoint, total_ms, "folded"))
+
+
+# ==== Flask 集成 ====
+
+def _before_request():
+    g._timing_start = time.perf_counter()
+    g._timing_spans = defaultdict(float)
+    g._profiler = _start_profiler() if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE else None
+
+
+def _after_request(response):
+    start = g.get("_timing_start")
+    if start is None:
+        return response
+
+    total_ms = (time.perf_counter() - start) * 1000.0
+    spans = g.get("_timing_spans") or {}
+    endpoint = request.endpoint or "unknown"
+
+    parts = [f"{name};dur={spans[name]:.2f}" for name in SPAN_NAMES if name in spans]
+    parts.append(f"app;dur={total_ms:.2f}")
+    response.headers["Server-Timing"] = ", ".join(parts)
+
+    histogram.observe(endpoint, "total", total_ms)
+    for name, value in spans.items():
+        histogram.observe(endpoint, name, value)
+
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        _finish_profiler(profiler, endpoint, total_ms)
+    return response
+
+
+def get_timings():
+    """各接口分段耗时直方图（当前进程）；?reset=1 读取后清零"""
+    data = histogram.snapshot()
+    if request.args.get("reset", "0").lower() in ("1", "true", "yes"):
+        histogram.reset()
+    return jsonify({"pid": os.getpid(), "timings": data})
+
+
+def init_profiling(app):
+    """PROFILING_ENABLED=1 时给应用挂上计时 / 剖析钩子和 /api/debug/timings"""
+    if not PROFILING_ENABLED:
+        return
+
+    _install_db_timing()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/api/debug/timings", "debug_timings", get_timings, methods=["GET"])
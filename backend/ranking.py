@@ -0,0 +1,123 @@
+# backend/ranking.py
+"""
+/api/llm/rank 的预计算排名索引
+
+汇总数据（get_llm_summary_cached 的结果）变化时重建一次：
+  - 每个数值指标（health_score / openrank_mean_12m / activity_mean_12m / ... 自动识别）
+    一份全局降序列表，外加每个 category 一份
+  - top-k / offset 分页直接切片，游标分页用二分定位，单个项目的名次 O(1) 查询
+同分时按 project_key 升序，保证分页结果稳定。
+"""
+import base64
+import bisect
+import threading
+
+from json_provider import dumps_bytes, loads
+
+
+def _sort_key(item, metric: str):
+    value = item.get(metric, 0.0)
+    return (-(value if isinstance(value, (int, float)) else 0.0), item.get("project_key", ""))
+
+
+def encode_cursor(sort_key) -> str:
+    """游标 = 上一页最后一个项目的排序键，重建索引后依然有效"""
+    return base64.urlsafe_b64encode(dumps_bytes(list(sort_key))).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        neg_value, project_key = loads(base64.urlsafe_b64decode(padded))
+        return (float(neg_value), str(project_key))
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+class RankingIndex:
+    def __init__(self, projects):
+        self.projects = projects
+        self.metrics = sorted({
+            key for item in projects for key, value in item.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        })
+        self.categories = sorted({item.get("category", "unknown") for item in projects})
+
+        # {metric: {category 或 None: [item, ...]}}，None 表示全部
+        self._ordered = {}
+        # {metric: {category 或 None: [排序键, ...]}}，与 _ordered 一一对应，用于二分
+        self._keys = {}
+        # {metric: {project_key: (全局名次, 类别内名次)}}，名次从 1 开始
+        self._positions = {}
+
+        for metric in self.metrics:
+            ordered = sorted(projects, key=lambda item: _sort_key(item, metric))
+            by_category = {None: ordered}
+            for item in ordered:
+                by_category.setdefault(item.get("category", "unknown"), []).append(item)
+
+            positions = {}
+            category_counts = {}
+            for rank, item in enumerate(ordered, start=1):
+                category = item.get("category", "unknown")
+                category_counts[category] = category_counts.get(category, 0) + 1
+                positions[item.get("project_key")] = (rank, category_counts[category])
+
+            self._ordered[metric] = by_category
+            self._keys[metric] = {
+                category: [_sort_key(item, metric) for item in items]
+                for category, items in by_category.items()
+            }
+            self._positions[metric] = positions
+
+    def page(self, metric: str, category: str | None = None, offset: int = 0,
+             limit: int = 10, cursor: str | None = None):
+        """
+        返回 (本页项目, 总数, 本页起始 offset, 下一页游标)
+        cursor 优先于 offset；每个项目附带 rank（在当前过滤条件下的名次）
+        """
+        items = self._ordered[metric].get(category, [])
+        if cursor:
+            offset = bisect.bisect_right(self._keys[metric].get(category, []), decode_cursor(cursor))
+
+        page = items[offset:offset + limit]
+        next_cursor = None
+        if page and offset + limit < len(items):
+            next_cursor = encode_cursor(_sort_key(page[-1], metric))
+
+        ranked = [{**item, "rank": offset + i} for i, item in enumerate(page, start=1)]
+        return ranked, len(items), offset, next_cursor
+
+    def position(self, metric: str, project_key: str):
+        """某个项目的名次；项目不存在时返回 None"""
+        found = self._positions[metric].get(project_key)
+        if found is None:
+            return None
+        rank, category_rank = found
+        item = self._ordered[metric][None][rank - 1]
+        category = item.get("category", "unknown")
+        return {
+            "project_key": project_key,
+            "category": category,
+            "value": item.get(metric, 0.0),
+            "rank": rank,
+            "total": len(self._ordered[metric][None]),
+            "category_rank": category_rank,
+            "category_total": len(self._ordered[metric][category]),
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_ranking_index(projects) -> RankingIndex:
+    """projects 对象变化（汇总重算）时重建索引，否则复用"""
+    global _index
+    index = _index
+    if index is not None and index.projects is projects:
+        return index
+    with _index_lock:
+        if _index is None or _index.projects is not projects:
+            _index = RankingIndex(projects)
+        return _index
@@ -7,8 +7,14 @@ from functools import wraps
 from flask import request, jsonify
 from datetime import datetime, timedelta
 from collections import defaultdict
+import os
 import threading
 
+from metrics import RATE_LIMIT_DENIED
+
+# RATE_LIMIT_ENABLED=0 时关闭限流（仅用于压测 / 本地调试）
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+
 
 class RateLimiter:
     """
@@ -62,6 +68,18 @@ class RateLimiter:
 _limiter = RateLimiter()
 
 
+def check_rate_limit(limit_key: str, max_requests: int, window_seconds: int) -> tuple[bool, int]:
+    """
+    直接使用全局限流器判断（供 ASGI 等非 Flask 视图路径复用同一份限流记录）
+    
+    Returns:
+        (是否允许, 剩余可用次数)
+    """
+    if not RATE_LIMIT_ENABLED:
+        return True, max_requests
+    return _limiter.is_allowed(limit_key, max_requests, window_seconds)
+
+
 def rate_limit(max_requests: int = 10, window_seconds: int = 60, key_func=None):
     """
     限流装饰器
@@ -80,6 +98,9 @@ def rate_limit(max_requests: int = 10, window_seconds: int = 60, key_func=None):
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+
             # 确定限流键
             if key_func:
                 limit_key = key_func()
@@ -93,6 +114,7 @@ def rate_limit(max_requests: int = 10, window_seconds: int = 60, key_func=None):
             allowed, remaining = _limiter.is_allowed(limit_key, max_requests, window_seconds)
             
             if not allowed:
+                RATE_LIMIT_DENIED.labels(endpoint=request.endpoint or "unknown").inc()
                 response = jsonify({
                     "detail": f"请求过于频繁，请 {window_seconds} 秒后重试",
                     "error_code": "RATE_LIMIT_EXCEEDED"
@@ -0,0 +1,320 @@
+# backend/search_index.py
+"""
+实体 / 仓库自动补全索引（GET /api/search）
+
+文档：每个 platform/org（kind=entity）和 platform/org/repo（kind=repo）一条，来源：
+  - metadata.registry（内置目录 + METADATA_FILE + 已登记的实体 / 仓库）
+  - config.json 的 repositories / category_tree（label 取项目树里的名字）
+  - metric_series 里出现过的所有 key；之后每 SEARCH_REFRESH_SECONDS 按自增 id 增量拉取新行
+
+两种索引：
+  - 前缀：metadata.PrefixIndex（排序的 key 列表 + 二分查找）。key 为 org、repo、"org/repo" 和 label（小写）；
+    新增的 key 先进 pending 缓冲区，攒够 SEARCH_PENDING_MAX 条再归并，避免每次插入都移动整个列表
+  - 模糊：name（"org" / "org/repo"）的三元组倒排表（array('I')）。前缀没有任何结果时，
+    取最稀有的几个三元组收集候选，再按查询三元组的覆盖率排序
+排序：完全匹配 > 名称前缀 > label 前缀 > 模糊匹配；同一档内来源权重高、名称短的在前。
+前缀很短、匹配项很多时最多扫描 SEARCH_SCAN_LIMIT 个 key（按字典序；1~2 个字符的前缀只扫
+SEARCH_SHORT_SCAN_LIMIT 个，反正只返回字典序最前的几个），保证延迟有上界。
+
+规模（benchmarks/bench_search.py，100 万名称，单核）：建索引约 38s，每个进程常驻内存约 650MB；
+查询 p99 短前缀约 3ms、长前缀 / 完全匹配 < 0.5ms、模糊约 2.5ms。preload 时 worker 与 master
+按写时复制共享，但查询时的引用计数写入会让被访问到的页逐渐复制，按每个 worker 一份估算内存。
+
+建索引（百万级名称要几十秒）不放在请求路径上：
+  - gunicorn preload（SEARCH_INDEX_PRELOAD=1，默认）：master 在 fork 之前建好，所有 worker 共享同一份
+  - 其他启动方式：第一次请求时在后台线程里建，建好之前 get_search_index() 返回 None（接口返回 503）
+"""
+import heapq
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+from metadata import PrefixIndex
+
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "60"))
+SEARCH_SCAN_LIMIT = int(os.getenv("SEARCH_SCAN_LIMIT", "500"))
+SEARCH_SHORT_SCAN_LIMIT = int(os.getenv("SEARCH_SHORT_SCAN_LIMIT", "100"))
+SEARCH_INDEX_PRELOAD = os.getenv("SEARCH_INDEX_PRELOAD", "1") != "0"
+SEARCH_PENDING_MAX = 4096
+# 模糊匹配：最多使用的三元组个数 / 参与精排的候选数 / 最低相似度 / 单个倒排表最多读取的条数
+FUZZY_GRAMS = 5
+FUZZY_CANDIDATES = 60
+FUZZY_MIN_SIMILARITY = 0.5
+FUZZY_MAX_POSTINGS = 2000
+
+# key 的字段类型（编码在 key → 文档的映射里：doc_id * 4 + field）
+FIELD_FULL, FIELD_NAME, FIELD_LABEL = 0, 1, 2
+_FIELD_SCORE = {FIELD_FULL: 2.0, FIELD_NAME: 2.0, FIELD_LABEL: 1.5}
+
+# 来源权重：人工维护的目录 > 数据库里发现的 key
+WEIGHT_CATALOGUE = 1.0
+WEIGHT_DISCOVERED = 0.5
+
+
+def _grams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = []                 # doc_id → (kind, platform, org, repo, label)
+        self._weights = array("f")      # doc_id → 来源权重
+        self._doc_ids = {}              # (kind, platform, org, repo) → doc_id
+        self._keys = PrefixIndex(SEARCH_PENDING_MAX)    # key → code（doc_id * 4 + field）
+        self._grams = {}                # 三元组 → array('I') doc_id
+        self.last_series_id = 0         # 已增量拉取到的 metric_series.id
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---- 写入 ----
+
+    def add(self, platform: str, org: str, repo: str | None = None, label: str = "",
+            weight: float = WEIGHT_DISCOVERED) -> bool:
+        """添加一个实体（repo 为空）或仓库；已存在时只更新权重 / 补上 label。返回是否新增"""
+        with self._lock:
+            if repo:
+                # 仓库所属的组织也是一个实体
+                self._add_locked(platform, org, "", "", weight)
+            return self._add_locked(platform, org, repo or "", label, weight)
+
+    def _add_locked(self, platform: str, org: str, repo: str, label: str, weight: float) -> bool:
+        kind = "repo" if repo else "entity"
+        doc_key = (kind, platform, org, repo)
+        doc_id = self._doc_ids.get(doc_key)
+        if doc_id is not None:
+            if weight > self._weights[doc_id]:
+                self._weights[doc_id] = weight
+            if label and not self._docs[doc_id][4]:
+                self._docs[doc_id] = (*self._docs[doc_id][:4], label)
+                self._add_key(label.lower(), doc_id, FIELD_LABEL)
+            return False
+
+        doc_id = len(self._docs)
+        self._docs.append((kind, platform, org, repo, label))
+        self._weights.append(weight)
+        self._doc_ids[doc_key] = doc_id
+
+        name = f"{org}/{repo}".lower() if repo else org.lower()
+        self._add_key(name, doc_id, FIELD_FULL)
+        if repo:
+            self._add_key(repo.lower(), doc_id, FIELD_NAME)
+        if label and label.lower() != name:
+            self._add_key(label.lower(), doc_id, FIELD_LABEL)
+        for gram in _grams(name):
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array("I")
+            postings.append(doc_id)
+        return True
+
+    def _add_key(self, key: str, doc_id: int, field: int):
+        self._keys.add_key(key, doc_id * 4 + field)
+
+    def compact(self):
+        """归并 pending"""
+        with self._lock:
+            self._keys.compact()
+
+    @contextmanager
+    def bulk(self):
+        """批量添加（建索引）期间不做增量归并，结束时一次排序；期间的查询结果不完整"""
+        with self._keys.bulk():
+            yield self
+
+    # ---- 查询 ----
+
+    def search(self, query: str, platform: str | None = None, kind: str | None = None,
+               limit: int = 10):
+        q = query.strip().lower()
+        if not q:
+            return []
+
+        def accept(doc_id):
+            _kind, _platform = self._docs[doc_id][:2]
+            return (kind is None or _kind == kind) and (platform is None or _platform == platform)
+
+        scores = {}
+        self._prefix(q, accept, scores)
+        if not scores and len(q) >= 3:
+            self._fuzzy(q, accept, scores)
+
+        top = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [self._to_item(doc_id, score, match) for doc_id, (score, match) in top]
+
+    def _prefix(self, q: str, accept, scores):
+        limit = SEARCH_SHORT_SCAN_LIMIT if len(q) <= 2 else SEARCH_SCAN_LIMIT
+        for key, code in self._keys.scan(q, limit):
+            doc_id, field = divmod(code, 4)
+            if not accept(doc_id):
+                continue
+            score = (3.0 if key == q else _FIELD_SCORE[field]) + self._weights[doc_id] \
+                + 0.5 / (1 + len(key) - len(q))
+            if score > scores.get(doc_id, (0.0,))[0]:
+                scores[doc_id] = (score, "exact" if key == q else "prefix")
+
+    def _fuzzy(self, q: str, accept, scores):
+        q_grams = _grams(q)
+        postings = sorted((self._grams[g] for g in q_grams if g in self._grams), key=len)
+        if not postings:
+            return
+
+        # 只用最稀有的几个三元组收集候选；过于常见的三元组（如 "ing"）倒排表很长，跳过
+        counts = Counter()
+        for i, plist in enumerate(postings[:FUZZY_GRAMS]):
+            if i and len(plist) > FUZZY_MAX_POSTINGS:
+                break
+            counts.update(plist[:FUZZY_MAX_POSTINGS])
+
+        for doc_id, _ in counts.most_common(FUZZY_CANDIDATES):
+            if doc_id in scores or not accept(doc_id):
+                continue
+            _kind, _platform, org, repo, _label = self._docs[doc_id]
+            name_grams = _grams(f"{org}/{repo}".lower() if repo else org.lower())
+            # 查询的三元组有多大比例出现在名称里（查询通常只是名称的一部分，不用 Jaccard）
+            similarity = len(q_grams & name_grams) / len(q_grams)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                score = similarity + self._weights[doc_id] * 0.1 - 0.001 * len(name_grams)
+                scores[doc_id] = (score, "fuzzy")
+
+    def _to_item(self, doc_id: int, score: float, match: str):
+        kind, platform, org, repo, label = self._docs[doc_id]
+        value = f"{org}/{repo}" if repo else org
+        return {
+            "kind": kind,
+            "platform": platform,
+            "entity": org,
+            "repo": repo or None,
+            "value": value,
+            "label": label or value,
+            "match": match,
+            "score": round(score, 3),
+        }
+
+
+# ==== 数据来源 ====
+
+def _tree_labels(nodes, labels):
+    """category_tree 叶子节点：value（org/repo）→ label"""
+    for node in nodes:
+        if node.get("children"):
+            _tree_labels(node["children"], labels)
+        elif node.get("value"):
+            labels[node["value"]] = node.get("label", "")
+    return labels
+
+
+def seed_index(index: SearchIndex):
+    """metadata + config.json + metric_series（需要应用上下文）"""
+    with index.bulk():
+        _seed(index)
+
+
+def _seed(index: SearchIndex):
+    import metadata as meta
+    from config_registry import get_config
+
+    for p in meta.get_platforms():
+        platform = p["value"]
+        for e in meta.get_entities(platform):
+            index.add(platform, e["value"], None, e.get("label", ""), WEIGHT_CATALOGUE)
+            for r in meta.get_repos(platform, e["value"]):
+                index.add(platform, e["value"], r["value"], r.get("label", ""), WEIGHT_CATALOGUE)
+
+    try:
+        config = get_config()
+    except (OSError, ValueError, KeyError):
+        config = None
+    if config is not None:
+        labels = _tree_labels(config.raw.get("category_tree", []), {})
+        for platform, org, repo in config.repo_map:
+            index.add(platform, org, repo, labels.get(f"{org}/{repo}", ""), WEIGHT_CATALOGUE)
+
+    poll_series(index)
+
+
+def poll_series(index: SearchIndex) -> int:
+    """增量拉取 id 大于 last_series_id 的 metric_series key，返回新增文档数"""
+    from extensions import db
+    from models import MetricSeries
+
+    try:
+        rows = (
+            db.session.query(MetricSeries.id, MetricSeries.platform, MetricSeries.entity, MetricSeries.repo)
+            .filter(MetricSeries.id > index.last_series_id)
+            .order_by(MetricSeries.id)
+            .all()
+        )
+    except Exception:
+        db.session.rollback()
+        raise
+    added = 0
+    for series_id, platform, entity, repo in rows:
+        added += index.add(platform, entity, repo or None)
+        index.last_series_id = series_id
+    return added
+
+
+_index = None
+_next_refresh = 0.0
+_index_lock = threading.Lock()
+_building = False
+
+
+def build_search_index(app):
+    """全量建索引（阻塞）；gunicorn preload 时在 master 里调用，fork 出来的 worker 共享"""
+    global _index, _next_refresh
+    index = SearchIndex()
+    with app.app_context():
+        seed_index(index)
+    _index = index
+    _next_refresh = time.monotonic() + SEARCH_REFRESH_SECONDS
+    return index
+
+
+def _build_in_background(app):
+    global _building
+    try:
+        build_search_index(app)
+    except Exception as e:
+        print(f"⚠️  搜索索引构建失败，下次请求时重试: {e}")
+    finally:
+        _building = False
+
+
+def get_search_index():
+    """
+    返回索引；还没建好时在后台线程里开始构建并返回 None（不阻塞请求）。
+    之后每 SEARCH_REFRESH_SECONDS 增量拉取新的序列 key（需要应用上下文），
+    其他请求正在拉取时直接返回当前索引
+    """
+    global _next_refresh, _building
+    if _index is not None and time.monotonic() < _next_refresh:
+        return _index
+    if not _index_lock.acquire(blocking=False):
+        return _index
+
+    try:
+        if _index is None:
+            if not _building:
+                from flask import current_app
+
+                _building = True
+                threading.Thread(
+                    target=_build_in_background, args=(current_app._get_current_object(),),
+                    name="search-index-build", daemon=True,
+                ).start()
+            return None
+        if time.monotonic() >= _next_refresh:
+            try:
+                poll_series(_index)
+            except Exception as e:
+                print(f"⚠️  搜索索引增量更新失败: {e}")
+            _next_refresh = time.monotonic() + SEARCH_REFRESH_SECONDS
+        return _index
+    finally:
+        _index_lock.release()
@@ -0,0 +1,140 @@
+# backend/series.py
+"""
+紧凑的内存序列表示
+
+解码后的 [{"month": "2024-01", "count": 12.3}, ...] 每个点都是一个 dict + 两个对象，
+每点几百字节；Series 只保存：
+  - start：起始月序号（series_format.month_index，int）
+  - values：连续月份的 float64 缓冲区（array('d') 或指向它 / mmap 快照的 memoryview），缺失月份为 NaN
+每点 8 字节。tail / range 返回共享同一缓冲区的 memoryview 切片，不复制数据。
+
+与现有代码的适配：
+  - Series.from_records / to_records 与记录列表互转
+  - Series.from_compact / to_compact 与 series_format 的紧凑格式互转
+  - tail_values(n) 与 metric_utils.tail_n_values 结果一致（tail_n_values 也直接接受 Series）
+注意：Series 不区分"缺失月份"和 count 为 null 的记录，两者都是 NaN。
+"""
+import math
+from array import array
+
+from series_format import month_index, month_from_index
+
+NAN = math.nan
+
+
+def _as_float(value) -> float:
+    if value is None or isinstance(value, bool):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class Series:
+    __slots__ = ("start", "values")
+
+    def __init__(self, start: int | None, values=None):
+        self.start = start
+        # 只读约定：不要原地修改 / 扩展 values，切片与快照共享同一块内存
+        self.values = values if values is not None else array("d")
+
+    # ---- 构造 ----
+
+    @classmethod
+    def from_records(cls, records, month_key: str = "month", value_key: str = "count") -> "Series":
+        """[{month, count}] → Series；乱序输入按月份排序，重复月份保留最后一个"""
+        points = {}
+        for item in records or ():
+            if not isinstance(item, dict):
+                continue
+            index = month_index(item.get(month_key))
+            if index is not None:
+                points[index] = _as_float(item.get(value_key))
+
+        if not points:
+            return cls(None)
+
+        first, last = min(points), max(points)
+        return cls(first, array("d", (points.get(i, NAN) for i in range(first, last + 1))))
+
+    @classmethod
+    def from_compact(cls, compact) -> "Series":
+        """series_format.to_compact 的结果 → Series"""
+        start = compact.get("start")
+        if not start:
+            return cls(None)
+        return cls(month_index(start), array("d", (_as_float(v) for v in compact.get("values", ()))))
+
+    # ---- 基本属性 ----
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __bool__(self) -> bool:
+        return len(self.values) > 0
+
+    def __repr__(self) -> str:
+        if self.start is None:
+            return "Series(empty)"
+        return f"Series({month_from_index(self.start)}..{month_from_index(self.end)}, {len(self)} months)"
+
+    @property
+    def end(self) -> int | None:
+        """最后一个月的月序号"""
+        if self.start is None or not len(self.values):
+            return None
+        return self.start + len(self.values) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.values) * 8
+
+    def points(self):
+        """逐个产出 (月序号, 值)，跳过缺失月份"""
+        if self.start is None:
+            return
+        for offset, value in enumerate(self.values):
+            if not math.isnan(value):
+                yield self.start + offset, value
+
+    # ---- 零拷贝切片 ----
+
+    def _view(self, lo: int, hi: int) -> "Series":
+        if lo >= hi:
+            return Series(None)
+        return Series(self.start + lo, memoryview(self.values)[lo:hi])
+
+    def tail(self, months: int) -> "Series":
+        """最近 months 个自然月（含缺失月份）"""
+        n = len(self.values)
+        return self._view(max(n - months, 0), n)
+
+    def range(self, from_month: str | None = None, to_month: str | None = None) -> "Series":
+        """按 'YYYY-MM' 闭区间裁剪；参数为 None 表示不限"""
+        if self.start is None:
+            return self
+        n = len(self.values)
+        lo = 0 if from_month is None else max(month_index(from_month) - self.start, 0)
+        hi = n if to_month is None else min(month_index(to_month) - self.start + 1, n)
+        return self._view(lo, hi)
+
+    def tail_values(self, n: int = 12) -> list[float]:
+        """
+        最近 n 个自然月里有值的点：先取最后 n 个月，再跳过 NaN。
+        与 metric_utils.tail_n_values 对记录列表的结果一致（记录按月连续时；缺失月份见模块说明）
+        """
+        return [value for value in self.tail(n).values if not math.isnan(value)]
+
+    # ---- 转回旧格式 ----
+
+    def to_records(self, month_key: str = "month", value_key: str = "count"):
+        return [{month_key: month_from_index(i), value_key: v} for i, v in self.points()]
+
+    def to_compact(self):
+        if self.start is None or not len(self.values):
+            return {"start": None, "values": []}
+        return {
+            "start": month_from_index(self.start),
+            "values": [None if math.isnan(v) else v for v in self.values],
+        }
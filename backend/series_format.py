@@ -0,0 +1,80 @@
+# backend/series_format.py
+"""
+月度序列的紧凑编码（/api/data/...?format=compact|msgpack）
+
+默认格式每个点都重复 "month" / "count" 键：
+    [{"month": "2019-01", "count": 12.3}, {"month": "2019-02", "count": 15.0}, ...]
+紧凑格式只保留起始月份和连续的值数组，缺失月份为 null：
+    {"start": "2019-01", "values": [12.3, 15.0, ...]}
+format=msgpack 时把同样的结构用 MessagePack 编码（需安装 msgpack）。
+
+缓存命中时编码好的紧凑响应体放在 encoded_series_cache（按总字节数限制的 LRU），
+前端默认请求 format=compact，同一份数据只解码 + 编码一次。
+"""
+import os
+
+from lru_cache import LRUCache, body_sizeof
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+SERIES_FORMATS = ("json", "compact", "msgpack")
+MSGPACK_MIMETYPE = "application/x-msgpack"
+ENCODED_SERIES_CACHE_MAX_BYTES = int(os.getenv("ENCODED_SERIES_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def month_index(month: str) -> int | None:
+    """'YYYY-MM' → 从公元 0 年起的月序号；格式不对返回 None"""
+    try:
+        year, mon = int(month[:4]), int(month[5:7])
+    except (TypeError, ValueError):
+        return None
+    if len(month) != 7 or month[4] != "-" or not 1 <= mon <= 12:
+        return None
+    return year * 12 + mon - 1
+
+
+def month_from_index(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def to_compact(records, month_key: str = "month", value_key: str = "count"):
+    """[{month, count}] → {"start", "values"}；乱序输入会按月份排序，重复月份保留最后一个"""
+    points = {}
+    for item in records:
+        if not isinstance(item, dict):
+            continue
+        index = month_index(item.get(month_key))
+        if index is not None:
+            points[index] = item.get(value_key)
+
+    if not points:
+        return {"start": None, "values": []}
+
+    first, last = min(points), max(points)
+    return {
+        "start": month_from_index(first),
+        "values": [points.get(i) for i in range(first, last + 1)],
+    }
+
+
+def from_compact(start: str | None, values, month_key: str = "month", value_key: str = "count"):
+    """to_compact 的逆变换（跳过 null，即缺失月份）"""
+    first = month_index(start) if start else None
+    if first is None:
+        return []
+    return [
+        {month_key: month_from_index(first + offset), value_key: value}
+        for offset, value in enumerate(values)
+        if value is not None
+    ]
+
+
+def pack_msgpack(payload) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+# (缓存标识, 格式) → (响应体, mimetype)；缓存标识里带着 updated_at / 快照文件标识，数据更新后自然失效
+encoded_series_cache = LRUCache(ENCODED_SERIES_CACHE_MAX_BYTES, body_sizeof)
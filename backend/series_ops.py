@@ -0,0 +1,205 @@
+# backend/series_ops.py
+"""
+序列查询：时间范围裁剪、按季 / 年聚合、LTTB 降采样
+
+/api/data/...?from=2022-01&to=2024-12&granularity=quarter&agg=mean&max_points=200
+
+所有操作都在紧凑表示 {"start": "YYYY-MM", "values": [...]}（见 series_format）上进行：
+每条缓存序列只解码一次（按行 id + updated_at 缓存解码结果），
+每种参数组合的编码结果另外缓存，重复请求直接返回字节。
+"""
+import os
+from collections import namedtuple
+
+from lru_cache import LRUCache, body_sizeof
+from series_format import month_index, month_from_index
+
+GRANULARITY_STEPS = {"month": 1, "quarter": 3, "year": 12}
+AGGREGATIONS = ("mean", "sum", "last")
+MAX_POINTS_LIMIT = 10_000
+# 查询结果缓存的字节上限；解码后的紧凑序列另外最多占一半
+SERIES_QUERY_CACHE_MAX_BYTES = int(os.getenv("SERIES_QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+SeriesQuery = namedtuple("SeriesQuery", ["from_month", "to_month", "granularity", "agg", "max_points"])
+
+QUERY_PARAMS = ("from", "to", "granularity", "agg", "max_points")
+
+
+def parse_series_query(args):
+    """
+    从请求参数解析 SeriesQuery；没有任何查询参数时返回 None（走原始全量路径）
+    参数不合法时抛 ValueError
+    """
+    if not any(name in args for name in QUERY_PARAMS):
+        return None
+
+    from_month = args.get("from") or None
+    to_month = args.get("to") or None
+    for name, value in (("from", from_month), ("to", to_month)):
+        if value is not None and month_index(value) is None:
+            raise ValueError(f"{name} 格式应为 YYYY-MM：{value}")
+    if from_month and to_month and from_month > to_month:
+        raise ValueError("from 不能晚于 to")
+
+    granularity = args.get("granularity", "month").lower()
+    if granularity not in GRANULARITY_STEPS:
+        raise ValueError(f"不支持的 granularity：{granularity}，仅支持 {' / '.join(GRANULARITY_STEPS)}")
+
+    agg = args.get("agg", "mean").lower()
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"不支持的 agg：{agg}，仅支持 {' / '.join(AGGREGATIONS)}")
+
+    max_points = args.get("max_points")
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            raise ValueError(f"max_points 应为整数：{max_points}")
+        if not 3 <= max_points <= MAX_POINTS_LIMIT:
+            raise ValueError(f"max_points 取值范围为 3 ~ {MAX_POINTS_LIMIT}")
+
+    return SeriesQuery(from_month, to_month, granularity, agg, max_points)
+
+
+# ==== 基本操作 ====
+
+def slice_range(first: int, values, from_idx: int | None, to_idx: int | None):
+    """按月序号闭区间裁剪，返回 (新的起始序号, values)"""
+    lo = 0 if from_idx is None else max(from_idx - first, 0)
+    hi = len(values) if to_idx is None else min(to_idx - first + 1, len(values))
+    if lo >= hi:
+        return first + lo, []
+    return first + lo, values[lo:hi]
+
+
+def _aggregate(bucket, agg: str):
+    nums = [v for v in bucket if isinstance(v, (int, float))]
+    if not nums:
+        return None
+    if agg == "sum":
+        return round(sum(nums), 4)
+    if agg == "last":
+        return nums[-1]
+    return round(sum(nums) / len(nums), 4)
+
+
+def resample(first: int, values, step: int, agg: str = "mean"):
+    """
+    按 step 个月为一个周期聚合（季度 / 年按自然周期对齐）
+    返回 (第一个周期的起始月序号, 每个周期的值)；周期内全部缺失时为 None
+    """
+    if step == 1 or not values:
+        return first, list(values)
+
+    period_first = first - first % step
+    buckets = {}
+    for offset, value in enumerate(values):
+        idx = first + offset
+        buckets.setdefault(idx - idx % step, []).append(value)
+
+    last_period = max(buckets)
+    return period_first, [
+        _aggregate(buckets.get(p, ()), agg)
+        for p in range(period_first, last_period + 1, step)
+    ]
+
+
+def lttb(points, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets 降采样：保留首尾点，
+    其余每个桶选与前一个选中点、下一个桶均值构成三角形面积最大的点
+    points: [(x, y), ...]，x 递增
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个桶的均值点
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        # 当前桶里选面积最大的点
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def apply_query(compact, query: SeriesQuery):
+    """
+    对紧凑序列执行查询，返回：
+      - 未降采样：{"start", "step", "values"}（连续周期，缺失为 None）
+      - LTTB 降采样后：{"months", "values"}（点不再等间隔）
+    """
+    step = GRANULARITY_STEPS[query.granularity]
+    if compact.get("start") is None:
+        return {"start": None, "step": step, "values": []}
+
+    first, values = slice_range(
+        month_index(compact["start"]),
+        compact["values"],
+        month_index(query.from_month) if query.from_month else None,
+        month_index(query.to_month) if query.to_month else None,
+    )
+    first, values = resample(first, values, step, query.agg)
+
+    if not values:
+        return {"start": None, "step": step, "values": []}
+
+    if query.max_points is not None:
+        points = [
+            (first + i * step, v) for i, v in enumerate(values)
+            if isinstance(v, (int, float))
+        ]
+        if len(points) > query.max_points:
+            sampled = lttb(points, query.max_points)
+            return {
+                "months": [month_from_index(x) for x, _ in sampled],
+                "values": [y for _, y in sampled],
+            }
+
+    return {"start": month_from_index(first), "step": step, "values": values}
+
+
+def to_records(result, month_key: str = "month", value_key: str = "count"):
+    """apply_query 的结果 → [{month, count}]（跳过缺失周期）"""
+    if "months" in result:
+        pairs = zip(result["months"], result["values"])
+    elif result.get("start"):
+        first, step = month_index(result["start"]), result["step"]
+        pairs = ((month_from_index(first + i * step), v) for i, v in enumerate(result["values"]))
+    else:
+        pairs = ()
+    return [{month_key: m, value_key: v} for m, v in pairs if v is not None]
+
+
+# ==== 缓存 ====
+
+def compact_sizeof(compact) -> int:
+    """紧凑序列的内存估算：dict + 列表每个槽位 8 字节 + 每个 float 对象 24 字节"""
+    return 256 + len(compact.get("values") or ()) * 32
+
+
+# (行 id, updated_at) → 紧凑序列；updated_at 变化即自然失效
+decoded_series_cache = LRUCache(max(SERIES_QUERY_CACHE_MAX_BYTES // 2, 1), compact_sizeof)
+# (行 id, updated_at, SeriesQuery, 输出格式) → (响应体, mimetype)
+query_result_cache = LRUCache(SERIES_QUERY_CACHE_MAX_BYTES, body_sizeof)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# backend/serve.py
+"""
+生产环境启动入口（替代 python main.py 的开发服务器）
+
+使用方法：
+    python serve.py            # Linux/macOS：gunicorn（配置见 gunicorn.conf.py）
+    python serve.py --asgi     # gunicorn + uvicorn worker，运行 asgi.py 的异步模式
+    python serve.py --waitress # Windows 或无 gunicorn 时：waitress 单进程多线程
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+
+
+def serve_gunicorn(asgi: bool = False):
+    from gunicorn.app.wsgiapp import run
+
+    if asgi:
+        os.environ.setdefault("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+    target = "asgi:application" if asgi else "main:app"
+    sys.argv = ["gunicorn", "-c", str(BACKEND_ROOT / "gunicorn.conf.py"), target]
+    run()
+
+
+def serve_waitress():
+    from waitress import serve
+    from main import app, init_db, start_sync_leader_election
+
+    init_db(app)
+    start_sync_leader_election(app)
+
+    threads = int(os.getenv("WAITRESS_THREADS", (os.cpu_count() or 1) * 4))
+    serve(
+        app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        threads=threads,
+    )
+
+
+def main():
+    os.chdir(BACKEND_ROOT)
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+    if "--waitress" in sys.argv or os.name == "nt":
+        serve_waitress()
+    else:
+        serve_gunicorn(asgi="--asgi" in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
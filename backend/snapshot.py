@@ -0,0 +1,235 @@
+# backend/snapshot.py
+"""
+只读内存映射快照（data/series.snap）
+
+同步结束时把 metric_series 全量导出成一个不可变的二进制文件，各 worker 用 mmap 只读映射：
+多个进程共享同一份页缓存，命中快照的请求不经过 SQLAlchemy。
+刷新时写临时文件再 os.replace 原子替换；读取方按 inode / mtime 发现新文件后重新映射，
+旧映射上仍在使用的 memoryview 不受影响（引用释放后由 GC 回收）。
+
+文件布局（小端）：
+  header   <8sIIdQQQQQQ   magic, 格式版本, 序列条数, 生成时间,
+                          索引偏移, 字符串区偏移, 字符串区长度, 数据区偏移, 汇总偏移, 汇总长度
+  index    每条 40 字节 <QiIdQII，按 key_hash 升序（二分查找）：
+             key_hash, 起始月序号, 月份数, updated_at(epoch 秒), 值数组偏移, 字符串区偏移, JSON 长度
+  strings  每条：u16 key 长度 + key（platform/entity/repo/metric，用于核对哈希碰撞）+ data_json 原文
+  data     float64 数组，连续月份，缺失月份为 NaN（8 字节对齐）
+  summary  汇总引擎的持久化快照（summary_engine.export_payload）
+"""
+import calendar
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from paths import DATA_DIR
+from series import Series
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") != "0"
+SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH", DATA_DIR / "series.snap"))
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("SNAPSHOT_CHECK_SECONDS", "5"))
+
+MAGIC = b"ORSNAP01"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIdQQQQQQ")
+# key_hash, start_month, count, updated_at, values_offset, strings_offset, json_len
+_ENTRY = struct.Struct("<QiIdQII")
+_KEY_LEN = struct.Struct("<H")
+
+
+def series_key(platform: str, entity: str, repo: str | None, metric: str) -> str:
+    return f"{platform}/{entity}/{repo or ''}/{metric}"
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def to_epoch(dt) -> float:
+    """naive UTC datetime（数据库里的 updated_at）→ epoch 秒"""
+    if dt is None:
+        return 0.0
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+# ==== 写入 ====
+
+def write_snapshot(rows, summary_payload: bytes = b"", path: Path = SNAPSHOT_PATH) -> int:
+    """
+    rows: 可迭代的 MetricSeries（或有同名属性的对象）
+    返回写入的序列条数
+    """
+    entries = []
+    strings = bytearray()
+    values = array("d")
+
+    for row in rows:
+        key = series_key(row.platform, row.entity, row.repo, row.metric)
+        try:
+            series = Series.from_records(row.to_records())
+        except Exception:
+            continue
+
+        values_offset = len(values) * 8
+        values.extend(series.values)
+
+        key_bytes = key.encode("utf-8")
+        json_bytes = (row.data_json or "[]").encode("utf-8")
+        strings_offset = len(strings)
+        strings += _KEY_LEN.pack(len(key_bytes)) + key_bytes + json_bytes
+
+        entries.append((key_hash(key), series.start or 0, len(series), to_epoch(row.updated_at),
+                        values_offset, strings_offset, len(json_bytes)))
+
+    entries.sort(key=lambda e: e[0])
+
+    index_offset = _HEADER.size
+    strings_offset = index_offset + _ENTRY.size * len(entries)
+    data_offset = strings_offset + len(strings)
+    data_offset += -data_offset % 8
+    summary_offset = data_offset + len(values) * 8
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), time.time(),
+                          index_offset, strings_offset, len(strings),
+                          data_offset, summary_offset, len(summary_payload))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for entry in entries:
+            f.write(_ENTRY.pack(*entry))
+        f.write(strings)
+        f.write(b"\0" * (data_offset - strings_offset - len(strings)))
+        f.write(values.tobytes())
+        f.write(summary_payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(entries)
+
+
+# ==== 读取 ====
+
+class SnapshotEntry:
+    __slots__ = ("start_month", "values", "updated_at", "json_bytes")
+
+    def __init__(self, start_month: int, values, updated_at: float, json_bytes):
+        self.start_month = start_month
+        self.values = values            # memoryview（float64），直接指向映射内存
+        self.updated_at = updated_at
+        self.json_bytes = json_bytes    # memoryview，data_json 原文
+
+    def series(self) -> Series:
+        """零拷贝：Series 的 values 直接是映射内存上的 memoryview"""
+        if not len(self.values):
+            return Series(None)
+        return Series(self.start_month, self.values)
+
+    def to_compact(self):
+        return self.series().to_compact()
+
+
+class SeriesSnapshot:
+    """一个已映射的快照文件"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+
+        (magic, version, self.count, self.generated_at, self._index_offset, self._strings_offset,
+         _strings_size, self._data_offset, self._summary_offset, self._summary_size) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"快照格式不匹配: {self.path}")
+
+    def _entry_at(self, i: int):
+        return _ENTRY.unpack_from(self._mm, self._index_offset + i * _ENTRY.size)
+
+    def lookup(self, platform: str, entity: str, repo: str | None, metric: str):
+        key = series_key(platform, entity, repo, metric)
+        target = key_hash(key)
+        key_bytes = key.encode("utf-8")
+
+        # 按 key_hash 二分，再核对 key 原文（处理哈希碰撞）
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry_at(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        while lo < self.count:
+            h, start, count, updated_at, values_offset, strings_offset, json_len = self._entry_at(lo)
+            if h != target:
+                return None
+            pos = self._strings_offset + strings_offset
+            (key_len,) = _KEY_LEN.unpack_from(self._mm, pos)
+            pos += _KEY_LEN.size
+            if self._buf[pos:pos + key_len] == key_bytes:
+                values_start = self._data_offset + values_offset
+                return SnapshotEntry(
+                    start,
+                    self._buf[values_start:values_start + count * 8].cast("d"),
+                    updated_at,
+                    self._buf[pos + key_len:pos + key_len + json_len],
+                )
+            lo += 1
+        return None
+
+    def summary_payload(self) -> bytes:
+        return bytes(self._buf[self._summary_offset:self._summary_offset + self._summary_size])
+
+
+_current = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def current_snapshot() -> SeriesSnapshot | None:
+    """当前快照；每 SNAPSHOT_CHECK_SECONDS 检查一次文件是否被替换"""
+    global _current, _next_check
+    if not SNAPSHOT_ENABLED:
+        return None
+    now = time.monotonic()
+    if now < _next_check:
+        return _current
+
+    with _lock:
+        if now < _next_check:
+            return _current
+        _next_check = now + SNAPSHOT_CHECK_SECONDS
+        try:
+            stat = os.stat(SNAPSHOT_PATH)
+        except OSError:
+            _current = None
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if _current is None or _current.identity != identity:
+            try:
+                _current = SeriesSnapshot(SNAPSHOT_PATH)
+            except (OSError, ValueError, struct.error):
+                _current = None
+        return _current
+
+
+def export_snapshot(path: Path = SNAPSHOT_PATH) -> int:
+    """同步结束时调用（需要应用上下文）：导出全部序列 + 汇总"""
+    global _next_check
+    from models import MetricSeries
+    import summary_engine
+
+    rows = MetricSeries.query.yield_per(500)
+    count = write_snapshot(rows, summary_engine.engine.export_payload(), path)
+    # 本进程立即切换到新文件
+    _next_check = 0.0
+    return count
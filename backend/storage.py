@@ -0,0 +1,282 @@
+# backend/storage.py
+"""
+openrank.db 存储生命周期：淘汰、批量删除、VACUUM、空间报告
+
+openrank.db 只增不减：任何人查一个 config 之外的仓库都会新增 MetricSeries 行，
+auto_cleanup_repos / check_repos 删除数据后留下的空闲页也不会还给文件系统。这里负责：
+  1. 淘汰（只动 config.json 之外的序列）：
+     - 按时间：超过 ACCESS_EVICT_DAYS 天没有访问（access_tracker.eviction_candidates）
+     - 按容量：有效数据超过 STORAGE_MAX_MB 时，按最近访问时间（没有访问记录的按 updated_at）
+       从旧到新淘汰，直到降到预算的 STORAGE_TARGET_RATIO
+     同时删除过期的 missing_series 和长期无访问、对应序列已不存在的 series_access 记录
+  2. 批量删除：每批 STORAGE_DELETE_BATCH 行一个事务，批间短暂停顿，不长时间占住 SQLite 写锁
+  3. 回收空间：数据库是 auto_vacuum=INCREMENTAL 时用 PRAGMA incremental_vacuum 归还空闲页；
+     否则空闲页比例超过 STORAGE_VACUUM_RATIO 时做一次完整 VACUUM，并顺带切换成 INCREMENTAL
+     （auto_vacuum 模式只能在 VACUUM 时切换），之后都走增量回收
+  4. 报告：文件大小、页数、空闲页比例、auto_vacuum 模式、各表行数、config 内外的序列数和数据量
+
+后台同步线程每 STORAGE_MAINTENANCE_HOURS 小时运行一次（STORAGE_MAINTENANCE_HOURS=0 关闭）。
+手动运行：
+    python storage.py --report          # 只输出报告（JSON）
+    python storage.py                   # 淘汰 + 回收空间，输出前后报告
+    python storage.py --vacuum          # 另外强制做一次完整 VACUUM
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from extensions import db
+from models import MetricSeries, SeriesAccess
+from metrics import _gauge
+
+STORAGE_MAX_MB = float(os.getenv("STORAGE_MAX_MB", "512"))
+STORAGE_TARGET_RATIO = 0.9
+STORAGE_DELETE_BATCH = int(os.getenv("STORAGE_DELETE_BATCH", "500"))
+STORAGE_BATCH_PAUSE = 0.05
+STORAGE_VACUUM_RATIO = float(os.getenv("STORAGE_VACUUM_RATIO", "0.25"))
+STORAGE_MAINTENANCE_HOURS = float(os.getenv("STORAGE_MAINTENANCE_HOURS", "24"))
+# 估算单行开销：data_json 之外的列 + 索引项
+ROW_OVERHEAD_BYTES = 256
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+DB_SIZE_BYTES = _gauge(
+    "openrank_db_size_bytes", "openrank.db 文件大小（字节）"
+)
+DB_FREE_RATIO = _gauge(
+    "openrank_db_free_page_ratio", "openrank.db 空闲页比例（0~1）"
+)
+
+
+def _pragma(name: str):
+    return db.session.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def _autocommit(sql: str):
+    """
+    VACUUM / incremental_vacuum 不能在事务里执行；用 sqlite3 的 executescript（sqlite3_exec）执行，
+    cursor.execute 对 incremental_vacuum 只 step 一次，每次只释放一页
+    """
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.connection.driver_connection.executescript(f"{sql};")
+
+
+def _configured_keys():
+    from config_registry import get_config
+
+    return set(get_config().repo_map)
+
+
+# ==== 报告 ====
+
+def storage_report() -> dict:
+    """数据库空间 / 行数 / 碎片报告（需要应用上下文）"""
+    page_size = _pragma("page_size")
+    page_count = _pragma("page_count")
+    freelist = _pragma("freelist_count")
+    db_path = db.engine.url.database
+
+    def file_size(path):
+        try:
+            return os.path.getsize(path)
+        except (OSError, TypeError):
+            return 0
+
+    tables = {}
+    for table in ("metric_series", "missing_series", "series_access", "favorites", "users"):
+        try:
+            tables[table] = db.session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        except Exception:
+            db.session.rollback()
+            tables[table] = None
+
+    try:
+        configured = _configured_keys()
+    except (OSError, ValueError, KeyError):
+        configured = set()
+    series = {"configured": {"rows": 0, "bytes": 0}, "other": {"rows": 0, "bytes": 0}}
+    for platform, entity, repo, rows, size in (
+        db.session.query(
+            MetricSeries.platform, MetricSeries.entity, MetricSeries.repo,
+            db.func.count(MetricSeries.id), db.func.sum(db.func.length(MetricSeries.data_json)),
+        )
+        .group_by(MetricSeries.platform, MetricSeries.entity, MetricSeries.repo)
+    ):
+        bucket = series["configured" if (platform, entity, repo) in configured else "other"]
+        bucket["rows"] += rows
+        bucket["bytes"] += size or 0
+
+    report = {
+        "path": db_path,
+        "file_bytes": file_size(db_path),
+        "wal_bytes": file_size(f"{db_path}-wal") if db_path else 0,
+        "page_size": page_size,
+        "page_count": page_count,
+        "free_pages": freelist,
+        "free_ratio": round(freelist / page_count, 4) if page_count else 0.0,
+        "live_bytes": (page_count - freelist) * page_size,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(_pragma("auto_vacuum"), "unknown"),
+        "budget_bytes": int(STORAGE_MAX_MB * 1024 * 1024),
+        "tables": tables,
+        "series": series,
+    }
+    DB_SIZE_BYTES.set(report["file_bytes"])
+    DB_FREE_RATIO.set(report["free_ratio"])
+    return report
+
+
+# ==== 淘汰 ====
+
+def delete_series(ids) -> int:
+    """按 id 分批删除 MetricSeries，每批一个事务；返回删除行数"""
+    ids = list(ids)
+    deleted = 0
+    for start in range(0, len(ids), STORAGE_DELETE_BATCH):
+        batch = ids[start:start + STORAGE_DELETE_BATCH]
+        deleted += MetricSeries.query.filter(MetricSeries.id.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        if start + STORAGE_DELETE_BATCH < len(ids):
+            time.sleep(STORAGE_BATCH_PAUSE)
+    return deleted
+
+
+def lru_candidates(excess_bytes: int):
+    """
+    config 之外的序列按最近访问时间从旧到新排，取到估算大小覆盖 excess_bytes 为止，返回 id 列表
+    """
+    configured = _configured_keys()
+    last_used = db.func.coalesce(SeriesAccess.last_access_at, MetricSeries.updated_at)
+    rows = (
+        db.session.query(
+            MetricSeries.id, MetricSeries.platform, MetricSeries.entity, MetricSeries.repo,
+            db.func.length(MetricSeries.data_json),
+        )
+        .outerjoin(
+            SeriesAccess,
+            db.and_(
+                SeriesAccess.platform == MetricSeries.platform,
+                SeriesAccess.entity == MetricSeries.entity,
+                SeriesAccess.repo == MetricSeries.repo,
+                SeriesAccess.metric == MetricSeries.metric,
+            ),
+        )
+        .order_by(last_used, MetricSeries.id)
+        .yield_per(1000)
+    )
+    ids, freed = [], 0
+    for row_id, platform, entity, repo, size in rows:
+        if freed >= excess_bytes:
+            break
+        if (platform, entity, repo) in configured:
+            continue
+        ids.append(row_id)
+        freed += (size or 0) + ROW_OVERHEAD_BYTES
+    return ids
+
+
+def purge_metadata_tables(days: float) -> dict:
+    """过期的负缓存记录；超过 days 天无访问且对应序列已不存在的访问记录"""
+    from negative_cache import negative_cache
+
+    missing = negative_cache.purge_expired()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    orphan = ~db.session.query(MetricSeries.id).filter(
+        MetricSeries.platform == SeriesAccess.platform,
+        MetricSeries.entity == SeriesAccess.entity,
+        MetricSeries.repo == SeriesAccess.repo,
+        MetricSeries.metric == SeriesAccess.metric,
+    ).exists()
+    ids = [row_id for (row_id,) in db.session.query(SeriesAccess.id).filter(SeriesAccess.last_access_at < cutoff, orphan)]
+    access = 0
+    for start in range(0, len(ids), STORAGE_DELETE_BATCH):
+        access += SeriesAccess.query.filter(
+            SeriesAccess.id.in_(ids[start:start + STORAGE_DELETE_BATCH])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    return {"missing_series": missing, "series_access": access}
+
+
+def evict() -> dict:
+    """按时间 + 按容量淘汰 config 之外的序列（需要应用上下文）"""
+    from access_tracker import ACCESS_EVICT_DAYS, eviction_candidates
+
+    result = {"aged": delete_series(eviction_candidates(ACCESS_EVICT_DAYS)), "over_budget": 0}
+
+    page_size = _pragma("page_size")
+    live_bytes = (_pragma("page_count") - _pragma("freelist_count")) * page_size
+    budget = STORAGE_MAX_MB * 1024 * 1024
+    if live_bytes > budget:
+        excess = int(live_bytes - budget * STORAGE_TARGET_RATIO)
+        result["over_budget"] = delete_series(lru_candidates(excess))
+
+    result.update(purge_metadata_tables(ACCESS_EVICT_DAYS))
+    return result
+
+
+# ==== 回收空间 ====
+
+def reclaim(force_vacuum: bool = False) -> str:
+    """
+    归还空闲页，返回执行的操作：incremental / vacuum / none
+    INCREMENTAL 模式下直接增量回收；否则空闲页比例超过阈值（或 force_vacuum）时完整 VACUUM 并切换模式
+    """
+    page_count = _pragma("page_count")
+    freelist = _pragma("freelist_count")
+    mode = _pragma("auto_vacuum")
+
+    if force_vacuum or (mode != 2 and page_count and freelist / page_count >= STORAGE_VACUUM_RATIO):
+        # 两条语句必须在同一个连接上执行：待生效的 auto_vacuum 只属于设置它的连接
+        _autocommit("PRAGMA auto_vacuum = INCREMENTAL; VACUUM")
+        mode = _pragma("auto_vacuum")
+        if mode != 2:
+            print(f"⚠️  [STORAGE] VACUUM 后 auto_vacuum 仍为 {AUTO_VACUUM_MODES.get(mode, mode)}，未切换到 incremental")
+        return "vacuum"
+    if mode == 2 and freelist:
+        _autocommit("PRAGMA incremental_vacuum")
+        return "incremental"
+    return "none"
+
+
+def run_maintenance(force_vacuum: bool = False) -> dict:
+    """淘汰 + 回收空间，返回 {"evicted", "reclaim", "before", "after"}（需要应用上下文）"""
+    before = storage_report()
+    evicted = evict()
+    action = reclaim(force_vacuum)
+    after = storage_report()
+    print(
+        f"--- [STORAGE] 淘汰 {evicted['aged'] + evicted['over_budget']} 条序列，回收方式 {action}，"
+        f"{before['file_bytes'] / 1048576:.1f}MB → {after['file_bytes'] / 1048576:.1f}MB ---"
+    )
+    return {"evicted": evicted, "reclaim": action, "before": before, "after": after}
+
+
+_next_maintenance = 0.0
+
+
+def maybe_run_maintenance():
+    """后台同步线程每轮调用；到了 STORAGE_MAINTENANCE_HOURS 间隔才真正执行"""
+    global _next_maintenance
+    if STORAGE_MAINTENANCE_HOURS <= 0 or time.monotonic() < _next_maintenance:
+        return None
+    _next_maintenance = time.monotonic() + STORAGE_MAINTENANCE_HOURS * 3600
+    return run_maintenance()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="openrank.db 存储维护")
+    parser.add_argument("--report", action="store_true", help="只输出空间报告")
+    parser.add_argument("--vacuum", action="store_true", help="强制完整 VACUUM（并切换到增量回收模式）")
+    args = parser.parse_args()
+
+    from main import app, init_db
+
+    init_db(app)
+    with app.app_context():
+        output = storage_report() if args.report else run_maintenance(force_vacuum=args.vacuum)
+    print(json.dumps(output, ensure_ascii=False, indent=2))
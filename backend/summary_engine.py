@@ -0,0 +1,383 @@
+# backend/summary_engine.py
+"""
+LLM 生态汇总的增量计算引擎
+
+原来 compute_llm_summary_from_db 每次都解码全部项目的 openrank / activity 序列再归一化，
+一个仓库刷新也要全量重算。这里改为：
+  - 保存每个项目的原始聚合值（近 12 个月 openrank 均值 / 标准差、activity 均值）
+  - 维护三个全局最大值（归一化分母）
+  - 按 updated_at 水位线轮询 metric_series：只重算数据变化了的项目；
+    只有最大值变化时才重新归一化全部项目（只是浮点运算，不再解码 JSON）
+  - 每次变化发布一个新的只读快照（版本号递增），读请求直接拿当前快照
+
+轮询间隔 SUMMARY_POLL_SECONDS（默认 5 秒）；本进程写入序列后调用 mark_dirty() 会让下次读取立即轮询。
+多进程部署时其他 worker 的写入（如后台同步）在下一次轮询时被发现。
+
+同步结束时 data_fetcher 调用 rebuild() + save() 把快照写到 data/llm_summary.json；
+API 进程启动时 load() 读回原始聚合值和水位线，之后只需增量轮询。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from models import MetricSeries
+from metric_utils import mean, std_population, tail_n_values, calculate_health_score
+from json_provider import dumps_bytes, loads as fast_loads
+from profiling import span
+from metrics import SUMMARY_REBUILD, timed
+from config_registry import CONFIG_FILE, get_registry
+from paths import DATA_DIR
+
+# 持久化快照：同步结束时写入，API 进程启动时加载，避免第一次请求全量重算
+SNAPSHOT_FILE = DATA_DIR / "llm_summary.json"
+SNAPSHOT_FORMAT = 2
+
+SUMMARY_METRICS = ("openrank", "activity")
+SUMMARY_POLL_SECONDS = float(os.getenv("SUMMARY_POLL_SECONDS", "5"))
+
+# 参与归一化的原始聚合字段
+NORMALIZED_FIELDS = ("openrank_mean_12m", "activity_mean_12m", "openrank_std_12m")
+
+SummarySnapshot = namedtuple("SummarySnapshot", ["version", "generated_at", "projects"])
+
+
+# ==== 单个项目的计算（全量 / 增量 / data_fetcher 共用） ====
+
+def project_aggregates(or_records, act_records):
+    """近 12 个月的原始聚合值；任一序列没有有效数据时返回 None"""
+    or_vals = tail_n_values(or_records, n=12, month_key="month", value_key="count")
+    act_vals = tail_n_values(act_records, n=12, month_key="month", value_key="count")
+    if not or_vals or not act_vals:
+        return None
+    return {
+        "openrank_mean_12m": float(mean(or_vals)),
+        "openrank_std_12m": float(std_population(or_vals)),
+        "activity_mean_12m": float(mean(act_vals)),
+    }
+
+
+def compute_maxima(raw_items):
+    return {
+        field: max((item[field] for item in raw_items), default=0.0)
+        for field in NORMALIZED_FIELDS
+    }
+
+
+def finalize_item(repo_info, raw, maxima):
+    """归一化 + health_score + 保留两位小数，输出接口返回的项目字典"""
+    max_or = maxima["openrank_mean_12m"] or 1.0
+    max_act = maxima["activity_mean_12m"] or 1.0
+    max_std = maxima["openrank_std_12m"] or 1.0
+
+    or_norm = raw["openrank_mean_12m"] / max_or if max_or > 0 else 0.0
+    act_norm = raw["activity_mean_12m"] / max_act if max_act > 0 else 0.0
+    std_norm = raw["openrank_std_12m"] / max_std if max_std > 0 else 0.0
+
+    # 稳定性 = 1 - 波动性归一化值
+    stability_norm = 1.0 - std_norm
+
+    platform, org, repo = repo_info["platform"], repo_info["org"], repo_info["repo"]
+    return {
+        "platform": platform,
+        "org": org,
+        "repo": repo,
+        "project_key": f"{platform}/{org}/{repo}",
+        "category": repo_info.get("category", "unknown"),
+        "openrank_mean_12m": round(raw["openrank_mean_12m"], 2),
+        "openrank_std_12m": round(raw["openrank_std_12m"], 2),
+        "activity_mean_12m": round(raw["activity_mean_12m"], 2),
+        "health_score": calculate_health_score(or_norm, act_norm, stability_norm),
+    }
+
+
+def _decode_rows(row_or, row_act):
+    with span("decode"):
+        return fast_loads(row_or.data_json or "[]"), fast_loads(row_act.data_json or "[]")
+
+
+def _raw_from_rows(row_or, row_act):
+    if not row_or or not row_act:
+        return None
+    try:
+        return project_aggregates(*_decode_rows(row_or, row_act))
+    except Exception:
+        return None
+
+
+# ==== 引擎 ====
+
+class SummaryEngine:
+    def __init__(self, config_file: Path = CONFIG_FILE, poll_seconds: float = SUMMARY_POLL_SECONDS):
+        self.config_file = Path(config_file)
+        self.poll_seconds = poll_seconds
+
+        self._lock = threading.RLock()
+        self._registry = get_registry(self.config_file)
+        self._config_identity = None
+        self._repos = {}          # (platform, org, repo) → repo_info（按 config 顺序）
+        self._raw = {}            # (platform, org, repo) → 原始聚合值
+        self._final = {}          # (platform, org, repo) → 输出项目字典
+        self._maxima = compute_maxima(())
+        self._seen = {}           # (platform, entity, repo, metric) → updated_at
+        self._watermark = None
+        self._snapshot = None
+        self._version = 0
+        self._next_poll = 0.0
+
+    @property
+    def repo_count(self) -> int:
+        return len(self._repos)
+
+    # ---- 读 ----
+
+    def get(self) -> SummarySnapshot:
+        """当前快照；到了轮询时间（或被 mark_dirty）先增量刷新"""
+        if self._snapshot is None or time.monotonic() >= self._next_poll:
+            with self._lock:
+                if self._snapshot is None and not self.load():
+                    self.rebuild()
+                if time.monotonic() >= self._next_poll:
+                    self.refresh()
+        return self._snapshot
+
+    def mark_dirty(self):
+        """本进程刚写入了序列：下次 get() 立即轮询"""
+        self._next_poll = 0.0
+
+    # ---- 全量 ----
+
+    def _load_config(self):
+        config = self._registry.get()
+        self._repos = config.repo_map
+        self._config_identity = config.identity
+
+    def _config_digest(self) -> str:
+        """仓库列表 + 类别的摘要：快照文件只在配置一致时才能复用"""
+        items = sorted((*key, info.get("category", "unknown")) for key, info in self._repos.items())
+        return hashlib.sha1(dumps_bytes(items)).hexdigest()
+
+    # ---- 持久化 ----
+
+    def export_payload(self, indent: bool = False) -> bytes:
+        """当前快照的持久化形式（JSON 字节）；还没有快照时返回空字节"""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return b""
+            return dumps_bytes({
+                "format": SNAPSHOT_FORMAT,
+                "version": snapshot.version,
+                "generated_at": snapshot.generated_at,
+                "config_digest": self._config_digest(),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+                "raw": [[*key, raw] for key, raw in self._raw.items()],
+                "projects": snapshot.projects,
+            }, indent=indent)
+
+    def save(self, path: Path = SNAPSHOT_FILE):
+        """原子写入当前快照（先写临时文件再 rename）"""
+        payload = self.export_payload(indent=True)
+        if not payload:
+            return
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    def load(self, path: Path = SNAPSHOT_FILE) -> bool:
+        """从快照文件恢复，见 load_payload"""
+        try:
+            with open(path, "rb") as f:
+                return self.load_payload(f.read())
+        except OSError:
+            return False
+
+    def load_payload(self, data: bytes) -> bool:
+        """
+        从 export_payload 的结果恢复原始聚合值和水位线；格式旧 / 配置已变化时返回 False
+        恢复后下一次 get() 会立即轮询水位线之后的变化
+        """
+        try:
+            payload = fast_loads(data)
+        except ValueError:
+            return False
+        if not isinstance(payload, dict) or payload.get("format") != SNAPSHOT_FORMAT:
+            return False
+
+        with self._lock:
+            try:
+                self._load_config()
+            except (OSError, ValueError, KeyError):
+                return False
+            if payload.get("config_digest") != self._config_digest():
+                return False
+
+            try:
+                raw = {
+                    (platform, org, repo): {field: float(values[field]) for field in NORMALIZED_FIELDS}
+                    for platform, org, repo, values in payload["raw"]
+                    if (platform, org, repo) in self._repos
+                }
+                watermark = datetime.fromisoformat(payload["watermark"]) if payload.get("watermark") else None
+            except (KeyError, TypeError, ValueError):
+                return False
+
+            self._raw = raw
+            self._seen = {}
+            self._watermark = watermark
+            self._maxima = compute_maxima(self._raw.values())
+            self._final = {
+                key: finalize_item(self._repos[key], values, self._maxima)
+                for key, values in self._raw.items()
+            }
+            self._publish()
+            self._next_poll = 0.0
+        return True
+
+    def rebuild(self) -> SummarySnapshot:
+        """全量重算（启动 / config.json 变化 / refresh=1）"""
+        with self._lock, timed(SUMMARY_REBUILD):
+            self._load_config()
+
+            # 一次性批量查询所有需要的 MetricSeries，再在内存里按项目配对
+            rows = MetricSeries.query.filter(MetricSeries.metric.in_(SUMMARY_METRICS)).all()
+            series_map = {(r.platform, r.entity, r.repo, r.metric): r for r in rows}
+
+            self._seen = {key: row.updated_at for key, row in series_map.items()}
+            self._watermark = max((r.updated_at for r in rows if r.updated_at), default=None)
+
+            self._raw = {}
+            for key in self._repos:
+                raw = _raw_from_rows(series_map.get((*key, "openrank")), series_map.get((*key, "activity")))
+                if raw is not None:
+                    self._raw[key] = raw
+
+            self._maxima = compute_maxima(self._raw.values())
+            self._final = {
+                key: finalize_item(self._repos[key], raw, self._maxima)
+                for key, raw in self._raw.items()
+            }
+            return self._publish()
+
+    # ---- 增量 ----
+
+    def refresh(self) -> SummarySnapshot:
+        """轮询水位线之后变化的序列，只重算受影响的项目"""
+        with self._lock:
+            self._next_poll = time.monotonic() + self.poll_seconds
+
+            try:
+                config_changed = self._registry.get().identity != self._config_identity
+            except (OSError, ValueError, KeyError):
+                config_changed = False
+            if config_changed or self._watermark is None:
+                return self.rebuild()
+
+            query = MetricSeries.query.filter(
+                MetricSeries.metric.in_(SUMMARY_METRICS),
+                MetricSeries.updated_at >= self._watermark,
+            )
+            changed = set()
+            for row in query.all():
+                key = (row.platform, row.entity, row.repo, row.metric)
+                if self._seen.get(key) == row.updated_at:
+                    continue
+                self._seen[key] = row.updated_at
+                if row.updated_at and row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+                if key[:3] in self._repos:
+                    changed.add(key[:3])
+
+            if not changed:
+                return self._snapshot
+
+            updated = [project for project in changed if self._update_project(project)]
+            if not updated:
+                # 行被重写但聚合值没变（如同步写回相同数据）：不发布新版本
+                return self._snapshot
+            return self._publish()
+
+    def _update_project(self, project) -> bool:
+        """重算一个项目；返回聚合值是否有变化"""
+        platform, org, repo = project
+        rows = MetricSeries.query.filter(
+            MetricSeries.platform == platform,
+            MetricSeries.entity == org,
+            MetricSeries.repo == repo,
+            MetricSeries.metric.in_(SUMMARY_METRICS),
+        ).all()
+        by_metric = {r.metric: r for r in rows}
+
+        old = self._raw.get(project)
+        new = _raw_from_rows(by_metric.get("openrank"), by_metric.get("activity"))
+        if new == old:
+            return False
+        if new is None:
+            self._raw.pop(project, None)
+            self._final.pop(project, None)
+        else:
+            self._raw[project] = new
+
+        if self._update_maxima(old, new):
+            # 归一化分母变了：所有项目的 health_score 都要重新计算（不需要重新解码）
+            self._final = {
+                key: finalize_item(self._repos[key], raw, self._maxima)
+                for key, raw in self._raw.items()
+            }
+        elif new is not None:
+            self._final[project] = finalize_item(self._repos[project], new, self._maxima)
+        return True
+
+    def _update_maxima(self, old, new) -> bool:
+        """维护全局最大值；返回是否有变化"""
+        changed = False
+        for field in NORMALIZED_FIELDS:
+            current = self._maxima[field]
+            new_value = new[field] if new else None
+            old_value = old[field] if old else None
+
+            if new_value is not None and new_value > current:
+                self._maxima[field] = new_value
+                changed = True
+            elif old_value is not None and old_value == current and (new_value is None or new_value < old_value):
+                # 原来的最大值持有者变小了 / 被移除：重新求最大值
+                recomputed = max((item[field] for item in self._raw.values()), default=0.0)
+                if recomputed != current:
+                    self._maxima[field] = recomputed
+                    changed = True
+        return changed
+
+    def _publish(self) -> SummarySnapshot:
+        self._version += 1
+        projects = [self._final[key] for key in self._repos if key in self._final]
+        self._snapshot = SummarySnapshot(self._version, time.time(), projects)
+        self._next_poll = time.monotonic() + self.poll_seconds
+        return self._snapshot
+
+
+engine = SummaryEngine()
+
+
+def mark_dirty():
+    engine.mark_dirty()
+
+
+def load_persisted_summary() -> bool:
+    """
+    进程启动时调用：优先使用 mmap 快照（snapshot.py）里的汇总，其次 data/llm_summary.json
+    """
+    if engine._snapshot is not None:
+        return True
+
+    from snapshot import current_snapshot
+    series_snapshot = current_snapshot()
+    if series_snapshot is not None and engine.load_payload(series_snapshot.summary_payload()):
+        return True
+    return engine.load()
@@ -0,0 +1,70 @@
+# backend/upstream.py
+"""
+上游 HTTP 客户端（OpenDigger / OpenAI）
+  - 同步路径（Flask / 同步任务）：进程内共享一个带连接池的 requests.Session
+  - 异步路径（ASGI 模式）：进程内共享一个 httpx.AsyncClient，OpenAI 异步客户端也复用它
+
+两个客户端都在首次使用时才创建，不影响冷启动
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OPENDIGGER_TIMEOUT_SECONDS = 30
+
+# 连接池大小：同一上游主机上允许的最大并发连接数
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "32"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "200"))
+
+_session = None
+_session_lock = threading.Lock()
+
+_async_client = None
+
+
+def get_session() -> requests.Session:
+    """获取进程内共享的 requests.Session（keep-alive + 连接池）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=UPSTREAM_POOL_SIZE,
+                    pool_maxsize=UPSTREAM_POOL_SIZE,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_async_client():
+    """
+    获取进程内共享的 httpx.AsyncClient
+    必须在事件循环内调用；ASGI 模式下每个 worker 只有一个事件循环
+    """
+    global _async_client
+    if _async_client is None:
+        import httpx
+
+        _async_client = httpx.AsyncClient(
+            timeout=OPENDIGGER_TIMEOUT_SECONDS,
+            # 与同步路径的 requests 一致跟随重定向，否则上游 3xx 在 ASGI 下会变成 502
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_POOL_SIZE,
+            ),
+        )
+    return _async_client
+
+
+async def aclose_async_client():
+    """关闭共享的异步客户端（ASGI lifespan shutdown 时调用）"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,323 @@
+# backend/warmup.py
+"""
+启动预热：部署 / 恢复数据库之后，先把热门序列拉进 MetricSeries，再让负载均衡放流量
+
+拉取计划（按热度从高到低）：
+  - config.json 里的项目 × config 的 metrics（核心指标 openrank / activity 额外加权，汇总 / 排行依赖它们）
+  - 所有 single 收藏的 (platform, full_name, metric)，热度 = 收藏该序列的用户数
+已新鲜（未过该序列的自适应 TTL，见 access_tracker.py）或在负缓存里的序列直接跳过。
+执行：WARMUP_WORKERS 个线程并发，共用一个令牌桶，整体不超过 WARMUP_RATE 个上游请求 / 秒；
+写库走 api.opendigger.refresh_series，与线上请求是同一条路径（404 同样进负缓存）。
+
+就绪信号：计划里排在前 WARMUP_HOT_SIZE 的序列（热集合）全部处理完（成功或确认失败）即就绪；
+超过 WARMUP_READY_TIMEOUT 秒仍未完成也放行（degraded），避免上游故障时服务永远起不来。
+状态写到 data/warmup_state.json（原子替换），各 worker 的 GET /api/ready 读这个文件：
+就绪返回 200，否则 503。WARMUP_ENABLED=0 时不预热，/api/ready 始终返回 200。
+
+手动运行：python warmup.py
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import _counter, _gauge
+from paths import DATA_DIR
+
+WARMUP_STATE_FILE = DATA_DIR / "warmup_state.json"
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "8"))
+WARMUP_RATE = float(os.getenv("WARMUP_RATE", "20"))
+WARMUP_HOT_SIZE = int(os.getenv("WARMUP_HOT_SIZE", "200"))
+WARMUP_READY_TIMEOUT = float(os.getenv("WARMUP_READY_TIMEOUT", "300"))
+READY_CHECK_SECONDS = 1.0
+
+CORE_METRICS = ("openrank", "activity")
+# 热度：每个收藏的用户 1 分；config 项目 1 分，核心指标再加 1 分
+CONFIG_SCORE = 1
+CORE_METRIC_BONUS = 1
+
+# 收藏里的名字来自用户输入，只接受正常的 org / repo / metric 名
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+WARMUP_FETCHES = _counter(
+    "openrank_warmup_fetches_total", "预热处理的序列数", ("result",)
+)
+WARMUP_READY = _gauge(
+    "openrank_warmup_ready", "预热热集合是否已完成（0 / 1）"
+)
+
+
+class TokenBucket:
+    """线程安全的令牌桶：平均 rate 个 / 秒，最多攒 burst 个"""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return  # 不限速
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ==== 拉取计划 ====
+
+def _split_full_name(full_name: str):
+    """"org/repo" → (org, repo)；"user" → (user, None)；非法名字返回 None"""
+    parts = full_name.strip().strip("/").split("/")
+    if len(parts) not in (1, 2) or not all(_NAME_RE.match(p) for p in parts):
+        return None
+    return parts[0], (parts[1] if len(parts) == 2 else None)
+
+
+def favorite_popularity():
+    """single 收藏：(platform, entity, repo, metric) → 收藏的用户数（需要应用上下文）"""
+    from extensions import db
+    from models import Favorite
+
+    rows = (
+        db.session.query(
+            Favorite.platform, Favorite.full_name, Favorite.metric,
+            db.func.count(db.distinct(Favorite.user_id)),
+        )
+        .filter(Favorite.kind == "single", Favorite.full_name.isnot(None), Favorite.metric.isnot(None))
+        .group_by(Favorite.platform, Favorite.full_name, Favorite.metric)
+        .all()
+    )
+    popularity = {}
+    for platform, full_name, metric, users in rows:
+        name = _split_full_name(full_name)
+        if name is None or not _NAME_RE.match(metric) or not _NAME_RE.match(platform or "github"):
+            continue
+        key = (platform or "github", name[0], name[1], metric)
+        popularity[key] = popularity.get(key, 0) + users
+    return popularity
+
+
+def build_plan():
+    """
+    [(score, (platform, entity, repo, metric)), ...]，按热度从高到低；
+    同分时 config 里的项目按 config 顺序排在收藏之前（需要应用上下文）
+    """
+    from config_registry import get_config
+
+    scores = {}
+    try:
+        config = get_config()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️  预热读取 config.json 失败，只预热收藏: {e}")
+        config = None
+    if config is not None:
+        for platform, org, repo in config.repo_map:
+            for metric in config.metrics:
+                bonus = CORE_METRIC_BONUS if metric in CORE_METRICS else 0
+                scores[(platform, org, repo, metric)] = CONFIG_SCORE + bonus
+
+    for key, users in favorite_popularity().items():
+        scores[key] = scores.get(key, 0) + users
+
+    # sorted 是稳定排序：同分保持插入顺序（config 顺序在前）
+    return sorted(((score, key) for key, score in scores.items()), key=lambda item: -item[0])
+
+
+# ==== 状态文件 ====
+
+def _write_state(state: dict):
+    WARMUP_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = WARMUP_STATE_FILE.with_name(f"{WARMUP_STATE_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, WARMUP_STATE_FILE)
+
+
+def mark_pending():
+    """部署开始时（master / 单进程启动）标记未就绪，避免读到上一次部署留下的 ready"""
+    if WARMUP_ENABLED:
+        _write_state({"status": "pending", "started_at": time.time(), "pid": os.getpid()})
+
+
+def _read_state():
+    try:
+        with open(WARMUP_STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def needs_warmup() -> bool:
+    """
+    本次部署还没有预热完成（状态文件没有 ready_at）。
+    同步进程被替换（HUP 重载 / worker 回收）后接手的进程据此跳过预热，/api/ready 不会重新变成 503
+    """
+    state = _read_state()
+    return state is None or state.get("ready_at") is None
+
+
+class Warmup:
+    """一次预热运行；进度定期写入状态文件"""
+
+    def __init__(self, app, workers: int = WARMUP_WORKERS, rate: float = WARMUP_RATE,
+                 hot_size: int = WARMUP_HOT_SIZE):
+        self.app = app
+        self.workers = max(workers, 1)
+        self.bucket = TokenBucket(rate)
+        self.hot_size = hot_size
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self.state = {
+            "status": "running", "started_at": time.time(), "pid": os.getpid(),
+            "planned": 0, "hot_total": 0, "hot_done": 0,
+            "fetched": 0, "skipped": 0, "missing": 0, "failed": 0,
+        }
+
+    def run(self) -> dict:
+        _write_state(self.state)
+        try:
+            with self.app.app_context():
+                plan = build_plan()
+            hot_keys = {key for _, key in plan[:self.hot_size]}
+            self.state.update(planned=len(plan), hot_total=len(hot_keys))
+            if not hot_keys:
+                self._set_ready()
+            self._flush(force=True)
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="warmup") as pool:
+                futures = {pool.submit(self._warm_one, key): key for _, key in plan}
+                for future in as_completed(futures):
+                    result = future.result()
+                    WARMUP_FETCHES.labels(result=result).inc()
+                    became_ready = False
+                    with self._lock:
+                        self.state[result] += 1
+                        if futures[future] in hot_keys:
+                            self.state["hot_done"] += 1
+                            if self.state["hot_done"] == self.state["hot_total"]:
+                                became_ready = self._set_ready()
+                    self._flush(force=became_ready)
+        except Exception as e:
+            self.state["error"] = str(e)
+            print(f"⚠️  预热失败: {e}")
+
+        self.state["status"] = "done" if "error" not in self.state else "failed"
+        self.state["finished_at"] = time.time()
+        # 出错时也放行：预热只是优化，不能挡住服务
+        self._set_ready()
+        self._flush(force=True)
+        return self.state
+
+    def _set_ready(self) -> bool:
+        if self.state.get("ready_at") is not None:
+            return False
+        self.state["ready_at"] = time.time()
+        WARMUP_READY.set(1)
+        return True
+
+    def _flush(self, force: bool = False):
+        """进度写盘：最多每秒一次，状态变化（就绪 / 结束）时立即写"""
+        now = time.monotonic()
+        if force or now - self._last_write >= 1.0:
+            with self._lock:
+                snapshot = dict(self.state)
+            _write_state(snapshot)
+            self._last_write = now
+
+    def _warm_one(self, key) -> str:
+        """返回 fetched / skipped / missing / failed"""
+        from api.opendigger import (
+            ApiException, get_cached_series_row, is_series_fresh, opendigger_url, refresh_series,
+        )
+        from negative_cache import negative_cache
+
+        platform, entity, repo, metric = key
+        with self.app.app_context():
+            if negative_cache.is_missing(platform, entity, repo, metric):
+                return "skipped"
+            row = get_cached_series_row(platform, entity, repo, metric)
+            if is_series_fresh(row):
+                return "skipped"
+
+            self.bucket.acquire()
+            try:
+                refresh_series(opendigger_url(platform, entity, repo, metric), row, platform, entity, repo, metric)
+                return "fetched"
+            except ApiException as e:
+                return "missing" if e.status_code == 404 else "failed"
+            except Exception:
+                from extensions import db
+                db.session.rollback()
+                return "failed"
+
+
+def run_warmup(app) -> dict:
+    return Warmup(app).run()
+
+
+def start_warmup(app):
+    """
+    后台线程预热；开启后台同步时由同步线程在首次同步之前调用 run_warmup（不与同步并发写同一批行），
+    这里只用于关闭后台同步（BACKGROUND_SYNC=0）的部署
+    """
+    if not WARMUP_ENABLED or not needs_warmup():
+        return
+    threading.Thread(target=run_warmup, args=(app,), name="cache-warmup", daemon=True).start()
+
+
+# ==== 就绪探针 ====
+
+_ready_cache = {"checked": 0.0, "payload": None}
+
+
+def readiness() -> dict:
+    """读取状态文件（每 READY_CHECK_SECONDS 秒最多一次），返回 {"ready": bool, ...}"""
+    if not WARMUP_ENABLED:
+        return {"ready": True, "status": "disabled"}
+
+    now = time.monotonic()
+    payload = _ready_cache["payload"]
+    if payload is None or now - _ready_cache["checked"] >= READY_CHECK_SECONDS:
+        payload = _read_state() or {"status": "pending"}
+        _ready_cache.update(checked=now, payload=payload)
+
+    state = dict(payload)
+    ready = state.get("ready_at") is not None
+    started_at = state.get("started_at")
+    if not ready and started_at and time.time() - started_at > WARMUP_READY_TIMEOUT:
+        ready = True
+        state["degraded"] = True
+    state["ready"] = ready
+    return state
+
+
+def ready_view():
+    from flask import jsonify
+
+    state = readiness()
+    return jsonify(state), (200 if state["ready"] else 503)
+
+
+def init_warmup(app):
+    app.add_url_rule("/api/ready", "ready", ready_view, methods=["GET"])
+
+
+if __name__ == "__main__":
+    from main import app, init_db
+
+    init_db(app)
+    result = run_warmup(app)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -41,6 +41,36 @@ http.interceptors.response.use(
 
 
 // ================== 4. OpenDigger 指标相关接口 ==================
+
+// 序列接口使用紧凑格式（体积约为默认格式的 1/4），这里还原成 [{month, count}]，调用方无需改动：
+//   {start, step, values}：从 start 起每 step 个月一个值（缺失为 null）
+//   {months, values}：max_points 降采样后的不等间隔点
+function expandCompactSeries(payload) {
+  if (!payload || payload.format !== 'compact') return payload
+  const { start, step = 1, months, values = [], ...rest } = payload
+  const data = []
+  if (months) {
+    months.forEach((month, i) => data.push({ month, count: values[i] }))
+  } else if (start) {
+    const first = Number(start.slice(0, 4)) * 12 + Number(start.slice(5, 7)) - 1
+    values.forEach((value, i) => {
+      if (value === null || value === undefined) return
+      const index = first + i * step
+      const month = `${Math.floor(index / 12)}-${String((index % 12) + 1).padStart(2, '0')}`
+      data.push({ month, count: value })
+    })
+  }
+  return { ...rest, data }
+}
+
+// params 可带 from / to / granularity / agg / max_points（服务端裁剪、聚合、降采样）
+function getSeries(url, params = {}) {
+  return http.get(url, { params: { ...params, format: 'compact' } }).then((res) => {
+    res.data = expandCompactSeries(res.data)
+    return res
+  })
+}
+
 export const opendiggerApi = {
   // 1. 获取平台列表
   getPlatforms() {
@@ -63,13 +93,18 @@ export const opendiggerApi = {
   },
 
   // 5. 获取“开发者”指标（不带 repo）
-  getUserData(platform, entity, metric) {
-    return http.get(`/api/data/${platform}/${entity}/${metric}`)
+  getUserData(platform, entity, metric, params) {
+    return getSeries(`/api/data/${platform}/${entity}/${metric}`, params)
   },
 
   // 6. 获取“仓库”指标（带 repo）
-  getRepoData(platform, entity, repo, metric) {
-    return http.get(`/api/data/${platform}/${entity}/${repo}/${metric}`)
+  getRepoData(platform, entity, repo, metric, params) {
+    return getSeries(`/api/data/${platform}/${entity}/${repo}/${metric}`, params)
+  },
+
+  // 7. 组织 / 仓库自动补全（kind: 'entity' | 'repo'，可选）
+  search(q, { platform, kind, limit = 10 } = {}) {
+    return http.get('/api/search', { params: { q, platform, kind, limit } })
   }
 }
 